@@ -1,7 +1,7 @@
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from dcim.signals import rebuild_paths
+from dcim.signals import invalidate_termination_svgs, rebuild_paths
 from .models import CircuitTermination
 
 
@@ -25,3 +25,7 @@ def rebuild_cablepaths(instance, raw=False, **kwargs):
         peer_termination = instance.get_peer_termination()
         if peer_termination:
             rebuild_paths([peer_termination])
+
+
+# Discard any cached cable trace SVGs for CablePaths which traverse a modified CircuitTermination
+post_save.connect(invalidate_termination_svgs, sender=CircuitTermination)
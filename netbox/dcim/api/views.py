@@ -1,11 +1,15 @@
 import socket
 
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Prefetch
 from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.openapi import Parameter
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.routers import APIRootView
 from rest_framework.viewsets import ViewSet
@@ -14,7 +18,8 @@ from circuits.models import Circuit
 from dcim import filtersets
 from dcim.constants import CABLE_TRACE_SVG_DEFAULT_WIDTH
 from dcim.models import *
-from dcim.svg import CableTraceSVG
+from dcim.svg import CableTraceSVG, RackElevationSVG
+from dcim.utils import decompile_path_node, defer_component_instantiation, defer_path_updates
 from extras.api.views import ConfigContextQuerySetMixin
 from ipam.models import Prefix, VLAN
 from netbox.api.authentication import IsAuthenticatedOrLoginNotRequired
@@ -60,7 +65,7 @@ class PathEndpointMixin(object):
             except (ValueError, TypeError):
                 width = CABLE_TRACE_SVG_DEFAULT_WIDTH
             drawing = CableTraceSVG(obj, base_url=request.build_absolute_uri('/'), width=width)
-            return HttpResponse(drawing.render().tostring(), content_type='image/svg+xml')
+            return HttpResponse(drawing.render_cached(), content_type='image/svg+xml')
 
         # Serialize path objects, iterating over each three-tuple in the path
         for near_ends, cable, far_ends in obj.trace():
@@ -219,17 +224,18 @@ class RackViewSet(NetBoxModelViewSet):
                     pass
 
             # Render and return the elevation as an SVG drawing with the correct content type
-            drawing = rack.get_elevation_svg(
-                face=data['face'],
+            drawing = RackElevationSVG(
+                rack,
                 user=request.user,
                 unit_width=data['unit_width'],
                 unit_height=data['unit_height'],
                 legend_width=data['legend_width'],
+                margin_width=data['margin_width'],
                 include_images=data['include_images'],
                 base_url=request.build_absolute_uri('/'),
                 highlight_params=highlight_params
             )
-            return HttpResponse(drawing.tostring(), content_type='image/svg+xml')
+            return HttpResponse(drawing.render_cached(data['face']), content_type='image/svg+xml')
 
         else:
             # Return a JSON representation of the rack units in the elevation
@@ -399,6 +405,12 @@ class DeviceViewSet(ConfigContextQuerySetMixin, NetBoxModelViewSet):
     filterset_class = filtersets.DeviceFilterSet
     pagination_class = StripCountAnnotationsPaginator
 
+    # Defer instantiation of components until all devices in a request have been created
+
+    def perform_create(self, serializer):
+        with transaction.atomic(), defer_component_instantiation():
+            super().perform_create(serializer)
+
     def get_serializer_class(self):
         """
         Select the specific serializer based on the request context.
@@ -545,6 +557,12 @@ class ModuleViewSet(NetBoxModelViewSet):
     serializer_class = serializers.ModuleSerializer
     filterset_class = filtersets.ModuleFilterSet
 
+    # Defer instantiation of components until all modules in a request have been created
+
+    def perform_create(self, serializer):
+        with transaction.atomic(), defer_component_instantiation():
+            super().perform_create(serializer)
+
 
 #
 # Device components
@@ -552,7 +570,8 @@ class ModuleViewSet(NetBoxModelViewSet):
 
 class ConsolePortViewSet(PathEndpointMixin, NetBoxModelViewSet):
     queryset = ConsolePort.objects.prefetch_related(
-        'device', 'module__module_bay', '_path', 'cable__terminations', 'tags'
+        'device', 'module__module_bay', 'cable__terminations', 'tags',
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
     )
     serializer_class = serializers.ConsolePortSerializer
     filterset_class = filtersets.ConsolePortFilterSet
@@ -561,7 +580,8 @@ class ConsolePortViewSet(PathEndpointMixin, NetBoxModelViewSet):
 
 class ConsoleServerPortViewSet(PathEndpointMixin, NetBoxModelViewSet):
     queryset = ConsoleServerPort.objects.prefetch_related(
-        'device', 'module__module_bay', '_path', 'cable__terminations', 'tags'
+        'device', 'module__module_bay', 'cable__terminations', 'tags',
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
     )
     serializer_class = serializers.ConsoleServerPortSerializer
     filterset_class = filtersets.ConsoleServerPortFilterSet
@@ -570,7 +590,8 @@ class ConsoleServerPortViewSet(PathEndpointMixin, NetBoxModelViewSet):
 
 class PowerPortViewSet(PathEndpointMixin, NetBoxModelViewSet):
     queryset = PowerPort.objects.prefetch_related(
-        'device', 'module__module_bay', '_path', 'cable__terminations', 'tags'
+        'device', 'module__module_bay', 'cable__terminations', 'tags',
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
     )
     serializer_class = serializers.PowerPortSerializer
     filterset_class = filtersets.PowerPortFilterSet
@@ -579,7 +600,8 @@ class PowerPortViewSet(PathEndpointMixin, NetBoxModelViewSet):
 
 class PowerOutletViewSet(PathEndpointMixin, NetBoxModelViewSet):
     queryset = PowerOutlet.objects.prefetch_related(
-        'device', 'module__module_bay', '_path', 'cable__terminations', 'tags'
+        'device', 'module__module_bay', 'cable__terminations', 'tags',
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
     )
     serializer_class = serializers.PowerOutletSerializer
     filterset_class = filtersets.PowerOutletFilterSet
@@ -588,8 +610,9 @@ class PowerOutletViewSet(PathEndpointMixin, NetBoxModelViewSet):
 
 class InterfaceViewSet(PathEndpointMixin, NetBoxModelViewSet):
     queryset = Interface.objects.prefetch_related(
-        'device', 'module__module_bay', 'parent', 'bridge', 'lag', '_path', 'cable__terminations', 'wireless_lans',
-        'untagged_vlan', 'tagged_vlans', 'vrf', 'ip_addresses', 'fhrp_group_assignments', 'tags'
+        'device', 'module__module_bay', 'parent', 'bridge', 'lag', 'cable__terminations', 'wireless_lans',
+        'untagged_vlan', 'tagged_vlans', 'vrf', 'ip_addresses', 'fhrp_group_assignments', 'tags',
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
     )
     serializer_class = serializers.InterfaceSerializer
     filterset_class = filtersets.InterfaceFilterSet
@@ -656,6 +679,20 @@ class CableViewSet(NetBoxModelViewSet):
     serializer_class = serializers.CableSerializer
     filterset_class = filtersets.CableFilterSet
 
+    # Defer tracing of CablePaths until all cables in a request have been processed
+
+    def perform_create(self, serializer):
+        with defer_path_updates():
+            super().perform_create(serializer)
+
+    def perform_bulk_update(self, objects, update_data, partial):
+        with defer_path_updates():
+            return super().perform_bulk_update(objects, update_data, partial)
+
+    def perform_bulk_destroy(self, objects):
+        with defer_path_updates():
+            super().perform_bulk_destroy(objects)
+
 
 class CableTerminationViewSet(NetBoxModelViewSet):
     metadata_class = ContentTypeMetadata
@@ -697,7 +734,8 @@ class PowerPanelViewSet(NetBoxModelViewSet):
 
 class PowerFeedViewSet(PathEndpointMixin, NetBoxModelViewSet):
     queryset = PowerFeed.objects.prefetch_related(
-        'power_panel', 'rack', '_path', 'cable__terminations', 'tags'
+        'power_panel', 'rack', 'cable__terminations', 'tags',
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
     )
     serializer_class = serializers.PowerFeedSerializer
     filterset_class = filtersets.PowerFeedFilterSet
@@ -715,6 +753,8 @@ class ConnectedDeviceViewSet(ViewSet):
 
     * `peer_device`: The name of the peer device
     * `peer_interface`: The name of the peer interface
+
+    Many pairs may be resolved at once by POSTing a list of objects with these attributes to the `bulk/` endpoint.
     """
     permission_classes = [IsAuthenticatedOrLoginNotRequired]
     _device_param = Parameter(
@@ -769,3 +809,90 @@ class ConnectedDeviceViewSet(ViewSet):
 
         # Connected endpoint is none or not an Interface
         raise Http404
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    _device_param.name: openapi.Schema(type=openapi.TYPE_STRING, description=_device_param.description),
+                    _interface_param.name: openapi.Schema(
+                        type=openapi.TYPE_STRING, description=_interface_param.description
+                    ),
+                },
+                required=[_device_param.name, _interface_param.name]
+            )
+        ),
+        responses={'200': serializers.DeviceSerializer(many=True, allow_null=True)}
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Resolve the connected device for a list of peer device/interface pairs at once. Returns a list of devices in
+        the same order as the pairs, with null in place of any pair for which no connected device could be found.
+        """
+        pairs = request.data
+        if not isinstance(pairs, list) or not all(isinstance(pair, dict) for pair in pairs):
+            raise ValidationError('Request must be a list of objects.')
+        max_page_size = get_config().MAX_PAGE_SIZE
+        if max_page_size and len(pairs) > max_page_size:
+            raise ValidationError(f'No more than {max_page_size} pairs may be resolved per request.')
+        try:
+            pairs = [(pair[self._device_param.name], pair[self._interface_param.name]) for pair in pairs]
+        except KeyError:
+            raise MissingFilterException(detail='Each pair must include "peer_device" and "peer_interface".')
+
+        # Find the peer devices. Names which match more than one device cannot be resolved.
+        device_ids = {}
+        peer_devices = Device.objects.restrict(request.user, 'view').filter(
+            name__in={device_name for device_name, _ in pairs}
+        ).order_by().values_list('pk', 'name')
+        for pk, name in peer_devices:
+            device_ids[name] = None if name in device_ids else pk
+
+        # Find the cable path attached to each peer interface
+        paths = {}
+        peer_interfaces = Interface.objects.restrict(request.user, 'view').filter(
+            device_id__in=[pk for pk in device_ids.values() if pk is not None],
+            name__in={interface_name for _, interface_name in pairs},
+            _path__isnull=False
+        ).order_by().values_list('device_id', 'name', '_path_id')
+        for device_id, name, path_id in peer_interfaces:
+            paths[(device_id, name)] = path_id
+
+        # Determine the far-end Interfaces of all complete paths
+        interface_ct = ContentType.objects.get_for_model(Interface)
+        endpoints = {}
+        cable_paths = CablePath.objects.filter(
+            pk__in=set(paths.values()), is_complete=True
+        ).order_by().values_list('pk', 'path')
+        for pk, path in cable_paths:
+            endpoints[pk] = [decompile_path_node(node) for node in path[-1]]
+        interface_devices = dict(
+            Interface.objects.filter(
+                pk__in={pk for nodes in endpoints.values() for ct_id, pk in nodes if ct_id == interface_ct.pk}
+            ).order_by().values_list('pk', 'device_id')
+        )
+
+        # Resolve each pair to the device of the first (non-stale) far-end Interface, if any
+        connected_device_ids = []
+        for device_name, interface_name in pairs:
+            path_id = paths.get((device_ids.get(device_name), interface_name))
+            nodes = endpoints.get(path_id, [])
+            if nodes and nodes[0][0] == interface_ct.pk:
+                connected_device_ids.append(
+                    next((interface_devices[pk] for _, pk in nodes if pk in interface_devices), None)
+                )
+            else:
+                connected_device_ids.append(None)
+
+        # Serialize each connected device only once
+        devices = DeviceViewSet.queryset.restrict(request.user, 'view').filter(
+            pk__in={pk for pk in connected_device_ids if pk is not None}
+        )
+        data = {
+            device.pk: serializers.DeviceSerializer(device, context={'request': request}).data for device in devices
+        }
+
+        return Response([data.get(pk) for pk in connected_device_ids])
@@ -16,6 +16,20 @@ RACK_ELEVATION_BORDER_WIDTH = 2
 RACK_ELEVATION_DEFAULT_LEGEND_WIDTH = 30
 RACK_ELEVATION_DEFAULT_MARGIN_WIDTH = 15
 
+# Rendered rack elevation SVGs are cached for up to one hour
+RACK_ELEVATION_SVG_CACHE_TIMEOUT = 3600
+
+
+#
+# Site assignment
+#
+
+# Moving a Location or Rack which contains more than this many objects updates them in a background job (if available)
+SITE_CASCADE_JOB_THRESHOLD = 1000
+
+# Number of objects updated per transaction by a background site assignment job
+SITE_CASCADE_BATCH_SIZE = 500
+
 
 #
 # RearPorts
@@ -87,6 +101,9 @@ MODULAR_COMPONENT_MODELS = Q(
 
 CABLE_TRACE_SVG_DEFAULT_WIDTH = 400
 
+# Rendered cable trace SVGs are cached for up to one hour
+CABLE_TRACE_SVG_CACHE_TIMEOUT = 3600
+
 # Cable endpoint types
 CABLE_TERMINATION_MODELS = Q(
     Q(app_label='circuits', model__in=(
@@ -933,6 +933,12 @@ class CableCSVForm(NetBoxModelCSVForm):
             'color': mark_safe('RGB color in hexadecimal (e.g. <code>00ff00</code>)'),
         }
 
+    def __init__(self, *args, terminations=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Termination objects retrieved in advance, keyed by content type ID, device ID, and name (optional)
+        self.terminations = terminations or {}
+
     def _clean_side(self, side):
         """
         Derive a Cable's A/B termination objects.
@@ -949,7 +955,9 @@ class CableCSVForm(NetBoxModelCSVForm):
 
         model = content_type.model_class()
         try:
-            termination_object = model.objects.get(device=device, name=name)
+            termination_object = self.terminations.get((content_type.pk, device.pk, name))
+            if termination_object is None:
+                termination_object = model.objects.get(device=device, name=name)
             if termination_object.cable is not None:
                 raise forms.ValidationError(f"Side {side.upper()}: {device} {termination_object} is already connected")
         except ObjectDoesNotExist:
@@ -0,0 +1,313 @@
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+from circuits.models import CircuitTermination, ProviderNetwork
+from dcim.choices import CableEndChoices, LinkStatusChoices
+from dcim.models import *
+from dcim.utils import compile_path_node
+from wireless.models import WirelessLink
+
+__all__ = (
+    'CablePathGraph',
+)
+
+CABLED_MODELS = (
+    CircuitTermination,
+    ConsolePort,
+    ConsoleServerPort,
+    FrontPort,
+    Interface,
+    PowerFeed,
+    PowerOutlet,
+    PowerPort,
+    RearPort,
+)
+
+
+class CablePathGraph:
+    """
+    A compact, in-memory representation of all cables, cable terminations, and front/rear port mappings. The graph is
+    loaded using a fixed number of queries, after which any number of CablePaths can be traced without touching the
+    database. Paths traced by the graph are identical to those produced by CablePath.from_origin().
+    """
+    def __init__(self):
+        content_types = ContentType.objects.get_for_models(
+            *CABLED_MODELS, Cable, WirelessLink, Site, ProviderNetwork
+        )
+        self.content_types = {model: ct.pk for model, ct in content_types.items()}
+        self.cable_ct = self.content_types[Cable]
+        self.wirelesslink_ct = self.content_types[WirelessLink]
+        self.interface_ct = self.content_types[Interface]
+        self.frontport_ct = self.content_types[FrontPort]
+        self.rearport_ct = self.content_types[RearPort]
+        self.circuittermination_ct = self.content_types[CircuitTermination]
+        self.site_ct = self.content_types[Site]
+        self.providernetwork_ct = self.content_types[ProviderNetwork]
+
+        # Cable attached to each termination object, keyed by content type ID and object ID
+        self.links = {}
+        for model in CABLED_MODELS:
+            self.links[self.content_types[model]] = dict(
+                model.objects.filter(cable__isnull=False).order_by().values_list('pk', 'cable_id')
+            )
+        self.interface_wireless_links = dict(
+            Interface.objects.filter(wireless_link__isnull=False).order_by().values_list('pk', 'wireless_link_id')
+        )
+
+        # Link status (and wireless link interfaces)
+        self.cable_statuses = dict(Cable.objects.order_by().values_list('pk', 'status'))
+        self.wireless_links = {
+            pk: (status, interface_a_id, interface_b_id)
+            for pk, status, interface_a_id, interface_b_id in WirelessLink.objects.order_by().values_list(
+                'pk', 'status', 'interface_a_id', 'interface_b_id'
+            )
+        }
+
+        # Cable end of each terminating object, and the terminating objects attached to each end of a cable
+        self.cable_ends = defaultdict(dict)
+        self.cable_terminations = defaultdict(list)
+        cable_terminations = CableTermination.objects.order_by('pk').values_list(
+            'cable_id', 'cable_end', 'termination_type_id', 'termination_id'
+        )
+        for cable_id, cable_end, termination_type_id, termination_id in cable_terminations:
+            self.cable_ends[termination_type_id][termination_id] = cable_end
+            self.cable_terminations[(cable_id, cable_end)].append((termination_type_id, termination_id))
+
+        # Front and rear ports are ranked according to their default ordering, so that the sequence of nodes within
+        # each hop matches what the database would return.
+        self.rear_ports = {
+            pk: (rank, positions)
+            for rank, (pk, positions) in enumerate(RearPort.objects.values_list('pk', 'positions'))
+        }
+        self.front_ports = {}
+        self.rear_port_mappings = defaultdict(list)
+        front_ports = FrontPort.objects.values_list('pk', 'rear_port_id', 'rear_port_position')
+        for rank, (pk, rear_port_id, rear_port_position) in enumerate(front_ports):
+            self.front_ports[pk] = (rank, rear_port_id, rear_port_position)
+            self.rear_port_mappings[rear_port_id].append((rear_port_position, pk))
+
+        # Circuit terminations, and the termination on each side of a circuit
+        self.circuit_terminations = {}
+        self.circuit_sides = {}
+        circuit_terminations = CircuitTermination.objects.order_by().values_list(
+            'pk', 'circuit_id', 'term_side', 'site_id', 'provider_network_id'
+        )
+        for pk, circuit_id, term_side, site_id, provider_network_id in circuit_terminations:
+            self.circuit_terminations[pk] = (circuit_id, term_side, site_id, provider_network_id)
+            self.circuit_sides[(circuit_id, term_side)] = pk
+
+    def get_link(self, termination_type, termination_id):
+        """
+        Return the link (Cable or WirelessLink) attached to a termination as a (content type ID, object ID) tuple, or
+        None if the termination is not connected.
+        """
+        cable_id = self.links[termination_type].get(termination_id)
+        if cable_id is not None:
+            return self.cable_ct, cable_id
+        if termination_type == self.interface_ct and termination_id in self.interface_wireless_links:
+            return self.wirelesslink_ct, self.interface_wireless_links[termination_id]
+        return None
+
+    def get_front_ports(self, rear_port_ids, positions):
+        """
+        Return the IDs of all FrontPorts mapped to the given positions on the specified RearPorts.
+        """
+        front_port_ids = [
+            pk for rear_port_id in rear_port_ids for position, pk in self.rear_port_mappings[rear_port_id]
+            if position in positions
+        ]
+        return sorted(front_port_ids, key=lambda pk: self.front_ports[pk][0])
+
+    def get_components(self):
+        """
+        Return a mapping of every connected node to an identifier of the connected component to which it belongs. Nodes
+        are represented as (content type ID, object ID) tuples. Two nodes belong to the same component if a path can
+        be traced between them via cables, wireless links, front/rear port mappings, or circuits.
+        """
+        parents = {}
+
+        def find(node):
+            root = node
+            while parents.get(root, root) != root:
+                root = parents[root]
+            # Compress the path to the root
+            while node != root:
+                parent = parents[node]
+                parents[node] = root
+                node = parent
+            return root
+
+        def union(a, b):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parents[root_b] = root_a
+
+        # Cables
+        for (cable_id, _), terminations in self.cable_terminations.items():
+            for termination in terminations:
+                union((self.cable_ct, cable_id), termination)
+
+        # Wireless links
+        for _, interface_a_id, interface_b_id in self.wireless_links.values():
+            union((self.interface_ct, interface_a_id), (self.interface_ct, interface_b_id))
+
+        # Front/rear port mappings
+        for pk, (_, rear_port_id, _) in self.front_ports.items():
+            union((self.rearport_ct, rear_port_id), (self.frontport_ct, pk))
+
+        # Circuits
+        for pk, (circuit_id, _, _, _) in self.circuit_terminations.items():
+            union(('circuit', circuit_id), (self.circuittermination_ct, pk))
+
+        return {node: find(node) for node in parents}
+
+    def get_shards(self, origins, count):
+        """
+        Partition origins into at most `count` shards of roughly equal size. All origins belonging to the same connected
+        component are assigned to the same shard, so that each shard can be traced independently.
+
+        :param origins: Iterable of (content type ID, object ID) tuples
+        :param count: The maximum number of shards to return
+        """
+        components = self.get_components()
+        origins_by_component = defaultdict(list)
+        for origin in origins:
+            origins_by_component[components.get(origin, origin)].append(origin)
+
+        # Assign the largest components first, each to the smallest shard
+        shards = [(0, i, []) for i in range(count)]
+        for members in sorted(origins_by_component.values(), key=len, reverse=True):
+            size, i, shard = heapq.heappop(shards)
+            shard.extend(members)
+            heapq.heappush(shards, (size + len(members), i, shard))
+
+        return [shard for _, _, shard in sorted(shards, key=lambda s: s[1]) if shard]
+
+    def trace(self, termination_type, termination_ids):
+        """
+        Return a new (unsaved) CablePath traced from the specified terminations, or None if the terminations are not
+        connected. Mirrors the logic of CablePath.from_origin().
+
+        :param termination_type: ContentType ID of the originating terminations
+        :param termination_ids: List of originating termination IDs
+        """
+        path = []
+        position_stack = []
+        is_complete = False
+        is_active = True
+        is_split = False
+
+        while termination_ids:
+
+            # Check for a split path
+            if len({self.get_link(termination_type, pk) for pk in termination_ids}) > 1:
+                is_split = True
+                break
+
+            # Step 1: Record the near-end termination object(s)
+            path.append([
+                compile_path_node(termination_type, pk) for pk in termination_ids
+            ])
+
+            # Step 2: Determine the attached link (Cable or WirelessLink), if any
+            link = self.get_link(termination_type, termination_ids[0])
+            if link is None and len(path) == 1:
+                return None
+            elif link is None:
+                break
+            link_type, link_id = link
+
+            # Step 3: Record the link and determine the far-end terminations
+            path.append([compile_path_node(link_type, link_id)])
+            if link_type == self.cable_ct:
+                status = self.cable_statuses[link_id]
+                cable_ends = self.cable_ends[termination_type]
+                local_cable_ends = sorted(cable_ends[pk] for pk in termination_ids if pk in cable_ends)
+                assert all(end == local_cable_ends[0] for end in local_cable_ends[1:])
+                remote_cable_end = CableEndChoices.SIDE_A \
+                    if local_cable_ends[0] == CableEndChoices.SIDE_B else CableEndChoices.SIDE_B
+                remote_terminations = self.cable_terminations[(link_id, remote_cable_end)]
+            else:
+                status, interface_a_id, interface_b_id = self.wireless_links[link_id]
+                remote_id = interface_b_id if interface_a_id == termination_ids[0] else interface_a_id
+                remote_terminations = [(self.interface_ct, remote_id)]
+            if status != LinkStatusChoices.STATUS_CONNECTED:
+                is_active = False
+
+            # Step 4: Record the far-end termination object(s)
+            path.append([
+                compile_path_node(ct_id, pk) for ct_id, pk in remote_terminations
+            ])
+
+            # Step 5: Determine the "next hop" terminations, if applicable
+            if not remote_terminations:
+                break
+            remote_type = remote_terminations[0][0]
+            remote_ids = [pk for _, pk in remote_terminations]
+
+            if remote_type == self.frontport_ct:
+                # Follow FrontPorts to their corresponding RearPorts
+                rear_port_ids = sorted(
+                    {self.front_ports[pk][1] for pk in remote_ids},
+                    key=lambda pk: self.rear_ports[pk][0]
+                )
+                if len(rear_port_ids) > 1:
+                    assert all(self.rear_ports[pk][1] == 1 for pk in rear_port_ids)
+                elif self.rear_ports[rear_port_ids[0]][1] > 1:
+                    position_stack.append([self.front_ports[pk][2] for pk in remote_ids])
+
+                termination_type, termination_ids = self.rearport_ct, rear_port_ids
+
+            elif remote_type == self.rearport_ct:
+
+                if len(remote_ids) > 1 or self.rear_ports[remote_ids[0]][1] == 1:
+                    front_port_ids = self.get_front_ports(remote_ids, [1])
+                elif position_stack:
+                    front_port_ids = self.get_front_ports(remote_ids[:1], position_stack.pop())
+                else:
+                    # No position indicated: path has split, so we stop at the RearPorts
+                    is_split = True
+                    break
+
+                termination_type, termination_ids = self.frontport_ct, front_port_ids
+
+            elif remote_type == self.circuittermination_ct:
+                # Follow a CircuitTermination to its corresponding CircuitTermination (A to Z or vice versa)
+                circuit_id, term_side = self.circuit_terminations[remote_ids[0]][:2]
+                assert all(self.circuit_terminations[pk][1] == term_side for pk in remote_ids[1:])
+                peer_id = self.circuit_sides.get((circuit_id, 'Z' if term_side == 'A' else 'A'))
+                if peer_id is None:
+                    break
+                _, _, site_id, provider_network_id = self.circuit_terminations[peer_id]
+                if provider_network_id:
+                    # Circuit terminates to a ProviderNetwork
+                    path.extend([
+                        [compile_path_node(self.circuittermination_ct, peer_id)],
+                        [compile_path_node(self.providernetwork_ct, provider_network_id)],
+                    ])
+                    break
+                elif site_id and peer_id not in self.links[self.circuittermination_ct]:
+                    # Circuit terminates to a Site
+                    path.extend([
+                        [compile_path_node(self.circuittermination_ct, peer_id)],
+                        [compile_path_node(self.site_ct, site_id)],
+                    ])
+                    break
+
+                termination_type, termination_ids = self.circuittermination_ct, [peer_id]
+
+            # Anything else marks the end of the path
+            else:
+                is_complete = True
+                break
+
+        return CablePath(
+            path=path,
+            is_complete=is_complete,
+            is_active=is_active,
+            is_split=is_split,
+            _nodes=list(itertools.chain(*path))
+        )
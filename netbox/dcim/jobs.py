@@ -0,0 +1,76 @@
+import logging
+import traceback
+
+from django.db import transaction
+
+from extras.choices import JobResultStatusChoices
+from .constants import SITE_CASCADE_BATCH_SIZE
+from .utils import get_site_cascade
+
+__all__ = (
+    'run_site_cascade',
+)
+
+
+def run_site_cascade(model, pk, **kwargs):
+    """
+    Update the objects within a Location or Rack to reflect its current Site (and, for a Rack, Location) assignment as
+    a background job. Objects are updated in batches, each committed independently, so that row locks are held only
+    briefly. Progress is recorded on the JobResult as each batch is completed.
+
+    :param model: Location or Rack
+    :param pk: The primary key of the Location or Rack
+    """
+    job_result = kwargs.pop('job_result')
+    logger = logging.getLogger('netbox.jobs.run_site_cascade')
+
+    job_result.status = JobResultStatusChoices.STATUS_RUNNING
+    job_result.data = {
+        'total': 0,
+        'processed': 0,
+        'succeeded': 0,
+        'errors': [],
+    }
+    job_result.save()
+
+    # The object may have been deleted or moved again since the job was enqueued
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        logger.info(f"{model._meta.verbose_name} {pk} no longer exists")
+        job_result.set_status(JobResultStatusChoices.STATUS_COMPLETED)
+        job_result.save()
+        return
+    job_result.data['return_url'] = instance.get_absolute_url()
+
+    try:
+        cascade = [
+            (queryset.model, list(queryset.values_list('pk', flat=True)), values)
+            for queryset, values in get_site_cascade(instance)
+        ]
+        job_result.data['total'] = sum(len(pk_list) for _, pk_list, _ in cascade)
+        job_result.save()
+        logger.info(f"Updating {job_result.data['total']} objects within {model._meta.verbose_name} {instance}")
+
+        for child_model, pk_list, values in cascade:
+            for i in range(0, len(pk_list), SITE_CASCADE_BATCH_SIZE):
+                batch = pk_list[i:i + SITE_CASCADE_BATCH_SIZE]
+                with transaction.atomic():
+                    job_result.data['succeeded'] += child_model.objects.filter(pk__in=batch).update(**values)
+                job_result.data['processed'] += len(batch)
+                job_result.save()
+
+    except Exception as e:
+        # Batches which have already been committed are retained
+        stacktrace = traceback.format_exc()
+        logger.error(f"Exception raised while updating objects within {instance}: {e}\n{stacktrace}")
+        job_result.data['errors'].append({
+            'object': str(instance),
+            'errors': [f"An exception occurred: {type(e).__name__}: {e}"],
+        })
+        job_result.set_status(JobResultStatusChoices.STATUS_ERRORED)
+        job_result.save()
+        return
+
+    job_result.set_status(JobResultStatusChoices.STATUS_COMPLETED)
+    job_result.save()
+    logger.info(f"Updated {job_result.data['succeeded']} objects in {job_result.duration}")
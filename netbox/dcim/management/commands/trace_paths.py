@@ -1,8 +1,13 @@
+import multiprocessing
+from collections import defaultdict
+
 from django.core.management.base import BaseCommand
 from django.core.management.color import no_style
-from django.db import connection
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, connections, transaction
 from django.db.models import Q
 
+from dcim.graph import CablePathGraph
 from dcim.models import CablePath, ConsolePort, ConsoleServerPort, Interface, PowerFeed, PowerOutlet, PowerPort
 from dcim.signals import create_cablepath
 
@@ -15,6 +20,67 @@ ENDPOINT_MODELS = (
     PowerPort
 )
 
+# Cable graph shared with worker processes (inherited on fork)
+_graph = None
+
+
+def get_origins(model, force=False):
+    """
+    Return all cabled instances of the given endpoint model. Unless `force` is True, instances which already have a
+    CablePath are excluded.
+    """
+    params = Q(cable__isnull=False)
+    if hasattr(model, 'wireless_link'):
+        params |= Q(wireless_link__isnull=False)
+    origins = model.objects.filter(params)
+    if not force:
+        origins = origins.filter(_path__isnull=True)
+    return origins
+
+
+def save_paths(model, batch):
+    """
+    Save a batch of new CablePaths and record each on its originating object.
+
+    :param model: The model of the originating objects
+    :param batch: List of (origin ID, CablePath) tuples
+    """
+    with transaction.atomic():
+        CablePath.objects.bulk_create([cp for _, cp in batch])
+        model.objects.bulk_update(
+            [model(pk=origin_id, _path=cp) for origin_id, cp in batch],
+            fields=['_path']
+        )
+
+
+def trace_shard(args):
+    """
+    Trace and save the CablePaths for a shard of origins within a worker process. Each batch is committed as it is
+    written, so that the work completed by a shard survives the failure of any other. Returns a tuple of the shard
+    index, the number of paths created, and an error message (if the shard failed).
+    """
+    index, origins, batch_size = args
+    batches = defaultdict(list)
+    count = 0
+    try:
+        for termination_type, pk in origins:
+            cp = _graph.trace(termination_type, [pk])
+            if cp:
+                batches[termination_type].append((pk, cp))
+                count += 1
+            if len(batches[termination_type]) >= batch_size:
+                model = ContentType.objects.get_for_id(termination_type).model_class()
+                save_paths(model, batches.pop(termination_type))
+        for termination_type, batch in batches.items():
+            model = ContentType.objects.get_for_id(termination_type).model_class()
+            save_paths(model, batch)
+    except Exception as e:
+        return index, count, str(e)
+    finally:
+        connections.close_all()
+
+    return index, count, None
+
 
 class Command(BaseCommand):
     help = "Generate any missing cable paths among all cable termination objects in NetBox"
@@ -28,6 +94,19 @@ class Command(BaseCommand):
             "--no-input", action='store_true', dest='no_input',
             help="Do not prompt user for any input/confirmation"
         )
+        parser.add_argument(
+            "--bulk", action='store_true', dest='bulk',
+            help="Load all cables into memory and trace paths in bulk"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, dest='batch_size',
+            help="Number of cable paths to write per query when tracing in bulk (default: 1000)"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=0, dest='workers',
+            help="Trace paths in bulk using the specified number of worker processes. If interrupted, run the "
+                 "command again without --force to resume tracing of the remaining paths."
+        )
 
     def draw_progress_bar(self, percentage):
         """
@@ -36,7 +115,55 @@ class Command(BaseCommand):
         bar_size = int(percentage / 5)
         self.stdout.write(f"\r  [{'#' * bar_size}{' ' * (20-bar_size)}] {int(percentage)}%", ending='')
 
+    def trace_parallel(self, options):
+        """
+        Divide all origins into shards of independent connected components and trace each shard in a pool of worker
+        processes.
+        """
+        origins = []
+        for model in ENDPOINT_MODELS:
+            termination_type = ContentType.objects.get_for_model(model).pk
+            origins.extend(
+                (termination_type, pk) for pk in get_origins(model, options['force']).values_list('pk', flat=True)
+            )
+        if not origins:
+            self.stdout.write('Found no missing paths; skipping')
+            return
+
+        shards = _graph.get_shards(origins, options['workers'] * 4)
+        self.stdout.write(
+            f'Retracing {len(origins)} cabled endpoints in {len(shards)} shards using {options["workers"]} workers...'
+        )
+
+        # Close database connections before forking; each worker will open its own
+        connections.close_all()
+        failed = 0
+        completed = 0
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(options['workers']) as pool:
+            args = [(i, shard, options['batch_size']) for i, shard in enumerate(shards, start=1)]
+            for index, count, error in pool.imap_unordered(trace_shard, args):
+                completed += len(shards[index - 1])
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'  Shard {index}/{len(shards)} failed after retracing {count} paths: {error}'
+                    ))
+                else:
+                    self.stdout.write(
+                        f'  Shard {index}/{len(shards)} finished: retraced {count} paths '
+                        f'({int(completed * 100 / len(origins))}% complete)'
+                    )
+
+        if failed:
+            self.stdout.write(self.style.ERROR(
+                f'{failed} shards failed. Run this command again without --force to resume tracing.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'  Retraced {len(origins)} cabled endpoints'))
+
     def handle(self, *model_names, **options):
+        global _graph
 
         # If --force was passed, first delete all existing CablePaths
         if options['force']:
@@ -66,24 +193,45 @@ class Command(BaseCommand):
                 for sql in sequence_sql:
                     cursor.execute(sql)
 
+        # Load the cabling graph into memory
+        if options['bulk'] or options['workers']:
+            self.stdout.write('Loading cable graph...')
+            _graph = CablePathGraph()
+
+        # Retrace paths in parallel
+        if options['workers']:
+            self.trace_parallel(options)
+            self.stdout.write(self.style.SUCCESS('Finished.'))
+            return
+
         # Retrace paths
         for model in ENDPOINT_MODELS:
-            params = Q(cable__isnull=False)
-            if hasattr(model, 'wireless_link'):
-                params |= Q(wireless_link__isnull=False)
-            origins = model.objects.filter(params)
-            if not options['force']:
-                origins = origins.filter(_path__isnull=True)
+            origins = get_origins(model, options['force'])
             origins_count = origins.count()
             if not origins_count:
                 self.stdout.write(f'Found no missing {model._meta.verbose_name} paths; skipping')
                 continue
             self.stdout.write(f'Retracing {origins_count} cabled {model._meta.verbose_name_plural}...')
             i = 0
-            for i, obj in enumerate(origins, start=1):
-                create_cablepath([obj])
-                if not i % 100:
-                    self.draw_progress_bar(i * 100 / origins_count)
+            if options['bulk']:
+                termination_type = ContentType.objects.get_for_model(model).pk
+                batch = []
+                for i, pk in enumerate(origins.values_list('pk', flat=True).iterator(), start=1):
+                    cp = _graph.trace(termination_type, [pk])
+                    if cp:
+                        batch.append((pk, cp))
+                    if len(batch) >= options['batch_size']:
+                        save_paths(model, batch)
+                        batch = []
+                    if not i % 100:
+                        self.draw_progress_bar(i * 100 / origins_count)
+                if batch:
+                    save_paths(model, batch)
+            else:
+                for i, obj in enumerate(origins, start=1):
+                    create_cablepath([obj])
+                    if not i % 100:
+                        self.draw_progress_bar(i * 100 / origins_count)
             self.draw_progress_bar(100)
             self.stdout.write(self.style.SUCCESS(f'\n  Retraced {i} {model._meta.verbose_name_plural}'))
 
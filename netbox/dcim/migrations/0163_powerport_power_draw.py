@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dcim', '0162_cablepath_nodes_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='powerport',
+            name='_power_draw',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -3,22 +3,28 @@ from collections import defaultdict
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Sum
+from django.db.models.signals import post_save
 from django.dispatch import Signal
 from django.urls import reverse
 
 from dcim.choices import *
 from dcim.constants import *
 from dcim.fields import PathField
-from dcim.utils import decompile_path_node, object_to_path_node, path_node_to_object
+from dcim.querysets import CablePathQuerySet
+from dcim.utils import (
+    decompile_path_node, object_to_path_node, path_node_to_object, trace_cable_end, update_cable_power_draws,
+)
 from netbox.models import NetBoxModel
 from utilities.fields import ColorField
 from utilities.querysets import RestrictedQuerySet
 from utilities.utils import to_meters
 from wireless.models import WirelessLink
-from .device_components import FrontPort, RearPort
+from .device_components import FrontPort, PowerOutlet, PowerPort, RearPort
+from .power import PowerFeed
 
 __all__ = (
     'Cable',
@@ -93,6 +99,11 @@ class Cable(NetBoxModel):
         # Cache the original status so we can check later if it's been changed
         self._orig_status = self.status
 
+        # Cache the original values of other attributes drawn in cable traces (skipping any deferred fields)
+        self._orig_trace_fields = {
+            field: self.__dict__.get(field) for field in ('label', 'type', 'color', 'length', 'length_unit')
+        }
+
         self._terminations_modified = False
 
         # Assign or retrieve A/B terminations
@@ -206,6 +217,60 @@ class Cable(NetBoxModel):
 
         trace_paths.send(Cable, instance=self, created=_created)
 
+    @classmethod
+    def bulk_create_with_terminations(cls, cables, batch_size=100):
+        """
+        Create many new Cables at once, along with their CableTerminations, using a fixed number of queries per batch.
+        Each Cable must have its A and B terminations assigned and must already have been validated. Terminations
+        must not be shared among the Cables.
+
+        Cable paths are traced for each Cable as if it had been saved individually, so callers will typically want to
+        defer path updates until all Cables have been created.
+
+        :param cables: A list of unsaved Cable instances
+        :param batch_size: The number of objects to create per query
+        """
+        for cable in cables:
+            if cable.length and cable.length_unit:
+                cable._abs_length = to_meters(cable.length, cable.length_unit)
+            else:
+                cable._abs_length = None
+        cls.objects.bulk_create(cables, batch_size=batch_size)
+
+        cable_terminations = []
+        terminations = defaultdict(list)
+        for cable in cables:
+            cable._pk = cable.pk
+            for cable_end, objs in ((CableEndChoices.SIDE_A, cable.a_terminations),
+                                    (CableEndChoices.SIDE_B, cable.b_terminations)):
+                for termination in objs:
+                    cable_termination = CableTermination(cable=cable, cable_end=cable_end, termination=termination)
+                    cable_termination.cache_related_objects()
+                    cable_terminations.append(cable_termination)
+                    termination.cable = cable
+                    termination.cable_end = cable_end
+                    terminations[termination._meta.model].append(termination)
+        CableTermination.objects.bulk_create(cable_terminations, batch_size=batch_size)
+
+        # Set the cable on the terminating objects
+        for model, objs in terminations.items():
+            model.objects.bulk_update(objs, ['cable', 'cable_end'], batch_size=batch_size)
+
+        for cable in cables:
+            # Emulate save() for change logging and webhooks
+            post_save.send(cls, instance=cable, created=True, update_fields=None, raw=False, using=cable._state.db)
+            for objs in (cable.a_terminations, cable.b_terminations):
+                trace_cable_end(objs)
+
+        # Update the power draw of PowerPorts connected by power cables
+        power_models = (PowerFeed, PowerOutlet, PowerPort)
+        power_cable_ids = [
+            cable.pk for cable in cables
+            if any(isinstance(t, power_models) for t in [*cable.a_terminations, *cable.b_terminations])
+        ]
+        if power_cable_ids:
+            update_cable_power_draws(*power_cable_ids)
+
     def get_status_color(self):
         return LinkStatusChoices.colors.get(self.status)
 
@@ -374,7 +439,8 @@ class CablePath(models.Model):
     if the instance represents a complete end-to-end path from origin(s) to destination(s). `is_split` is True if the
     path diverges across multiple cables.
 
-    `_nodes` retains a flattened list of all nodes within the path to enable simple filtering.
+    `_nodes` retains a flattened list of all nodes within the path to enable simple filtering. It is covered by a GIN
+    index, so that paths traversing a particular node can be found without scanning the entire table.
     """
     path = models.JSONField(
         default=list
@@ -390,6 +456,13 @@ class CablePath(models.Model):
     )
     _nodes = PathField()
 
+    objects = CablePathQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            GinIndex(fields=('_nodes',), name='dcim_cablepath_nodes'),
+        )
+
     def __str__(self):
         return f"Path #{self.pk}: {len(self.path)} hops"
 
@@ -452,15 +525,25 @@ class CablePath(models.Model):
         Create a new CablePath instance as traced from the given termination objects. These can be any object to which a
         Cable or WirelessLink connects (interfaces, console ports, circuit termination, etc.). All terminations must be
         of the same type and must belong to the same parent object.
+
+        Each hop is resolved using a fixed number of queries, regardless of the number of terminations involved.
         """
         from circuits.models import CircuitTermination
 
         if not terminations:
             return None
 
+        def get_link_id(termination):
+            # Identify the attached link without retrieving it
+            if termination.cable_id:
+                return Cable, termination.cable_id
+            if getattr(termination, 'wireless_link_id', None):
+                return WirelessLink, termination.wireless_link_id
+            return None
+
         # Ensure all originating terminations are attached to the same link
         if len(terminations) > 1:
-            assert all(t.link == terminations[0].link for t in terminations[1:])
+            assert all(get_link_id(t) == get_link_id(terminations[0]) for t in terminations[1:])
 
         path = []
         position_stack = []
@@ -475,7 +558,7 @@ class CablePath(models.Model):
 
             # Check for a split path (e.g. rear port fanning out to multiple front ports with
             # different cables attached)
-            if len(set(t.link for t in terminations)) > 1:
+            if len(set(get_link_id(t) for t in terminations)) > 1:
                 is_split = True
                 break
 
@@ -502,21 +585,37 @@ class CablePath(models.Model):
             # Step 4: Determine the far-end terminations
             if isinstance(link, Cable):
                 termination_type = ContentType.objects.get_for_model(terminations[0])
-                local_cable_terminations = CableTermination.objects.filter(
-                    termination_type=termination_type,
-                    termination_id__in=[t.pk for t in terminations]
-                )
+                termination_ids = {t.pk for t in terminations}
+                cable_terminations = list(CableTermination.objects.filter(cable=link).order_by('pk'))
+                local_cable_terminations = [
+                    ct for ct in cable_terminations
+                    if ct.termination_type_id == termination_type.pk and ct.termination_id in termination_ids
+                ]
                 # Terminations must all belong to same end of Cable
-                local_cable_end = local_cable_terminations[0].cable_end
-                assert all(ct.cable_end == local_cable_end for ct in local_cable_terminations[1:])
-                remote_cable_terminations = CableTermination.objects.filter(
-                    cable=link,
-                    cable_end='A' if local_cable_end == 'B' else 'B'
-                )
-                remote_terminations = [ct.termination for ct in remote_cable_terminations]
+                local_cable_end = min(ct.cable_end for ct in local_cable_terminations)
+                assert all(ct.cable_end == local_cable_end for ct in local_cable_terminations)
+                remote_cable_terminations = [
+                    ct for ct in cable_terminations if ct.cable_end != local_cable_end
+                ]
+                remote_terminations = []
+                if remote_cable_terminations:
+                    # All remote terminations are of the same type, so they can be retrieved in a single query
+                    remote_model = ContentType.objects.get_for_id(
+                        remote_cable_terminations[0].termination_type_id
+                    ).model_class()
+                    remote_objects = remote_model.objects.in_bulk(
+                        [ct.termination_id for ct in remote_cable_terminations]
+                    )
+                    remote_terminations = [
+                        remote_objects[ct.termination_id] for ct in remote_cable_terminations
+                        if ct.termination_id in remote_objects
+                    ]
             else:
                 # WirelessLink
-                remote_terminations = [link.interface_b] if link.interface_a is terminations[0] else [link.interface_a]
+                if link.interface_a_id == terminations[0].pk:
+                    remote_terminations = [link.interface_b]
+                else:
+                    remote_terminations = [link.interface_a]
 
             # Step 5: Record the far-end termination object(s)
             path.append([
@@ -531,7 +630,7 @@ class CablePath(models.Model):
                 # Follow FrontPorts to their corresponding RearPorts
                 rear_ports = RearPort.objects.filter(
                     pk__in=[t.rear_port_id for t in remote_terminations]
-                )
+                ).select_related('cable')
                 if len(rear_ports) > 1:
                     assert all(rp.positions == 1 for rp in rear_ports)
                 elif rear_ports[0].positions > 1:
@@ -545,12 +644,12 @@ class CablePath(models.Model):
                     front_ports = FrontPort.objects.filter(
                         rear_port_id__in=[rp.pk for rp in remote_terminations],
                         rear_port_position=1
-                    )
+                    ).select_related('cable')
                 elif position_stack:
                     front_ports = FrontPort.objects.filter(
                         rear_port_id=remote_terminations[0].pk,
                         rear_port_position__in=position_stack.pop()
-                    )
+                    ).select_related('cable')
                 else:
                     # No position indicated: path has split, so we stop at the RearPorts
                     is_split = True
@@ -563,9 +662,9 @@ class CablePath(models.Model):
                 term_side = remote_terminations[0].term_side
                 assert all(ct.term_side == term_side for ct in remote_terminations[1:])
                 circuit_termination = CircuitTermination.objects.filter(
-                    circuit=remote_terminations[0].circuit,
+                    circuit_id=remote_terminations[0].circuit_id,
                     term_side='Z' if term_side == 'A' else 'A'
-                ).first()
+                ).select_related('cable', 'site', 'provider_network').first()
                 if circuit_termination is None:
                     break
                 elif circuit_termination.provider_network:
@@ -611,15 +710,17 @@ class CablePath(models.Model):
         else:
             self.delete()
 
-    def _get_path(self):
+    @staticmethod
+    def _prefetch_nodes(cable_paths):
         """
-        Return the path as a list of prefetched objects.
+        Return all objects within the given CablePaths, mapped by ContentType ID and object ID.
         """
-        # Compile a list of IDs to prefetch for each type of model in the path
-        to_prefetch = defaultdict(list)
-        for node in self._nodes:
-            ct_id, object_id = decompile_path_node(node)
-            to_prefetch[ct_id].append(object_id)
+        # Compile a list of IDs to prefetch for each type of model in the paths
+        to_prefetch = defaultdict(set)
+        for cable_path in cable_paths:
+            for node in cable_path._nodes:
+                ct_id, object_id = decompile_path_node(node)
+                to_prefetch[ct_id].add(object_id)
 
         # Prefetch path objects using one query per model type. Prefetch related devices where appropriate.
         prefetched = {}
@@ -632,6 +733,15 @@ class CablePath(models.Model):
                 obj.id: obj for obj in queryset
             }
 
+        return prefetched
+
+    def _get_path(self, prefetched=None):
+        """
+        Return the path as a list of prefetched objects.
+        """
+        if prefetched is None:
+            prefetched = self._prefetch_nodes([self])
+
         # Replicate the path using the prefetched objects.
         path = []
         for step in self.path:
@@ -647,6 +757,16 @@ class CablePath(models.Model):
 
         return path
 
+    @classmethod
+    def prefetch_path_objects(cls, cable_paths):
+        """
+        Populate `path_objects` for all the given CablePaths at once, using one query per type of object across all
+        paths rather than per path.
+        """
+        prefetched = cls._prefetch_nodes(cable_paths)
+        for cable_path in cable_paths:
+            cable_path._path_objects = cable_path._get_path(prefetched)
+
     def get_cable_ids(self):
         """
         Return all Cable IDs within the path.
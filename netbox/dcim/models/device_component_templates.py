@@ -312,10 +312,17 @@ class PowerOutletTemplate(ModularComponentTemplateModel):
                     f"Parent power port ({self.power_port}) must belong to the same module type"
                 )
 
-    def instantiate(self, **kwargs):
+    def instantiate(self, power_ports=None, **kwargs):
+        """
+        :param power_ports: A mapping of names to the PowerPorts of the new component's parent (optional). If not
+            specified, the parent PowerPort is retrieved from the database.
+        """
         if self.power_port:
             power_port_name = self.power_port.resolve_name(kwargs.get('module'))
-            power_port = PowerPort.objects.get(name=power_port_name, **kwargs)
+            if power_ports is not None:
+                power_port = power_ports[power_port_name]
+            else:
+                power_port = PowerPort.objects.get(name=power_port_name, **kwargs)
         else:
             power_port = None
         return self.component_model(
@@ -458,10 +465,17 @@ class FrontPortTemplate(ModularComponentTemplateModel):
         except RearPortTemplate.DoesNotExist:
             pass
 
-    def instantiate(self, **kwargs):
+    def instantiate(self, rear_ports=None, **kwargs):
+        """
+        :param rear_ports: A mapping of names to the RearPorts of the new component's parent (optional). If not
+            specified, the RearPort is retrieved from the database.
+        """
         if self.rear_port:
             rear_port_name = self.rear_port.resolve_name(kwargs.get('module'))
-            rear_port = RearPort.objects.get(name=rear_port_name, **kwargs)
+            if rear_ports is not None:
+                rear_port = rear_ports[rear_port_name]
+            else:
+                rear_port = RearPort.objects.get(name=rear_port_name, **kwargs)
         else:
             rear_port = None
         return self.component_model(
@@ -655,11 +669,25 @@ class InventoryItemTemplate(MPTTModel, ComponentTemplateModel):
         ordering = ('device_type__id', 'parent__id', '_name')
         unique_together = ('device_type', 'parent', 'name')
 
-    def instantiate(self, **kwargs):
-        parent = InventoryItem.objects.get(name=self.parent.name, **kwargs) if self.parent else None
+    def instantiate(self, inventory_items=None, components=None, **kwargs):
+        """
+        :param inventory_items: A mapping of names to the InventoryItems of the new item's Device (optional). If not
+            specified, the parent InventoryItem is retrieved from the database.
+        :param components: A mapping of component models to mappings of names to the components of the new item's
+            Device (optional). If not specified, the assigned component is retrieved from the database.
+        """
+        if not self.parent:
+            parent = None
+        elif inventory_items is not None:
+            parent = inventory_items[self.parent.name]
+        else:
+            parent = InventoryItem.objects.get(name=self.parent.name, **kwargs)
         if self.component:
             model = self.component.component_model
-            component = model.objects.get(name=self.component.name, **kwargs)
+            if components is not None:
+                component = components[model][self.component.name]
+            else:
+                component = model.objects.get(name=self.component.name, **kwargs)
         else:
             component = None
         return self.component_model(
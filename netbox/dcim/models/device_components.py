@@ -326,6 +326,11 @@ class PowerPort(ModularComponentModel, CabledObjectModel, PathEndpoint):
         validators=[MinValueValidator(1)],
         help_text="Allocated power draw (watts)"
     )
+    _power_draw = models.JSONField(
+        blank=True,
+        null=True,
+        editable=False
+    )
 
     clone_fields = ('device', 'module', 'maximum_draw', 'allocated_draw')
 
@@ -374,7 +379,24 @@ class PowerPort(ModularComponentModel, CabledObjectModel, PathEndpoint):
 
     def get_power_draw(self):
         """
-        Return the allocated and maximum power draw (in VA) and child PowerOutlet count for this PowerPort.
+        Return the allocated and maximum power draw (in VA) and child PowerOutlet count for this PowerPort. The result
+        is read from a rollup which is maintained as related power ports, outlets, feeds, and cables change; it is
+        calculated upon first access if not yet populated.
+        """
+        if self._power_draw is None:
+            self.update_power_draw()
+        return self._power_draw
+
+    def update_power_draw(self):
+        """
+        Recalculate and save the rollup returned by get_power_draw().
+        """
+        self._power_draw = self.calculate_power_draw()
+        PowerPort.objects.filter(pk=self.pk).update(_power_draw=self._power_draw)
+
+    def calculate_power_draw(self):
+        """
+        Calculate the allocated and maximum power draw (in VA) and child PowerOutlet count for this PowerPort.
         """
         from dcim.models import PowerFeed
 
@@ -447,6 +469,12 @@ class PowerOutlet(ModularComponentModel, CabledObjectModel, PathEndpoint):
         ordering = ('device', '_name')
         unique_together = ('device', 'name')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Save a reference to the original power port, so that its power draw can be updated if the outlet is moved
+        self._original_power_port_id = self.__dict__.get('power_port_id')
+
     def get_absolute_url(self):
         return reverse('dcim:poweroutlet', kwargs={'pk': self.pk})
 
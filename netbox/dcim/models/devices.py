@@ -1,4 +1,5 @@
 import decimal
+from collections import defaultdict
 
 import yaml
 
@@ -7,18 +8,23 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import F, ProtectedError
+from django.db.models import F, Max, ProtectedError
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
 from dcim.choices import *
 from dcim.constants import *
+from dcim.utils import get_component_instantiation_queue
 from extras.models import ConfigContextModel
 from extras.querysets import ConfigContextModelQuerySet
 from netbox.config import ConfigItem
 from netbox.models import OrganizationalModel, NetBoxModel
 from utilities.choices import ColorChoices
 from utilities.fields import ColorField, NaturalOrderingField
+from .device_component_templates import (
+    ConsolePortTemplate, ConsoleServerPortTemplate, DeviceBayTemplate, FrontPortTemplate, InterfaceTemplate,
+    InventoryItemTemplate, ModuleBayTemplate, PowerOutletTemplate, PowerPortTemplate, RearPortTemplate,
+)
 from .device_components import *
 
 
@@ -236,12 +242,8 @@ class DeviceType(NetBoxModel):
         if self.pk and self.u_height > self._original_u_height:
             for d in Device.objects.filter(device_type=self, position__isnull=False):
                 face_required = None if self.is_full_depth else d.face
-                u_available = d.rack.get_available_units(
-                    u_height=self.u_height,
-                    rack_face=face_required,
-                    exclude=[d.pk]
-                )
-                if d.position not in u_available:
+                occupancy = d.rack.get_occupancy(exclude=[d.pk])
+                if not occupancy.is_available(d.position, u_height=self.u_height, face=face_required):
                     raise ValidationError({
                         'u_height': "Device {} in rack {} does not have sufficient space to accommodate a height of "
                                     "{}U".format(d, d.rack, self.u_height)
@@ -668,6 +670,12 @@ class Device(NetBoxModel, ConfigContextModel):
             return f'{self.device_type.manufacturer} {self.device_type.model} ({self.pk})'
         return super().__str__()
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Save a reference to the original rack, so that its elevation can be refreshed if the device is moved
+        self._original_rack_id = self.__dict__.get('rack_id')
+
     @classmethod
     def get_prerequisite_models(cls):
         return [apps.get_model('dcim.Site'), DeviceRole, DeviceType, ]
@@ -756,10 +764,10 @@ class Device(NetBoxModel, ConfigContextModel):
                 # Validate rack space
                 rack_face = self.face if not self.device_type.is_full_depth else None
                 exclude_list = [self.pk] if self.pk else []
-                available_units = self.rack.get_available_units(
-                    u_height=self.device_type.u_height, rack_face=rack_face, exclude=exclude_list
-                )
-                if self.position and self.position not in available_units:
+                occupancy = self.rack.get_occupancy(exclude=exclude_list)
+                if self.position and not occupancy.is_available(
+                    self.position, u_height=self.device_type.u_height, face=rack_face
+                ):
                     raise ValidationError({
                         'position': f"U{self.position} is already occupied or does not have sufficient space to "
                                     f"accommodate this device type: {self.device_type} ({self.device_type.u_height}U)"
@@ -826,38 +834,14 @@ class Device(NetBoxModel, ConfigContextModel):
 
         super().save(*args, **kwargs)
 
-        # If this is a new Device, instantiate all of the related components per the DeviceType definition
+        # If this is a new Device, instantiate all of the related components per the DeviceType definition. If
+        # instantiation has been deferred, the components will be created along with those of other new Devices.
         if is_new:
-            ConsolePort.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.consoleporttemplates.all()]
-            )
-            ConsoleServerPort.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.consoleserverporttemplates.all()]
-            )
-            PowerPort.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.powerporttemplates.all()]
-            )
-            PowerOutlet.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.poweroutlettemplates.all()]
-            )
-            Interface.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.interfacetemplates.all()]
-            )
-            RearPort.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.rearporttemplates.all()]
-            )
-            FrontPort.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.frontporttemplates.all()]
-            )
-            ModuleBay.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.modulebaytemplates.all()]
-            )
-            DeviceBay.objects.bulk_create(
-                [x.instantiate(device=self) for x in self.device_type.devicebaytemplates.all()]
-            )
-            # Avoid bulk_create to handle MPTT
-            for x in self.device_type.inventoryitemtemplates.all():
-                x.instantiate(device=self).save()
+            new_objects = get_component_instantiation_queue()
+            if new_objects is not None:
+                new_objects.append(self)
+            else:
+                Device.instantiate_components([self])
 
         # Update Site and Rack assignment for any child Devices
         devices = Device.objects.filter(parent_bay__device=self)
@@ -866,6 +850,93 @@ class Device(NetBoxModel, ConfigContextModel):
             device.rack = self.rack
             device.save()
 
+    @classmethod
+    def instantiate_components(cls, devices):
+        """
+        Instantiate all components for the given new Devices per their DeviceType definitions. Component templates are
+        retrieved once for all DeviceTypes, and each type of component is created for all Devices at once.
+        """
+        device_type_ids = {device.device_type_id for device in devices}
+
+        # The components created on each Device, by model and name
+        components = defaultdict(lambda: defaultdict(dict))
+
+        def get_templates(template_model, *related):
+            templates = defaultdict(list)
+            queryset = template_model.objects.filter(device_type__in=device_type_ids).prefetch_related(*related)
+            for template in queryset:
+                templates[template.device_type_id].append(template)
+            return templates
+
+        def instantiate(template_model, *related, get_kwargs=lambda device: {}):
+            templates = get_templates(template_model, *related)
+            new_components = [
+                template.instantiate(device=device, **get_kwargs(device))
+                for device in devices for template in templates[device.device_type_id]
+            ]
+            template_model.component_model.objects.bulk_create(new_components)
+            for component in new_components:
+                components[template_model.component_model][component.device_id][component.name] = component
+
+        instantiate(ConsolePortTemplate)
+        instantiate(ConsoleServerPortTemplate)
+        instantiate(PowerPortTemplate)
+        instantiate(
+            PowerOutletTemplate, 'power_port', get_kwargs=lambda device: {
+                'power_ports': components[PowerPort][device.pk],
+            }
+        )
+        instantiate(InterfaceTemplate)
+        instantiate(RearPortTemplate)
+        instantiate(
+            FrontPortTemplate, 'rear_port', get_kwargs=lambda device: {
+                'rear_ports': components[RearPort][device.pk],
+            }
+        )
+        instantiate(ModuleBayTemplate)
+        instantiate(DeviceBayTemplate)
+
+        # InventoryItems are assigned their MPTT attributes as though each were saved in turn (each root item starting
+        # a new tree, and each child item appended to its parent), then created one tree level at a time so that each
+        # parent is saved before its children.
+        mptt_opts = InventoryItem._mptt_meta
+        templates = get_templates(InventoryItemTemplate, 'parent', 'component')
+        tree_id = InventoryItem.objects.aggregate(Max(mptt_opts.tree_id_attr))[f'{mptt_opts.tree_id_attr}__max'] or 0
+        levels = defaultdict(list)
+
+        def add_to_tree(item, children, cursor, level):
+            setattr(item, mptt_opts.tree_id_attr, tree_id)
+            setattr(item, mptt_opts.level_attr, level)
+            setattr(item, mptt_opts.left_attr, cursor)
+            for child in children[id(item)]:
+                cursor = add_to_tree(child, children, cursor + 1, level + 1)
+            cursor += 1
+            setattr(item, mptt_opts.right_attr, cursor)
+            levels[level].append(item)
+            return cursor
+
+        for device in devices:
+            inventory_items = {}
+            root_items = []
+            children = defaultdict(list)
+            for template in templates[device.device_type_id]:
+                item = template.instantiate(
+                    device=device,
+                    inventory_items=inventory_items,
+                    components={model: components[model][device.pk] for model in components}
+                )
+                inventory_items[item.name] = item
+                if item.parent is None:
+                    root_items.append(item)
+                else:
+                    children[id(item.parent)].append(item)
+            for item in root_items:
+                tree_id += 1
+                add_to_tree(item, children, 1, 0)
+
+        for level in sorted(levels):
+            InventoryItem.objects.bulk_create(levels[level])
+
     @property
     def identifier(self):
         """
@@ -995,41 +1066,83 @@ class Module(NetBoxModel, ConfigContextModel):
         if not is_new or (disable_replication and not adopt_components):
             return
 
+        # If instantiation has been deferred, the components will be created along with those of other new Modules
+        new_objects = get_component_instantiation_queue()
+        if new_objects is not None:
+            new_objects.append(self)
+        else:
+            Module.instantiate_components([self])
+
+    @classmethod
+    def instantiate_components(cls, modules):
+        """
+        Instantiate and/or adopt all components for the given new Modules per their ModuleType definitions. Component
+        templates and installed components are retrieved once for all Modules, and each type of component is created
+        and adopted for all Modules at once.
+        """
+        module_type_ids = {module.module_type_id for module in modules}
+        adopting_device_ids = {
+            module.device_id for module in modules if getattr(module, '_adopt_components', False)
+        }
+
+        # The components created or adopted by each Module, by model and name
+        components = defaultdict(lambda: defaultdict(dict))
+
         # Iterate all component types
-        for templates, component_attribute, component_model in [
-            ("consoleporttemplates", "consoleports", ConsolePort),
-            ("consoleserverporttemplates", "consoleserverports", ConsoleServerPort),
-            ("interfacetemplates", "interfaces", Interface),
-            ("powerporttemplates", "powerports", PowerPort),
-            ("poweroutlettemplates", "poweroutlets", PowerOutlet),
-            ("rearporttemplates", "rearports", RearPort),
-            ("frontporttemplates", "frontports", FrontPort)
+        for template_model, related, get_kwargs in [
+            (ConsolePortTemplate, None, None),
+            (ConsoleServerPortTemplate, None, None),
+            (InterfaceTemplate, None, None),
+            (PowerPortTemplate, None, None),
+            (PowerOutletTemplate, 'power_port', lambda module: {
+                'power_ports': components[PowerPort][module.pk],
+            }),
+            (RearPortTemplate, None, None),
+            (FrontPortTemplate, 'rear_port', lambda module: {
+                'rear_ports': components[RearPort][module.pk],
+            }),
         ]:
+            component_model = template_model.component_model
             create_instances = []
             update_instances = []
 
-            # Prefetch installed components
-            installed_components = {
-                component.name: component for component in getattr(self.device, component_attribute).filter(module__isnull=True)
-            }
-
-            # Get the template for the module type.
-            for template in getattr(self.module_type, templates).all():
-                template_instance = template.instantiate(device=self.device, module=self)
-
-                if adopt_components:
-                    existing_item = installed_components.get(template_instance.name)
-
-                    # Check if there's a component with the same name already
-                    if existing_item:
-                        # Assign it to the module
-                        existing_item.module = self
-                        update_instances.append(existing_item)
-                        continue
-
-                # Only create new components if replication is enabled
-                if not disable_replication:
-                    create_instances.append(template_instance)
+            # Prefetch the templates for all module types
+            templates = defaultdict(list)
+            queryset = template_model.objects.filter(module_type__in=module_type_ids)
+            if related:
+                queryset = queryset.prefetch_related(related)
+            for template in queryset:
+                templates[template.module_type_id].append(template)
+
+            # Prefetch installed components for all devices on which components are being adopted
+            installed_components = defaultdict(dict)
+            if adopting_device_ids:
+                for component in component_model.objects.filter(device__in=adopting_device_ids, module__isnull=True):
+                    installed_components[component.device_id][component.name] = component
+
+            for module in modules:
+                adopt_components = getattr(module, '_adopt_components', False)
+                disable_replication = getattr(module, '_disable_replication', False)
+                kwargs = get_kwargs(module) if get_kwargs else {}
+
+                for template in templates[module.module_type_id]:
+                    template_instance = template.instantiate(device=module.device, module=module, **kwargs)
+
+                    if adopt_components:
+                        # Check if there's a component with the same name already. A component can be adopted by
+                        # only one Module.
+                        existing_item = installed_components[module.device_id].pop(template_instance.name, None)
+                        if existing_item:
+                            # Assign it to the module
+                            existing_item.module = module
+                            update_instances.append(existing_item)
+                            components[component_model][module.pk][existing_item.name] = existing_item
+                            continue
+
+                    # Only create new components if replication is enabled
+                    if not disable_replication:
+                        create_instances.append(template_instance)
+                        components[component_model][module.pk][template_instance.name] = template_instance
 
             component_model.objects.bulk_create(create_instances)
             component_model.objects.bulk_update(update_instances, ['module'])
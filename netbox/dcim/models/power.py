@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django.apps import apps
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.exceptions import ValidationError
@@ -10,7 +12,7 @@ from dcim.constants import *
 from netbox.config import ConfigItem
 from netbox.models import NetBoxModel
 from utilities.validators import ExclusionValidator
-from .device_components import CabledObjectModel, PathEndpoint
+from .device_components import CabledObjectModel, PathEndpoint, PowerOutlet, PowerPort
 
 __all__ = (
     'PowerFeed',
@@ -176,6 +178,65 @@ class PowerFeed(NetBoxModel, PathEndpoint, CabledObjectModel):
 
         super().save(*args, **kwargs)
 
+    @classmethod
+    def get_allocated_draws(cls, powerfeeds):
+        """
+        Return the total allocated draw (in VA) of the PowerPorts connected to each of the given PowerFeeds, mapped by
+        PowerFeed ID. Each PowerPort's draw is determined as by PowerPort.get_power_draw(). A fixed number of queries is
+        executed regardless of the number of PowerFeeds.
+
+        :param powerfeeds: QuerySet of PowerFeeds
+        """
+        def get_peer_ends(terminations):
+            # Map each (cable, opposite cable end) pair to the terminations attached to the near end
+            peer_ends = defaultdict(list)
+            for pk, cable_id, cable_end in terminations:
+                opposite_end = CableEndChoices.SIDE_A if cable_end == CableEndChoices.SIDE_B else CableEndChoices.SIDE_B
+                peer_ends[(cable_id, opposite_end)].append(pk)
+            return peer_ends
+
+        allocated_draws = {pk: 0 for pk in powerfeeds.values_list('pk', flat=True)}
+
+        # Find the PowerPorts attached to the far end of each PowerFeed's cable
+        feed_ends = get_peer_ends(
+            powerfeeds.filter(cable__isnull=False).order_by().values_list('pk', 'cable_id', 'cable_end')
+        )
+        powerports = PowerPort.objects.filter(
+            cable__in={cable_id for cable_id, _ in feed_ends}
+        ).order_by().values_list('pk', 'cable_id', 'cable_end', '_power_draw', 'allocated_draw', 'maximum_draw')
+        powerports = [
+            (pk, power_draw, allocated_draw, maximum_draw, feed_ends[(cable_id, cable_end)])
+            for pk, cable_id, cable_end, power_draw, allocated_draw, maximum_draw in powerports
+            if (cable_id, cable_end) in feed_ends
+        ]
+
+        # Where a PowerPort's power draw rollup has not yet been populated and it has no draw defined, it inherits the
+        # allocated draw of any PowerPorts fed by its PowerOutlets
+        outlet_ends = get_peer_ends(
+            PowerOutlet.objects.filter(
+                power_port__in=[pk for pk, power_draw, allocated_draw, maximum_draw, _ in powerports
+                                if power_draw is None and allocated_draw is None and maximum_draw is None],
+                cable__isnull=False
+            ).order_by().values_list('power_port_id', 'cable_id', 'cable_end')
+        )
+        downstream_powerports = defaultdict(dict)
+        downstream = PowerPort.objects.filter(
+            cable__in={cable_id for cable_id, _ in outlet_ends}
+        ).order_by().values_list('pk', 'cable_id', 'cable_end', 'allocated_draw')
+        for pk, cable_id, cable_end, allocated_draw in downstream:
+            for powerport_id in outlet_ends.get((cable_id, cable_end), []):
+                downstream_powerports[powerport_id][pk] = allocated_draw or 0
+
+        for pk, power_draw, allocated_draw, maximum_draw, powerfeed_ids in powerports:
+            if power_draw is not None:
+                allocated_draw = power_draw['allocated']
+            elif allocated_draw is None and maximum_draw is None:
+                allocated_draw = sum(downstream_powerports[pk].values())
+            for powerfeed_id in powerfeed_ids:
+                allocated_draws[powerfeed_id] += allocated_draw or 0
+
+        return allocated_draws
+
     @property
     def parent_object(self):
         return self.power_panel
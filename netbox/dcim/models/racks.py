@@ -1,4 +1,5 @@
 import decimal
+from collections import defaultdict
 
 from django.apps import apps
 from django.contrib.auth.models import User
@@ -14,11 +15,12 @@ from django.urls import reverse
 from dcim.choices import *
 from dcim.constants import *
 from dcim.svg import RackElevationSVG
+from dcim.utils import RackOccupancy
 from netbox.models import OrganizationalModel, NetBoxModel
 from utilities.choices import ColorChoices
 from utilities.fields import ColorField, NaturalOrderingField
 from utilities.utils import array_to_string, drange
-from .device_components import PowerOutlet, PowerPort
+from .device_components import PowerOutlet
 from .devices import Device
 from .power import PowerFeed
 
@@ -202,6 +204,13 @@ class Rack(NetBoxModel):
             return f'{self.name} ({self.facility_id})'
         return self.name
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Save a reference to the original site and location, so that child devices can be updated if the rack is moved
+        self._original_site_id = self.__dict__.get('site_id')
+        self._original_location_id = self.__dict__.get('location_id')
+
     @classmethod
     def get_prerequisite_models(cls):
         return [apps.get_model('dcim.Site'), ]
@@ -319,6 +328,24 @@ class Rack(NetBoxModel):
 
         return [u for u in elevation.values()]
 
+    def get_occupancy(self, exclude=None):
+        """
+        Return a RackOccupancy representing the units consumed by all devices installed within the rack.
+
+        :param exclude: List of devices IDs to exclude (useful when moving a device within a rack)
+        """
+        occupancy = RackOccupancy(self.u_height)
+        if self.pk:
+            devices = self.devices.filter(position__gte=1)
+            if exclude is not None:
+                devices = devices.exclude(pk__in=exclude)
+            for position, face, u_height, is_full_depth in devices.order_by().values_list(
+                'position', 'face', 'device_type__u_height', 'device_type__is_full_depth'
+            ):
+                occupancy.add_device(position, u_height, face=None if is_full_depth else face)
+
+        return occupancy
+
     def get_available_units(self, u_height=1, rack_face=None, exclude=None):
         """
         Return a list of units within the rack available to accommodate a device of a given U height (default 1).
@@ -329,31 +356,13 @@ class Rack(NetBoxModel):
         :param rack_face: The face of the rack (front or rear) required; 'None' if device is full depth
         :param exclude: List of devices IDs to exclude (useful when moving a device within a rack)
         """
-        # Gather all devices which consume U space within the rack
-        devices = self.devices.prefetch_related('device_type').filter(position__gte=1)
-        if exclude is not None:
-            devices = devices.exclude(pk__in=exclude)
-
-        # Initialize the rack unit skeleton
-        units = list(self.units)
-
-        # Remove units consumed by installed devices
-        for d in devices:
-            if rack_face is None or d.face == rack_face or d.device_type.is_full_depth:
-                for u in drange(d.position, d.position + d.device_type.u_height, 0.5):
-                    try:
-                        units.remove(u)
-                    except ValueError:
-                        # Found overlapping devices in the rack!
-                        pass
-
-        # Remove units without enough space above them to accommodate a device of the specified height
-        available_units = []
-        for u in units:
-            if set(drange(u, u + u_height, 0.5)).issubset(units):
-                available_units.append(u)
-
-        return list(reversed(available_units))
+        available = self.get_occupancy(exclude=exclude).get_available(u_height, rack_face)
+
+        # Map each available position to its unit number (listed bottom to top)
+        units = sorted(self.units)
+        available_units = [units[i] for i in RackOccupancy.iter_bits(available)]
+
+        return list(reversed(available_units)) if self.desc_units else available_units
 
     def get_reserved_units(self):
         """
@@ -413,41 +422,76 @@ class Rack(NetBoxModel):
         Determine the utilization rate of the rack and return it as a percentage. Occupied and reserved units both count
         as utilized.
         """
-        # Determine unoccupied units
-        total_units = len(list(self.units))
-        available_units = self.get_available_units()
+        if hasattr(self, '_utilization'):
+            return self._utilization
 
-        # Remove reserved units
-        for u in self.get_reserved_units():
-            if u in available_units:
-                available_units.remove(u)
+        occupancy = self.get_occupancy()
+        for reservation in self.reservations.all():
+            occupancy.add_reservation(reservation.units)
 
-        occupied_unit_count = total_units - len(available_units)
-        percentage = float(occupied_unit_count) / total_units * 100
+        return occupancy.get_utilization()
 
-        return percentage
+    @classmethod
+    def prefetch_utilization(cls, racks):
+        """
+        Calculate the utilization of many racks at once, using a fixed number of queries. The result is cached on each
+        rack and returned by get_utilization().
+        """
+        occupancies = {rack.pk: RackOccupancy(rack.u_height) for rack in racks if rack.pk}
+
+        devices = Device.objects.filter(rack__in=occupancies, position__gte=1).order_by().values_list(
+            'rack_id', 'position', 'face', 'device_type__u_height', 'device_type__is_full_depth'
+        )
+        for rack_id, position, face, u_height, is_full_depth in devices:
+            occupancies[rack_id].add_device(position, u_height, face=None if is_full_depth else face)
+
+        reservations = RackReservation.objects.filter(rack__in=occupancies).order_by().values_list('rack_id', 'units')
+        for rack_id, units in reservations:
+            occupancies[rack_id].add_reservation(units)
+
+        for rack in racks:
+            if rack.pk:
+                rack._utilization = occupancies[rack.pk].get_utilization()
 
     def get_power_utilization(self):
         """
         Determine the utilization rate of power in the rack and return it as a percentage.
         """
+        if hasattr(self, '_power_utilization'):
+            return self._power_utilization
+
         powerfeeds = PowerFeed.objects.filter(rack=self)
         available_power_total = sum(pf.available_power for pf in powerfeeds)
         if not available_power_total:
             return 0
 
-        powerports = []
-        for powerfeed in powerfeeds:
-            powerports.extend([
-                peer for peer in powerfeed.link_peers if isinstance(peer, PowerPort)
-            ])
-
-        allocated_draw = sum([
-            powerport.get_power_draw()['allocated'] for powerport in powerports
-        ])
+        allocated_draw = sum(PowerFeed.get_allocated_draws(powerfeeds).values())
 
         return int(allocated_draw / available_power_total * 100)
 
+    @classmethod
+    def prefetch_power_utilization(cls, racks):
+        """
+        Calculate the power utilization of many racks at once, using a fixed number of queries. The result is cached on
+        each rack and returned by get_power_utilization().
+        """
+        powerfeeds = PowerFeed.objects.filter(rack__in=[rack.pk for rack in racks if rack.pk])
+        allocated_draws = PowerFeed.get_allocated_draws(powerfeeds)
+
+        available_power = defaultdict(int)
+        allocated_draw = defaultdict(int)
+        for pk, rack_id, powerfeed_available_power in powerfeeds.order_by().values_list(
+            'pk', 'rack_id', 'available_power'
+        ):
+            available_power[rack_id] += powerfeed_available_power
+            allocated_draw[rack_id] += allocated_draws[pk]
+
+        for rack in racks:
+            if available_power[rack.pk]:
+                rack._power_utilization = int(allocated_draw[rack.pk] / available_power[rack.pk] * 100)
+            else:
+                rack._power_utilization = 0
+
 
 class RackReservation(NetBoxModel):
     """
@@ -411,6 +411,12 @@ class Location(NestedGroupModel):
 
         super().validate_unique(exclude=exclude)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Save a reference to the original site, so that child objects can be updated if the location is moved
+        self._original_site_id = self.__dict__.get('site_id')
+
     @classmethod
     def get_prerequisite_models(cls):
         return [Site, ]
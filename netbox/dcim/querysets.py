@@ -0,0 +1,37 @@
+from django.db.models import QuerySet
+from django.db.models.query import ModelIterable
+
+__all__ = (
+    'CablePathQuerySet',
+)
+
+
+class CablePathQuerySet(QuerySet):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefetch_path_objects = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._prefetch_path_objects = self._prefetch_path_objects
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if self._prefetch_path_objects and not fetched and self._iterable_class is ModelIterable:
+            self.model.prefetch_path_objects(self._result_cache)
+
+    def prefetch_path_objects(self):
+        """
+        Retrieve the objects comprising all CablePaths in the QuerySet when it is evaluated, using one query per object
+        type for the entire set of paths. This is intended for use as a prefetch for path endpoints, e.g.:
+
+            Interface.objects.prefetch_related(
+                Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+            )
+        """
+        clone = self._chain()
+        clone._prefetch_path_objects = True
+        return clone
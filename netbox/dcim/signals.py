@@ -1,12 +1,19 @@
 import logging
 
+from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 
 from .choices import CableEndChoices, LinkStatusChoices
-from .models import Cable, CablePath, CableTermination, Device, PathEndpoint, PowerPanel, Rack, Location, VirtualChassis
+from .models import (
+    Cable, CablePath, CableTermination, ConsolePort, ConsoleServerPort, Device, DeviceType, FrontPort, Interface,
+    PowerFeed, PowerOutlet, PowerPort, Rack, RackReservation, RearPort, Location, VirtualChassis,
+)
 from .models.cables import trace_paths
-from .utils import create_cablepath, rebuild_paths
+from .svg import invalidate_cable_trace_svgs, invalidate_rack_elevation_svgs
+from .utils import (
+    rebuild_paths, retrace_paths, trace_cable_end, update_cable_power_draws, update_power_draws, update_site_assignments,
+)
 
 
 #
@@ -16,15 +23,11 @@ from .utils import create_cablepath, rebuild_paths
 @receiver(post_save, sender=Location)
 def handle_location_site_change(instance, created, **kwargs):
     """
-    Update child objects if Site assignment has changed. We intentionally recurse through each child
-    object instead of calling update() on the QuerySet to ensure the proper change records get created for each.
+    Update child objects if Site assignment has changed.
     """
-    if not created:
-        instance.get_descendants().update(site=instance.site)
-        locations = instance.get_descendants(include_self=True).values_list('pk', flat=True)
-        Rack.objects.filter(location__in=locations).update(site=instance.site)
-        Device.objects.filter(location__in=locations).update(site=instance.site)
-        PowerPanel.objects.filter(location__in=locations).update(site=instance.site)
+    if not created and instance.site_id != instance._original_site_id:
+        update_site_assignments(instance)
+    instance._original_site_id = instance.site_id
 
 
 @receiver(post_save, sender=Rack)
@@ -32,8 +35,12 @@ def handle_rack_site_change(instance, created, **kwargs):
     """
     Update child Devices if Site or Location assignment has changed.
     """
-    if not created:
-        Device.objects.filter(rack=instance).update(site=instance.site, location=instance.location)
+    if not created and (
+        instance.site_id != instance._original_site_id or instance.location_id != instance._original_location_id
+    ):
+        update_site_assignments(instance)
+    instance._original_site_id = instance.site_id
+    instance._original_location_id = instance.location_id
 
 
 #
@@ -88,13 +95,7 @@ def update_connected_endpoints(instance, created, raw=False, **kwargs):
             else:
                 b_terminations.append(t.termination)
         for nodes in [a_terminations, b_terminations]:
-            # Examine type of first termination to determine object type (all must be the same)
-            if not nodes:
-                continue
-            if isinstance(nodes[0], PathEndpoint):
-                create_cablepath(nodes)
-            else:
-                rebuild_paths(nodes)
+            trace_cable_end(nodes)
 
     # Update status of CablePaths if Cable status has been changed
     elif instance.status != instance._orig_status:
@@ -109,8 +110,7 @@ def retrace_cable_paths(instance, **kwargs):
     """
     When a Cable is deleted, check for and update its connected endpoints
     """
-    for cablepath in CablePath.objects.filter(_nodes__contains=instance):
-        cablepath.retrace()
+    retrace_paths(CablePath.objects.filter(_nodes__contains=instance))
 
 
 @receiver(post_delete, sender=CableTermination)
@@ -121,5 +121,166 @@ def nullify_connected_endpoints(instance, **kwargs):
     model = instance.termination_type.model_class()
     model.objects.filter(pk=instance.termination_id).update(cable=None, cable_end='')
 
-    for cablepath in CablePath.objects.filter(_nodes__contains=instance.cable):
-        cablepath.retrace()
+    retrace_paths(CablePath.objects.filter(_nodes__contains=instance.cable))
+
+
+#
+# Cable trace SVG cache
+#
+
+@receiver(post_save, sender=CablePath)
+def invalidate_cablepath_svgs(instance, created, raw=False, **kwargs):
+    """
+    Discard any cached cable trace SVGs which depend on a modified CablePath.
+    """
+    if not created and not raw:
+        invalidate_cable_trace_svgs([instance.pk])
+
+
+@receiver(post_save, sender=Cable)
+def invalidate_cable_svgs(instance, created, raw=False, **kwargs):
+    """
+    Discard any cached cable trace SVGs for CablePaths which traverse a Cable whose terminations, status, or drawn
+    attributes have been modified.
+    """
+    if created or raw:
+        return
+    if not instance._terminations_modified and instance.status == instance._orig_status and all(
+        instance.__dict__.get(field) == value for field, value in instance._orig_trace_fields.items()
+    ):
+        return
+    invalidate_cable_trace_svgs(
+        CablePath.objects.filter(_nodes__contains=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=ConsolePort)
+@receiver(post_save, sender=ConsoleServerPort)
+@receiver(post_save, sender=PowerPort)
+@receiver(post_save, sender=PowerOutlet)
+@receiver(post_save, sender=Interface)
+@receiver(post_save, sender=FrontPort)
+@receiver(post_save, sender=RearPort)
+@receiver(post_save, sender=PowerFeed)
+def invalidate_termination_svgs(instance, created, raw=False, **kwargs):
+    """
+    Discard any cached cable trace SVGs for CablePaths which traverse a modified cabled termination.
+    """
+    if created or raw or instance.cable_id is None:
+        return
+    invalidate_cable_trace_svgs(
+        CablePath.objects.filter(_nodes__contains=instance).values_list('pk', flat=True)
+    )
+
+
+#
+# Rack elevation SVG cache
+#
+
+@receiver(post_save, sender=Rack)
+def invalidate_rack_svgs(instance, created, **kwargs):
+    """
+    Discard any cached elevations of a modified Rack.
+    """
+    if not created:
+        invalidate_rack_elevation_svgs([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=Device)
+def invalidate_device_rack_svgs(instance, **kwargs):
+    """
+    Discard any cached elevations of the Rack(s) to which a modified Device is (or was) assigned.
+    """
+    invalidate_rack_elevation_svgs({instance.rack_id, instance._original_rack_id})
+    instance._original_rack_id = instance.rack_id
+
+
+@receiver(post_save, sender=DeviceType)
+def invalidate_devicetype_rack_svgs(instance, created, **kwargs):
+    """
+    Discard any cached elevations of Racks which contain instances of a modified DeviceType.
+    """
+    if not created:
+        invalidate_rack_elevation_svgs(
+            Device.objects.filter(device_type=instance, rack__isnull=False).order_by().values_list(
+                'rack_id', flat=True
+            ).distinct()
+        )
+
+
+@receiver((post_save, post_delete), sender=RackReservation)
+def invalidate_rackreservation_svgs(instance, **kwargs):
+    """
+    Discard any cached elevations of the Rack to which a modified RackReservation is assigned.
+    """
+    invalidate_rack_elevation_svgs([instance.rack_id])
+
+
+#
+# Power draw
+#
+
+@receiver(post_save, sender=PowerPort)
+def update_powerport_power_draw(instance, raw=False, **kwargs):
+    """
+    Update the power draw of a modified PowerPort, and of any PowerPort which feeds it via a PowerOutlet.
+    """
+    if raw:
+        return
+    instance.update_power_draw()
+    if instance.cable_id:
+        update_power_draws(
+            PowerOutlet.objects.filter(
+                cable=instance.cable_id,
+                cable_end=instance.opposite_cable_end
+            ).values_list('power_port_id', flat=True)
+        )
+
+
+@receiver((post_save, post_delete), sender=PowerOutlet)
+def update_poweroutlet_power_draw(instance, raw=False, **kwargs):
+    """
+    Update the power draw of the PowerPort(s) to which a modified PowerOutlet is (or was) assigned.
+    """
+    if raw:
+        return
+    update_power_draws({instance.power_port_id, instance._original_power_port_id})
+    instance._original_power_port_id = instance.power_port_id
+
+
+@receiver(post_save, sender=PowerFeed)
+def update_powerfeed_power_draw(instance, created, raw=False, **kwargs):
+    """
+    Update the power draw of any PowerPort connected to a modified PowerFeed (e.g. if its phase has changed).
+    """
+    if not created and not raw and instance.cable_id:
+        update_power_draws(PowerPort.objects.filter(cable=instance.cable_id).values_list('pk', flat=True))
+
+
+@receiver(trace_paths, sender=Cable)
+def update_cable_power_draw(instance, raw=False, **kwargs):
+    """
+    Update the power draw of all PowerPorts affected by new power cable terminations.
+    """
+    power_models = (PowerFeed, PowerOutlet, PowerPort)
+    if not raw and instance._terminations_modified and any(
+        isinstance(t, power_models) for t in [*instance.a_terminations, *instance.b_terminations]
+    ):
+        update_cable_power_draws(instance.pk)
+
+
+@receiver(post_delete, sender=CableTermination)
+def update_cabletermination_power_draw(instance, **kwargs):
+    """
+    Update the power draw of all PowerPorts affected by the removal of a power cable termination.
+    """
+    model = ContentType.objects.get_for_id(instance.termination_type_id).model_class()
+    if model is PowerPort:
+        update_power_draws([instance.termination_id])
+    elif model is PowerOutlet:
+        update_power_draws(
+            PowerOutlet.objects.filter(pk=instance.termination_id).values_list('power_port_id', flat=True)
+        )
+    elif model is not PowerFeed:
+        return
+    update_cable_power_draws(instance.cable_id)
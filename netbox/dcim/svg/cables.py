@@ -1,16 +1,21 @@
+import hashlib
+import json
+
 import svgwrite
 from svgwrite.container import Group, Hyperlink
 from svgwrite.shapes import Line, Polyline, Rect
 from svgwrite.text import Text
 
 from django.conf import settings
+from django.core.cache import cache
 
-from dcim.constants import CABLE_TRACE_SVG_DEFAULT_WIDTH
-from utilities.utils import foreground_color
+from dcim.constants import CABLE_TRACE_SVG_CACHE_TIMEOUT, CABLE_TRACE_SVG_DEFAULT_WIDTH
+from utilities.utils import add_to_cache_index, foreground_color, pop_cache_indexes
 
 
 __all__ = (
     'CableTraceSVG',
+    'invalidate_cable_trace_svgs',
 )
 
 
@@ -20,6 +25,24 @@ LINE_HEIGHT = 20
 FANOUT_HEIGHT = 35
 FANOUT_LEG_HEIGHT = 15
 
+CACHE_KEY_PREFIX = 'dcim.cable_trace_svg'
+
+
+def get_cable_path_cache_key(cable_path_id):
+    """
+    Return the key of the cache index which records all rendered SVGs which depend on a CablePath.
+    """
+    return f'{CACHE_KEY_PREFIX}.cablepath.{cable_path_id}'
+
+
+def invalidate_cable_trace_svgs(cable_path_ids):
+    """
+    Discard any cached SVG renderings which depend on the specified CablePaths.
+    """
+    cache_keys = pop_cache_indexes([get_cable_path_cache_key(pk) for pk in cable_path_ids])
+    if cache_keys:
+        cache.delete_many(cache_keys)
+
 
 class Node(Hyperlink):
     """
@@ -134,6 +157,41 @@ class CableTraceSVG:
     def center(self):
         return self.width / 2
 
+    @property
+    def cache_key(self):
+        """
+        Return the cache key for the rendered SVG, or None if the origin has no CablePath. The key is derived from the
+        origin's CablePath (its nodes and status) along with the rendering parameters, so any change to the path yields
+        a new key. Changes to the nodes themselves (e.g. a cable's status or label) are handled by invalidation.
+        """
+        cable_path = self.origin._path
+        if cable_path is None:
+            return None
+        fingerprint = json.dumps([
+            self.origin._meta.label_lower,
+            self.origin.pk,
+            cable_path.pk,
+            cable_path.path,
+            cable_path.is_active,
+            cable_path.is_complete,
+            cable_path.is_split,
+            self.width,
+            self.base_url,
+        ])
+        return f'{CACHE_KEY_PREFIX}.{hashlib.sha256(fingerprint.encode()).hexdigest()}'
+
+    def get_cable_paths(self):
+        """
+        Return all CablePaths traversed when tracing from the origin (including those continued via bridged ports).
+        """
+        cable_paths = []
+        origin = self.origin
+        while origin is not None and origin._path is not None and origin._path not in cable_paths:
+            cable_paths.append(origin._path)
+            destinations = origin._path.destinations
+            origin = getattr(destinations[0], 'bridge', None) if len(destinations) == 1 else None
+        return cable_paths
+
     @classmethod
     def _get_labels(cls, instance):
         """
@@ -397,3 +455,23 @@ class CableTraceSVG:
             self.drawing.add(element)
 
         return self.drawing
+
+    def render_cached(self):
+        """
+        Return the SVG document as a string, rendering it only if a cached copy is not available. Each new rendering
+        is recorded against every CablePath it depends on, so that it can be invalidated when any of them changes.
+        """
+        cache_key = self.cache_key
+        if cache_key is None:
+            return self.render().tostring()
+
+        svg = cache.get(cache_key)
+        if svg is None:
+            svg = self.render().tostring()
+            cache.set(cache_key, svg, CABLE_TRACE_SVG_CACHE_TIMEOUT)
+            for cable_path in self.get_cable_paths():
+                add_to_cache_index(
+                    get_cable_path_cache_key(cable_path.pk), cache_key, CABLE_TRACE_SVG_CACHE_TIMEOUT
+                )
+
+        return svg
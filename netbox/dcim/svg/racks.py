@@ -1,4 +1,7 @@
 import decimal
+import hashlib
+import json
+
 import svgwrite
 from svgwrite.container import Hyperlink
 from svgwrite.image import Image
@@ -7,20 +10,43 @@ from svgwrite.shapes import Rect
 from svgwrite.text import Text
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import FieldError
 from django.db.models import Q
 from django.urls import reverse
 from django.utils.http import urlencode
 
 from netbox.config import get_config
-from utilities.utils import foreground_color, array_to_ranges
-from dcim.constants import RACK_ELEVATION_BORDER_WIDTH
+from utilities.utils import add_to_cache_index, array_to_ranges, foreground_color, pop_cache_indexes
+from dcim.constants import (
+    RACK_ELEVATION_BORDER_WIDTH, RACK_ELEVATION_DEFAULT_LEGEND_WIDTH, RACK_ELEVATION_DEFAULT_MARGIN_WIDTH,
+    RACK_ELEVATION_SVG_CACHE_TIMEOUT,
+)
 
 
 __all__ = (
     'RackElevationSVG',
+    'invalidate_rack_elevation_svgs',
 )
 
+CACHE_KEY_PREFIX = 'dcim.rack_elevation_svg'
+
+
+def get_rack_cache_key(rack_id):
+    """
+    Return the key of the cache index which records all rendered elevations of a Rack.
+    """
+    return f'{CACHE_KEY_PREFIX}.rack.{rack_id}'
+
+
+def invalidate_rack_elevation_svgs(rack_ids):
+    """
+    Discard any cached SVG renderings of the specified Racks.
+    """
+    cache_keys = pop_cache_indexes([get_rack_cache_key(pk) for pk in rack_ids if pk is not None])
+    if cache_keys:
+        cache.delete_many(cache_keys)
+
 
 def get_device_name(device):
     if device.virtual_chassis:
@@ -64,15 +90,17 @@ class RackElevationSVG:
     def __init__(self, rack, unit_height=None, unit_width=None, legend_width=None, margin_width=None, user=None,
                  include_images=True, base_url=None, highlight_params=None):
         self.rack = rack
+        self.user = user
         self.include_images = include_images
+        self.highlight_params = highlight_params
         self.base_url = base_url.rstrip('/') if base_url is not None else ''
 
         # Set drawing dimensions
         config = get_config()
         self.unit_width = unit_width or config.RACK_ELEVATION_DEFAULT_UNIT_WIDTH
         self.unit_height = unit_height or config.RACK_ELEVATION_DEFAULT_UNIT_HEIGHT
-        self.legend_width = legend_width or config.RACK_ELEVATION_DEFAULT_LEGEND_WIDTH
-        self.margin_width = margin_width or config.RACK_ELEVATION_DEFAULT_MARGIN_WIDTH
+        self.legend_width = legend_width or RACK_ELEVATION_DEFAULT_LEGEND_WIDTH
+        self.margin_width = margin_width or RACK_ELEVATION_DEFAULT_MARGIN_WIDTH
 
         # Determine the subset of devices within this rack that are viewable by the user, if any
         permitted_devices = self.rack.devices
@@ -91,6 +119,28 @@ class RackElevationSVG:
             except FieldError:
                 pass
 
+    def get_cache_key(self, face):
+        """
+        Return the cache key for the elevation of the specified rack face. Users who are permitted to view the same
+        set of devices within the rack share cached renderings.
+        """
+        if self.user is None or self.user.is_superuser:
+            permitted_devices = None
+        else:
+            permitted_devices = sorted(self.permitted_device_ids)
+        fingerprint = json.dumps([
+            face,
+            self.unit_width,
+            self.unit_height,
+            self.legend_width,
+            self.margin_width,
+            self.include_images,
+            self.base_url,
+            self.highlight_params or [],
+            permitted_devices,
+        ], default=str)
+        return f'{CACHE_KEY_PREFIX}.{self.rack.pk}.{hashlib.sha256(fingerprint.encode()).hexdigest()}'
+
     @staticmethod
     def _add_gradient(drawing, id_, color):
         gradient = LinearGradient(
@@ -321,3 +371,17 @@ class RackElevationSVG:
         self.draw_border()
 
         return self.drawing
+
+    def render_cached(self, face):
+        """
+        Return the SVG document for the specified rack face as a string, rendering it only if a cached copy is not
+        available.
+        """
+        cache_key = self.get_cache_key(face)
+        svg = cache.get(cache_key)
+        if svg is None:
+            svg = self.render(face).tostring()
+            cache.set(cache_key, svg, RACK_ELEVATION_SVG_CACHE_TIMEOUT)
+            add_to_cache_index(get_rack_cache_key(self.rack.pk), cache_key, RACK_ELEVATION_SVG_CACHE_TIMEOUT)
+
+        return svg
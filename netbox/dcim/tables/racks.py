@@ -95,6 +95,17 @@ class RackTable(TenancyColumnsMixin, NetBoxTable):
             'get_utilization',
         )
 
+    def paginate(self, *args, **kwargs):
+        super().paginate(*args, **kwargs)
+
+        # Calculate space and power utilization for all racks on the current page at once
+        racks = [row.record for row in self.page.object_list]
+        columns = self.columns.names()
+        if 'get_utilization' in columns and self.columns['get_utilization'].visible:
+            Rack.prefetch_utilization(racks)
+        if 'get_power_utilization' in columns and self.columns['get_power_utilization'].visible:
+            Rack.prefetch_power_utilization(racks)
+
 
 #
 # Rack reservations
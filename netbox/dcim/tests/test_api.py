@@ -1976,6 +1976,28 @@ class ConnectedDeviceTest(APITestCase):
         response = self.client.get(url + url_params, **self.header)
         self.assertHttpStatus(response, status.HTTP_404_NOT_FOUND)
 
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_get_connected_devices_bulk(self):
+        url = reverse('dcim-api:connected-device-bulk')
+        data = [
+            {'peer_device': self.device2.name, 'peer_interface': self.interface2.name},
+            {'peer_device': self.device1.name, 'peer_interface': self.interface3.name},
+            {'peer_device': 'NonexistentDevice', 'peer_interface': 'eth0'},
+            {'peer_device': self.device1.name, 'peer_interface': self.interface1.name},
+        ]
+
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]['name'], self.device1.name)
+        self.assertIsNone(response.data[1])
+        self.assertIsNone(response.data[2])
+        self.assertEqual(response.data[3]['name'], self.device2.name)
+
+        # Each pair must specify both a device and an interface
+        response = self.client.post(url, [{'peer_device': self.device1.name}], format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
 
 class VirtualChassisTest(APIViewTestCases.APIViewTestCase):
     model = VirtualChassis
@@ -1,10 +1,16 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Prefetch
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from circuits.models import *
 from dcim.choices import LinkStatusChoices
+from dcim.graph import CablePathGraph
 from dcim.models import *
 from dcim.svg import CableTraceSVG
-from dcim.utils import object_to_path_node
+from dcim.utils import defer_path_updates, object_to_path_node
 
 
 class CablePathTestCase(TestCase):
@@ -15,6 +21,7 @@ class CablePathTestCase(TestCase):
         1XX: Test direct connections between different endpoint types
         2XX: Test different cable topologies
         3XX: Test responses to changes in existing objects
+        4XX: Test bulk tracing of paths
     """
     @classmethod
     def setUpTestData(cls):
@@ -1803,3 +1810,218 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 2)
+
+    def test_401_graph_trace_matches_from_origin(self):
+        """
+        [IF1] --C1-- [FP1:1] [RP1] --C3-- [RP2] [FP2:1] --C4-- [IF3]
+        [IF2] --C2-- [FP1:2]                    [FP2:2] --C5-- [CT1] [CT2] --> [Site]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        interface3 = Interface.objects.create(device=self.device, name='Interface 3')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=4)
+        rearport2 = RearPort.objects.create(device=self.device, name='Rear Port 2', positions=4)
+        frontport1_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:1', rear_port=rearport1, rear_port_position=1
+        )
+        frontport1_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1:2', rear_port=rearport1, rear_port_position=2
+        )
+        frontport2_1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:1', rear_port=rearport2, rear_port_position=1
+        )
+        frontport2_2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2:2', rear_port=rearport2, rear_port_position=2
+        )
+        circuittermination1 = CircuitTermination.objects.create(circuit=self.circuit, site=self.site, term_side='A')
+        CircuitTermination.objects.create(circuit=self.circuit, site=self.site, term_side='Z')
+
+        Cable(a_terminations=[interface1], b_terminations=[frontport1_1]).save()
+        Cable(a_terminations=[interface2], b_terminations=[frontport1_2]).save()
+        Cable(a_terminations=[rearport1], b_terminations=[rearport2], status=LinkStatusChoices.STATUS_PLANNED).save()
+        Cable(a_terminations=[frontport2_1], b_terminations=[interface3]).save()
+        Cable(a_terminations=[frontport2_2], b_terminations=[circuittermination1]).save()
+
+        graph = CablePathGraph()
+        for origin in (interface1, interface2, interface3, circuittermination1, rearport1, frontport2_2):
+            origin.refresh_from_db()
+            expected = CablePath.from_origin([origin])
+            cablepath = graph.trace(ContentType.objects.get_for_model(origin).pk, [origin.pk])
+            self.assertEqual(cablepath.path, expected.path, msg=f'Path mismatch for origin {origin}')
+            self.assertEqual(cablepath.is_active, expected.is_active)
+            self.assertEqual(cablepath.is_complete, expected.is_complete)
+            self.assertEqual(cablepath.is_split, expected.is_split)
+
+    def test_402_graph_shards_contain_connected_components(self):
+        """
+        [IF1] --C1-- [FP1] [RP1] --C2-- [IF2]
+        [IF3] --C3-- [IF4]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        interface3 = Interface.objects.create(device=self.device, name='Interface 3')
+        interface4 = Interface.objects.create(device=self.device, name='Interface 4')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=1)
+        frontport1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1', rear_port=rearport1, rear_port_position=1
+        )
+        Cable(a_terminations=[interface1], b_terminations=[frontport1]).save()
+        Cable(a_terminations=[rearport1], b_terminations=[interface2]).save()
+        Cable(a_terminations=[interface3], b_terminations=[interface4]).save()
+
+        graph = CablePathGraph()
+        interface_ct = ContentType.objects.get_for_model(Interface).pk
+        origins = [(interface_ct, interface.pk) for interface in (interface1, interface2, interface3, interface4)]
+        shards = graph.get_shards(origins, 4)
+
+        self.assertEqual(len(shards), 2)
+        self.assertEqual(sorted(shards[0] + shards[1]), sorted(origins))
+        for shard in shards:
+            self.assertIn(sorted(shard), [sorted(origins[:2]), sorted(origins[2:])])
+
+    def test_403_deferred_path_updates(self):
+        """
+        [IF1] --C1-- [FP1] [RP1] --C2-- [IF2]
+
+        Paths are traced only once the transaction has been committed.
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=1)
+        frontport1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1', rear_port=rearport1, rear_port_position=1
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with defer_path_updates():
+                cable1 = Cable(a_terminations=[interface1], b_terminations=[frontport1])
+                cable1.save()
+                cable2 = Cable(a_terminations=[rearport1], b_terminations=[interface2])
+                cable2.save()
+                self.assertEqual(CablePath.objects.count(), 0)
+
+        self.assertPathExists(
+            (interface1, cable1, frontport1, rearport1, cable2, interface2),
+            is_complete=True
+        )
+        self.assertPathExists(
+            (interface2, cable2, rearport1, frontport1, cable1, interface1),
+            is_complete=True
+        )
+        self.assertEqual(CablePath.objects.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with defer_path_updates():
+                Cable.objects.get(pk=cable2.pk).delete()
+                self.assertEqual(CablePath.objects.count(), 2)
+
+        self.assertPathExists(
+            (interface1, cable1, frontport1, rearport1),
+            is_complete=False
+        )
+        self.assertEqual(CablePath.objects.count(), 1)
+
+    def test_404_from_origin_queries_per_hop(self):
+        """
+        [IF1] --C1-- [FP1] [RP1] --C2-- [FP2] [RP2] --C3-- [FP3] [RP3] --C4-- [IF2]
+                                                                                [IF3]
+                                                                                [IF4]
+        [IF5] --C5-- [IF6]
+
+        The number of queries needed to trace each hop must not depend on the length of the path or on the number
+        of terminations at either end of a cable.
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        far_interfaces = [
+            Interface.objects.create(device=self.device, name=f'Interface {i}') for i in range(2, 5)
+        ]
+        interface5 = Interface.objects.create(device=self.device, name='Interface 5')
+        interface6 = Interface.objects.create(device=self.device, name='Interface 6')
+        rearports = []
+        frontports = []
+        for i in range(1, 4):
+            rearport = RearPort.objects.create(device=self.device, name=f'Rear Port {i}', positions=1)
+            rearports.append(rearport)
+            frontports.append(FrontPort.objects.create(
+                device=self.device, name=f'Front Port {i}', rear_port=rearport, rear_port_position=1
+            ))
+        Cable(a_terminations=[interface1], b_terminations=[frontports[0]]).save()
+        Cable(a_terminations=[rearports[0]], b_terminations=[frontports[1]]).save()
+        Cable(a_terminations=[rearports[1]], b_terminations=[frontports[2]]).save()
+        Cable(a_terminations=[rearports[2]], b_terminations=far_interfaces).save()
+        Cable(a_terminations=[interface5], b_terminations=[interface6]).save()
+
+        def count_queries(origin):
+            origin = type(origin).objects.select_related('cable').get(pk=origin.pk)
+            with CaptureQueriesContext(connection) as context:
+                CablePath.from_origin([origin])
+            return len(context.captured_queries)
+
+        # Warm the ContentType cache
+        count_queries(interface1)
+
+        # Each additional hop through a pass-through port costs the same number of queries
+        queries_per_hop = count_queries(rearports[0]) - count_queries(rearports[1])
+        self.assertEqual(count_queries(rearports[1]) - count_queries(rearports[2]), queries_per_hop)
+        self.assertLessEqual(queries_per_hop, 3)
+
+        # Multiple far-end terminations do not require additional queries
+        self.assertEqual(count_queries(rearports[2]), count_queries(interface5))
+
+    def test_405_prefetch_path_objects(self):
+        """
+        [IF1] --C1-- [IF2]
+        [IF3] --C2-- [IF4]
+        [IF5] --C3-- [IF6]
+        """
+        interfaces = [
+            Interface.objects.create(device=self.device, name=f'Interface {i}') for i in range(1, 7)
+        ]
+        for i in range(0, 6, 2):
+            Cable(a_terminations=[interfaces[i]], b_terminations=[interfaces[i + 1]]).save()
+
+        queryset = Interface.objects.prefetch_related(
+            Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+        )
+        # Interfaces, CablePaths, and one query each for path Interfaces, Cables, and Devices
+        with self.assertNumQueries(5):
+            interfaces = list(queryset)
+        with self.assertNumQueries(0):
+            for interface in interfaces:
+                destination = interface._path.destinations[0]
+                self.assertNotEqual(destination.pk, interface.pk)
+                self.assertEqual(destination.device, self.device)
+
+    def test_406_cable_trace_svg_cache(self):
+        """
+        [IF1] --C1-- [IF2]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        cable1 = Cable(a_terminations=[interface1], b_terminations=[interface2], label='Cable 1')
+        cable1.save()
+        cache.clear()
+
+        interface1 = Interface.objects.select_related('_path').get(pk=interface1.pk)
+        svg = CableTraceSVG(interface1).render_cached()
+        self.assertIn('Cable 1', svg)
+        with self.assertNumQueries(0):
+            self.assertEqual(CableTraceSVG(interface1).render_cached(), svg)
+
+        # Modifying a cable in the path should invalidate the cached SVG
+        cable1.label = 'Cable 2'
+        cable1.save()
+        interface1 = Interface.objects.select_related('_path').get(pk=interface1.pk)
+        self.assertIn('Cable 2', CableTraceSVG(interface1).render_cached())
+
+        # Saving a Cable without changes should retain the cached SVG
+        svg = CableTraceSVG(interface1).render_cached()
+        Cable.objects.get(pk=cable1.pk).save()
+        self.assertEqual(cache.get(CableTraceSVG(interface1).cache_key), svg)
+
+        # Modifying a termination in the path should invalidate the cached SVG
+        interface2 = Interface.objects.get(pk=interface2.pk)
+        interface2.name = 'Interface 3'
+        interface2.save()
+        self.assertIsNone(cache.get(CableTraceSVG(interface1).cache_key))
+        self.assertIn('Interface 3', CableTraceSVG(interface1).render_cached())
@@ -1,9 +1,21 @@
+import decimal
+import uuid
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 
 from circuits.models import *
 from dcim.choices import *
+from dcim.jobs import run_site_cascade
 from dcim.models import *
+from dcim.svg import RackElevationSVG
+from dcim.utils import defer_component_instantiation
+from extras.choices import JobResultStatusChoices
+from extras.models import JobResult
 from tenancy.models import Tenant
 from utilities.utils import drange
 
@@ -212,6 +224,87 @@ class RackTestCase(TestCase):
 
         self.assertEqual(len(rack.get_available_units()), rack.u_height * 2 - 3)
 
+    def test_utilization(self):
+        """
+        Check that rack utilization accounts for both occupied and reserved units, and that utilization calculated
+        for many racks at once matches that of each individual rack.
+        """
+        rack1 = Rack.objects.first()
+        rack2 = Rack.objects.create(site=rack1.site, name='Rack 2', u_height=10)
+        attrs = {
+            'device_type': DeviceType.objects.get(u_height=1),
+            'device_role': DeviceRole.objects.first(),
+            'site': rack1.site,
+            'face': DeviceFaceChoices.FACE_FRONT,
+        }
+        Device(name='Device 1', rack=rack1, position=1, **attrs).save()
+        Device(name='Device 2', rack=rack2, position=1, **attrs).save()
+        Device(name='Device 3', rack=rack2, position=3, **attrs).save()
+        RackReservation.objects.create(rack=rack2, units=[5, 6], user=User.objects.create(username='User 1'))
+
+        # Rack2: U1 and U3 are occupied, leaving no space for a 1U device at U2.5
+        self.assertEqual(
+            rack2.get_available_units(rack_face=DeviceFaceChoices.FACE_FRONT),
+            [decimal.Decimal(u) for u in ('2', '4', '4.5', '5', '5.5', '6', '6.5', '7', '7.5', '8', '8.5', '9', '9.5',
+                                          '10')]
+        )
+        # Occupied and reserved units are both utilized
+        self.assertEqual(rack2.get_utilization(), 40.0)
+
+        racks = list(Rack.objects.all())
+        utilizations = [rack.get_utilization() for rack in racks]
+        with self.assertNumQueries(2):
+            Rack.prefetch_utilization(racks)
+        self.assertEqual([rack.get_utilization() for rack in racks], utilizations)
+
+    def test_power_utilization(self):
+        """
+        Check that rack power utilization includes the draw of PowerPorts fed by an upstream PowerPort which has no
+        draw defined, and that utilization calculated for many racks at once matches that of each individual rack.
+        """
+        rack1 = Rack.objects.first()
+        rack2 = Rack.objects.create(site=rack1.site, name='Rack 2')
+        powerpanel = PowerPanel.objects.create(site=rack1.site, name='Power Panel 1')
+        powerfeed = PowerFeed.objects.create(
+            power_panel=powerpanel, rack=rack1, name='Power Feed 1', voltage=120, amperage=20, max_utilization=80
+        )
+        attrs = {
+            'device_type': DeviceType.objects.first(),
+            'device_role': DeviceRole.objects.first(),
+            'site': rack1.site,
+        }
+        pdu = Device.objects.create(name='PDU 1', **attrs)
+        device = Device.objects.create(name='Device 1', **attrs)
+        powerport1 = PowerPort.objects.create(device=pdu, name='Power Port 1')
+        poweroutlets = (
+            PowerOutlet.objects.create(device=pdu, name='Power Outlet 1', power_port=powerport1),
+            PowerOutlet.objects.create(device=pdu, name='Power Outlet 2', power_port=powerport1),
+        )
+        powerports = (
+            PowerPort.objects.create(device=device, name='Power Port 2', allocated_draw=200),
+            PowerPort.objects.create(device=device, name='Power Port 3', allocated_draw=100),
+        )
+        Cable(a_terminations=[powerfeed], b_terminations=[powerport1]).save()
+        for poweroutlet, powerport in zip(poweroutlets, powerports):
+            Cable(a_terminations=[poweroutlet], b_terminations=[powerport]).save()
+
+        # 300VA allocated of 1920VA available
+        self.assertEqual(rack1.get_power_utilization(), 15)
+        self.assertEqual(rack2.get_power_utilization(), 0)
+
+        racks = list(Rack.objects.filter(pk__in=[rack1.pk, rack2.pk]))
+        with self.assertNumQueries(4):
+            Rack.prefetch_power_utilization(racks)
+        self.assertEqual([rack.get_power_utilization() for rack in racks], [15, 0])
+
+        # Changing the draw of a downstream PowerPort updates the power draw rollup of its upstream PowerPort
+        powerport2 = PowerPort.objects.get(pk=powerports[0].pk)
+        powerport2.allocated_draw = 400
+        powerport2.save()
+        powerport1.refresh_from_db()
+        self.assertEqual(powerport1._power_draw['allocated'], 500)
+        self.assertEqual(Rack.objects.get(pk=rack1.pk).get_power_utilization(), 26)
+
     def test_change_rack_site(self):
         """
         Check that child Devices get updated when a Rack is moved to a new Site.
@@ -237,6 +330,102 @@ class RackTestCase(TestCase):
         # Check that Device1 is now assigned to Site B
         self.assertEqual(Device.objects.get(pk=device1.pk).site, site_b)
 
+    def test_change_rack_location(self):
+        """
+        Check that child Devices are updated only when a Rack is moved to a new Site or Location.
+        """
+        site = Site.objects.create(name='Site A', slug='site-a')
+        location = Location.objects.create(site=site, name='Location 1', slug='location-1')
+        rack1 = Rack.objects.create(site=site, name='Rack 1')
+        device1 = Device.objects.create(
+            site=site,
+            rack=rack1,
+            device_type=DeviceType.objects.first(),
+            device_role=DeviceRole.objects.first()
+        )
+
+        # Saving Rack1 without moving it should not touch its Devices
+        Device.objects.filter(pk=device1.pk).update(location=location)
+        rack1.name = 'Rack 1A'
+        rack1.save()
+        self.assertEqual(Device.objects.get(pk=device1.pk).location, location)
+
+        # Move Rack1 to Location 1 and back
+        rack1.location = location
+        rack1.save()
+        self.assertEqual(Device.objects.get(pk=device1.pk).location, location)
+        rack1.location = None
+        rack1.save()
+        self.assertIsNone(Device.objects.get(pk=device1.pk).location)
+
+    def test_site_cascade_job(self):
+        """
+        Check that the background job updates the Devices within a moved Rack and records its progress.
+        """
+        rack = Rack.objects.first()
+        device1 = Device.objects.create(
+            site=rack.site,
+            location=rack.location,
+            rack=rack,
+            device_type=DeviceType.objects.first(),
+            device_role=DeviceRole.objects.first()
+        )
+
+        # Move the Rack without triggering the cascade
+        location2 = Location.objects.get(name='Location 2')
+        Rack.objects.filter(pk=rack.pk).update(site=location2.site, location=location2)
+
+        job_result = JobResult.objects.create(
+            name='Update site assignments', obj_type=ContentType.objects.get_for_model(Rack), job_id=uuid.uuid4()
+        )
+        run_site_cascade(Rack, rack.pk, job_result=job_result)
+        device1.refresh_from_db()
+        self.assertEqual(device1.site, location2.site)
+        self.assertEqual(device1.location, location2)
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_COMPLETED)
+        self.assertEqual(job_result.data['total'], 1)
+        self.assertEqual(job_result.data['processed'], 1)
+        self.assertEqual(job_result.data['succeeded'], 1)
+        self.assertEqual(job_result.data['errors'], [])
+        self.assertEqual(job_result.data['return_url'], rack.get_absolute_url())
+
+        # An unexpected exception should mark the job as errored
+        job_result = JobResult.objects.create(
+            name='Update site assignments', obj_type=ContentType.objects.get_for_model(Rack), job_id=uuid.uuid4()
+        )
+        with patch('dcim.jobs.get_site_cascade', side_effect=RuntimeError('Cascade failed')):
+            run_site_cascade(Rack, rack.pk, job_result=job_result)
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_ERRORED)
+        self.assertEqual(job_result.data['succeeded'], 0)
+        self.assertEqual(job_result.data['errors'][0]['object'], str(rack))
+
+    def test_elevation_svg_cache(self):
+        """
+        Check that cached rack elevations are invalidated when a Device is moved to another Rack.
+        """
+        cache.clear()
+        rack1 = Rack.objects.first()
+        rack2 = Rack.objects.create(site=rack1.site, name='Rack 2')
+        device1 = Device.objects.create(
+            name='Device 1',
+            device_type=DeviceType.objects.first(),
+            device_role=DeviceRole.objects.first(),
+            site=rack1.site,
+            rack=rack1,
+            position=1,
+            face=DeviceFaceChoices.FACE_FRONT
+        )
+
+        svg = RackElevationSVG(rack1).render_cached(DeviceFaceChoices.FACE_FRONT)
+        self.assertIn('Device 1', svg)
+        with self.assertNumQueries(0):
+            self.assertEqual(RackElevationSVG(rack1).render_cached(DeviceFaceChoices.FACE_FRONT), svg)
+
+        # Move Device1 to Rack2
+        device1.rack = rack2
+        device1.save()
+        self.assertNotIn('Device 1', RackElevationSVG(rack1).render_cached(DeviceFaceChoices.FACE_FRONT))
+
 
 class DeviceTestCase(TestCase):
 
@@ -378,6 +567,52 @@ class DeviceTestCase(TestCase):
             name='Device Bay 1'
         )
 
+    def test_deferred_component_instantiation(self):
+        """
+        Ensure that components are instantiated for all Devices created while instantiation is deferred.
+        """
+        InventoryItemTemplate.objects.create(device_type=self.device_type, name='Inventory Item 1')
+        parent = InventoryItemTemplate.objects.create(device_type=self.device_type, name='Inventory Item 2')
+        InventoryItemTemplate.objects.create(
+            device_type=self.device_type,
+            parent=parent,
+            name='Inventory Item 3',
+            component=InterfaceTemplate.objects.get(device_type=self.device_type)
+        )
+
+        with defer_component_instantiation():
+            devices = [
+                Device.objects.create(
+                    site=self.site,
+                    device_type=self.device_type,
+                    device_role=self.device_role,
+                    name=f'Test Device {i}'
+                )
+                for i in range(1, 4)
+            ]
+            self.assertFalse(Interface.objects.filter(device__in=devices).exists())
+
+        for d in devices:
+            pp = PowerPort.objects.get(device=d, name='Power Port 1')
+            PowerOutlet.objects.get(device=d, name='Power Outlet 1', power_port=pp)
+            rp = RearPort.objects.get(device=d, name='Rear Port 1')
+            FrontPort.objects.get(device=d, name='Front Port 1', rear_port=rp)
+            interface = Interface.objects.get(device=d, name='Interface 1')
+
+            item1 = InventoryItem.objects.get(device=d, name='Inventory Item 1')
+            item2 = InventoryItem.objects.get(device=d, name='Inventory Item 2')
+            item3 = InventoryItem.objects.get(device=d, name='Inventory Item 3')
+            self.assertEqual(item3.parent, item2)
+            self.assertEqual(item3.component, interface)
+            self.assertEqual((item1.lft, item1.rght, item1.level), (1, 2, 0))
+            self.assertEqual((item2.lft, item2.rght, item2.level), (1, 4, 0))
+            self.assertEqual((item3.lft, item3.rght, item3.level), (2, 3, 1))
+            self.assertEqual(item3.tree_id, item2.tree_id)
+            self.assertEqual(list(item2.get_children()), [item3])
+
+        tree_ids = InventoryItem.objects.filter(parent__isnull=True).values_list('tree_id', flat=True)
+        self.assertEqual(len(set(tree_ids)), 6)
+
     def test_multiple_unnamed_devices(self):
 
         device1 = Device(
@@ -1,3 +1,4 @@
+import uuid
 from decimal import Decimal
 
 import pytz
@@ -11,10 +12,12 @@ from netaddr import EUI
 from dcim.choices import *
 from dcim.constants import *
 from dcim.models import *
+from dcim.views import CableBulkImportView
 from ipam.models import ASN, RIR, VLAN, VRF
 from netbox.api.serializers import GenericObjectSerializer
 from tenancy.models import Tenant
 from utilities.testing import ViewTestCases, create_tags, create_test_device, post_data
+from utilities.utils import NetBoxFakeRequest
 from wireless.models import WirelessLAN
 
 
@@ -1871,6 +1874,29 @@ class ModuleTestCase(
         self.assertHttpStatus(self.client.post(**request), 302)
         self.assertEqual(Interface.objects.filter(device=device).count(), 5)
 
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_module_component_bulk_import(self):
+        self.add_permissions('dcim.add_module')
+
+        # Add components to the first two ModuleTypes
+        module_types = ModuleType.objects.all()[:2]
+        for i, module_type in enumerate(module_types, start=1):
+            power_port_template = PowerPortTemplate.objects.create(module_type=module_type, name=f'Power Port {i}')
+            PowerOutletTemplate.objects.create(
+                module_type=module_type, name=f'Power Outlet {i}', power_port=power_port_template
+            )
+        device = Device.objects.get(name='Device 2')
+
+        data = {
+            'csv': '\n'.join(self.csv_data[:3]),
+        }
+        self.assertHttpStatus(self.client.post(self._get_url('import'), data), 200)
+
+        for i, module_type in enumerate(module_types, start=1):
+            module = Module.objects.get(device=device, module_type=module_type)
+            power_port = PowerPort.objects.get(device=device, module=module, name=f'Power Port {i}')
+            PowerOutlet.objects.get(device=device, module=module, name=f'Power Outlet {i}', power_port=power_port)
+
     @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
     def test_module_component_adoption(self):
         self.add_permissions('dcim.add_module')
@@ -2668,6 +2694,99 @@ class CableTestCase(
             'length_unit': CableLengthUnitChoices.UNIT_METER,
         }
 
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_bulk_import_cable_paths(self):
+        self.add_permissions('dcim.add_cable')
+
+        data = {
+            'csv': '\n'.join(self.csv_data),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertHttpStatus(self.client.post(self._get_url('import'), data), 200)
+
+        # Check that terminations and CablePaths were created for each imported cable
+        for name in ('Interface 1', 'Interface 2', 'Interface 3'):
+            interface_a = Interface.objects.get(device__name='Device 3', name=name)
+            interface_b = Interface.objects.get(device__name='Device 4', name=name)
+            self.assertIsNotNone(interface_a.cable)
+            self.assertEqual(interface_a.cable, interface_b.cable)
+            self.assertEqual(interface_a.cable.terminations.count(), 2)
+            self.assertEqual(interface_a.connected_endpoints, [interface_b])
+            self.assertEqual(interface_b.connected_endpoints, [interface_a])
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_bulk_import_power_cable(self):
+        self.add_permissions('dcim.add_cable')
+        pdu, device = Device.objects.filter(name__in=('Device 1', 'Device 2')).order_by('name')
+        pdu_port = PowerPort.objects.create(device=pdu, name='Power Port 1')
+        PowerOutlet.objects.create(device=pdu, name='Power Outlet 1', power_port=pdu_port)
+        PowerPort.objects.create(device=device, name='Power Port 1', allocated_draw=100, maximum_draw=200)
+        self.assertEqual(pdu_port.get_power_draw()['allocated'], 0)
+
+        data = {
+            'csv': '\n'.join((
+                self.csv_data[0],
+                "Device 1,dcim.poweroutlet,Power Outlet 1,Device 2,dcim.powerport,Power Port 1",
+            )),
+        }
+        self.assertHttpStatus(self.client.post(self._get_url('import'), data), 200)
+
+        # The allocated draw of the upstream power port should reflect the newly connected device
+        pdu_port.refresh_from_db()
+        self.assertEqual(pdu_port.get_power_draw()['allocated'], 100)
+        self.assertEqual(pdu_port.get_power_draw()['maximum'], 200)
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_bulk_import_duplicate_termination(self):
+        self.add_permissions('dcim.add_cable')
+        cable_count = Cable.objects.count()
+
+        # The second row reuses a termination claimed by the first
+        data = {
+            'csv': '\n'.join((
+                self.csv_data[0],
+                "Device 3,dcim.interface,Interface 1,Device 4,dcim.interface,Interface 1",
+                "Device 3,dcim.interface,Interface 2,Device 4,dcim.interface,Interface 1",
+            )),
+        }
+        response = self.client.post(self._get_url('import'), data)
+        self.assertHttpStatus(response, 200)
+        self.assertIn('already connected by row 1', str(response.content))
+        self.assertEqual(Cable.objects.count(), cable_count)
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_bulk_import_invalid_row_does_not_claim_termination(self):
+        fields = self.csv_data[0].split(',')
+        headers = {field: None for field in fields}
+        records = [
+            dict(zip(fields, row.split(','))) for row in (
+                "Device 3,dcim.interface,Interface 1,Device 4,dcim.interface,Interface 1",
+                # Invalid: Interface 1 on Device 4 is claimed by the first record
+                "Device 3,dcim.interface,Interface 2,Device 4,dcim.interface,Interface 1",
+                "Device 3,dcim.interface,Interface 2,Device 4,dcim.interface,Interface 2",
+            )
+        ]
+        request = NetBoxFakeRequest({
+            'META': {},
+            'POST': {},
+            'GET': {},
+            'FILES': {},
+            'user': self.user,
+            'path': self._get_url('import'),
+            'id': uuid.uuid4(),
+        })
+
+        # The rejected second record must not prevent the third from using its side A termination
+        new_objs, errors = CableBulkImportView()._import_records(headers, records, request)
+        self.assertEqual(len(errors), 1)
+        row, field_errors = errors[0]
+        self.assertEqual(row, 2)
+        self.assertEqual([field for field, _ in field_errors], ['side_b_name'])
+        self.assertEqual(len(new_objs), 2)
+        self.assertEqual(
+            Interface.objects.get(device__name='Device 3', name='Interface 2').cable, new_objs[1]
+        )
+
     def model_to_dict(self, *args, **kwargs):
         data = super().model_to_dict(*args, **kwargs)
 
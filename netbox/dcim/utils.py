@@ -1,7 +1,20 @@
+import decimal
+import functools
 import itertools
+import math
+import operator
+from collections import defaultdict
+from contextlib import contextmanager
 
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
+from django_rq.queues import get_connection
+from rq import Worker
+
+from dcim.choices import DeviceFaceChoices
+from dcim.constants import SITE_CASCADE_JOB_THRESHOLD
+from netbox import thread_locals
+from netbox.request_context import get_request
 
 
 def compile_path_node(ct_id, object_id):
@@ -32,12 +45,99 @@ def path_node_to_object(repr):
     return ct.model_class().objects.filter(pk=object_id).first()
 
 
-def create_cablepath(terminations):
+class PathUpdateQueue:
     """
-    Create CablePaths for all paths originating from the specified set of nodes.
+    Collects the CablePath changes required by modifications to cables, to be applied once the current transaction
+    has been committed. Each origin and each affected CablePath is traced only once, no matter how many changes were
+    made to it.
+    """
+    def __init__(self):
+        self.origins = {}
+        self.nodes = set()
+        self.cablepath_ids = set()
 
-    :param terminations: Iterable of CableTermination objects
+    def add_origins(self, terminations):
+        termination_type = ContentType.objects.get_for_model(terminations[0])
+        termination_ids = [t.pk for t in terminations]
+        self.origins[(termination_type.pk, frozenset(termination_ids))] = (termination_type, termination_ids)
+
+    def flush(self):
+        from dcim.models import CablePath
+
+        # Retrace all existing CablePaths affected by the changes
+        cable_paths = CablePath.objects.filter(pk__in=self.cablepath_ids)
+        if self.nodes:
+            cable_paths |= CablePath.objects.filter(_nodes__overlap=list(self.nodes))
+        with transaction.atomic():
+            for cp in cable_paths:
+                cp.retrace()
+
+        # Create CablePaths for new origins. Terminations are retrieved anew to reflect their current cables.
+        for termination_type, termination_ids in self.origins.values():
+            terminations = termination_type.model_class().objects.in_bulk(termination_ids)
+            terminations = [terminations[pk] for pk in termination_ids if pk in terminations]
+            if terminations:
+                _create_cablepath(terminations)
+
+
+def get_path_update_queue():
+    """
+    Return the active PathUpdateQueue, if any.
+    """
+    return getattr(thread_locals, 'path_update_queue', None)
+
+
+@contextmanager
+def defer_path_updates():
+    """
+    Defer the tracing of CablePaths affected by changes to cables and their terminations until the current
+    transaction has been committed (or until the end of the block, if no transaction is active). This avoids
+    retracing the same paths repeatedly when modifying many cables at once. Nested blocks defer to the outermost.
+    """
+    if get_path_update_queue() is not None:
+        yield
+        return
+
+    queue = thread_locals.path_update_queue = PathUpdateQueue()
+    try:
+        yield
+    finally:
+        del thread_locals.path_update_queue
+    transaction.on_commit(queue.flush)
+
+
+def get_component_instantiation_queue():
+    """
+    Return the list of new Devices and Modules awaiting component instantiation, if instantiation has been deferred.
+    """
+    return getattr(thread_locals, 'component_instantiation_queue', None)
+
+
+@contextmanager
+def defer_component_instantiation():
+    """
+    Defer the instantiation of components for new Devices and Modules until the end of the block, at which point the
+    components for all Devices (and then all Modules) created within it are instantiated together. Nested blocks defer
+    to the outermost.
     """
+    from dcim.models import Device, Module
+
+    if get_component_instantiation_queue() is not None:
+        yield
+        return
+
+    queue = thread_locals.component_instantiation_queue = []
+    try:
+        yield
+    finally:
+        del thread_locals.component_instantiation_queue
+    for model in (Device, Module):
+        instances = [obj for obj in queue if isinstance(obj, model)]
+        if instances:
+            model.instantiate_components(instances)
+
+
+def _create_cablepath(terminations):
     from dcim.models import CablePath
 
     cp = CablePath.from_origin(terminations)
@@ -45,12 +145,44 @@ def create_cablepath(terminations):
         cp.save()
 
 
+def create_cablepath(terminations):
+    """
+    Create CablePaths for all paths originating from the specified set of nodes.
+
+    :param terminations: Iterable of CableTermination objects
+    """
+    queue = get_path_update_queue()
+    if queue is not None:
+        queue.add_origins(terminations)
+    else:
+        _create_cablepath(terminations)
+
+
+def retrace_paths(cable_paths):
+    """
+    Retrace the specified CablePaths.
+
+    :param cable_paths: QuerySet of CablePaths
+    """
+    queue = get_path_update_queue()
+    if queue is not None:
+        queue.cablepath_ids.update(cable_paths.values_list('pk', flat=True))
+    else:
+        for cp in cable_paths:
+            cp.retrace()
+
+
 def rebuild_paths(terminations):
     """
     Rebuild all CablePaths which traverse the specified nodes.
     """
     from dcim.models import CablePath
 
+    queue = get_path_update_queue()
+    if queue is not None:
+        queue.nodes.update(object_to_path_node(obj) for obj in terminations)
+        return
+
     for obj in terminations:
         cable_paths = CablePath.objects.filter(_nodes__contains=obj)
 
@@ -58,3 +190,212 @@ def rebuild_paths(terminations):
             for cp in cable_paths:
                 cp.delete()
                 create_cablepath(cp.origins)
+
+
+def trace_cable_end(terminations):
+    """
+    Create or rebuild the CablePaths affected by attaching a cable to the specified terminations, all of which belong
+    to the same end of the cable.
+
+    :param terminations: List of termination objects
+    """
+    from dcim.models import PathEndpoint
+
+    if not terminations:
+        return
+    # Examine type of first termination to determine object type (all must be the same)
+    if isinstance(terminations[0], PathEndpoint):
+        create_cablepath(terminations)
+    else:
+        rebuild_paths(terminations)
+
+
+def get_site_cascade(instance):
+    """
+    Return the objects which must be updated to reflect the current Site (and, for a Rack, Location) assignment of a
+    Location or Rack, as a list of (queryset, values) tuples. Objects which already match are excluded.
+
+    :param instance: A Location or Rack
+    """
+    from dcim.models import Device, Location, PowerPanel, Rack
+
+    if isinstance(instance, Location):
+        values = {'site_id': instance.site_id}
+        locations = instance.get_descendants(include_self=True)
+        querysets = (
+            instance.get_descendants(),
+            Rack.objects.filter(location__in=locations),
+            Device.objects.filter(location__in=locations),
+            PowerPanel.objects.filter(location__in=locations),
+        )
+    else:
+        values = {'site_id': instance.site_id, 'location_id': instance.location_id}
+        querysets = (
+            Device.objects.filter(rack=instance),
+        )
+
+    return [(queryset.exclude(**values), values) for queryset in querysets]
+
+
+def update_site_assignments(instance):
+    """
+    Update the objects within a Location or Rack whose Site (or Location) assignment has changed. If many objects are
+    affected and an RQ worker is available, they are updated by a background job once the current transaction has
+    been committed, rather than within the current request.
+
+    :param instance: A Location or Rack
+    """
+    from dcim.jobs import run_site_cascade
+    from extras.models import JobResult
+
+    cascade = get_site_cascade(instance)
+    count = sum(queryset.count() for queryset, _ in cascade)
+
+    if count > SITE_CASCADE_JOB_THRESHOLD and Worker.count(get_connection('default')):
+        request = get_request()
+        user = request.user if request is not None and request.user.is_authenticated else None
+        name = f'Update site assignments for {instance._meta.verbose_name} {instance}'
+        content_type = ContentType.objects.get_for_model(instance)
+        transaction.on_commit(lambda: JobResult.enqueue_job(
+            run_site_cascade, name, content_type, user, model=type(instance), pk=instance.pk
+        ))
+        return
+
+    for queryset, values in cascade:
+        queryset.update(**values)
+
+
+def update_power_draws(powerport_ids):
+    """
+    Update the power draw rollup of the specified PowerPorts.
+    """
+    from dcim.models import PowerPort
+
+    for powerport in PowerPort.objects.filter(pk__in=[pk for pk in powerport_ids if pk is not None]):
+        powerport.update_power_draw()
+
+
+def update_cable_power_draws(*cable_ids):
+    """
+    Update the power draw rollup of all PowerPorts attached to the specified cables, either directly or via a child
+    PowerOutlet.
+    """
+    from dcim.models import PowerOutlet, PowerPort
+
+    update_power_draws({
+        *PowerPort.objects.filter(cable__in=cable_ids).values_list('pk', flat=True),
+        *PowerOutlet.objects.filter(cable__in=cable_ids).values_list('power_port_id', flat=True),
+    })
+
+
+class RackOccupancy:
+    """
+    A compact map of the space consumed within a rack, at half-unit resolution. The space occupied on each rack face is
+    stored as an integer bitmap, in which bit n represents the nth half-unit from the bottom of the rack. This allows
+    the availability of any range of units to be checked in constant time.
+
+    :param u_height: Height of the rack, in units
+    """
+    def __init__(self, u_height):
+        self.size = int(u_height) * 2
+        self.mask = (1 << self.size) - 1
+        self.faces = defaultdict(int)
+        self.reserved = 0
+
+    @staticmethod
+    def _to_index(position):
+        return (decimal.Decimal(position) - 1) * 2
+
+    @staticmethod
+    def _to_length(u_height):
+        return math.ceil(decimal.Decimal(u_height) * 2)
+
+    def _get_bits(self, position, u_height):
+        index = int(self._to_index(position))
+        return (((1 << self._to_length(u_height)) - 1) << index) & self.mask
+
+    @staticmethod
+    def iter_bits(bitmap):
+        """
+        Yield the index of each set bit within a bitmap, in ascending order.
+        """
+        while bitmap:
+            lowest = bitmap & -bitmap
+            yield lowest.bit_length() - 1
+            bitmap ^= lowest
+
+    def add_device(self, position, u_height, face=None):
+        """
+        Mark the units consumed by a device as occupied.
+
+        :param position: The lowest unit occupied by the device
+        :param u_height: Height of the device, in units
+        :param face: The rack face occupied by the device; None for full-depth devices
+        """
+        bits = self._get_bits(position, u_height)
+        if face is None:
+            self.faces[DeviceFaceChoices.FACE_FRONT] |= bits
+            self.faces[DeviceFaceChoices.FACE_REAR] |= bits
+        else:
+            self.faces[face] |= bits
+
+    def add_reservation(self, units):
+        """
+        Mark the specified units as reserved.
+        """
+        for u in units:
+            self.reserved |= self._get_bits(u, 0.5)
+
+    def get_occupied(self, face=None):
+        """
+        Return a bitmap of the half-units occupied on the specified rack face, or on any face if None.
+        """
+        if face is None:
+            return functools.reduce(operator.or_, self.faces.values(), 0)
+        return self.faces[face]
+
+    def get_available(self, u_height=1, face=None):
+        """
+        Return a bitmap of the positions at which a device of the given height can be installed. A set bit indicates
+        that the half-unit it represents, along with all half-units required above it, is unoccupied.
+
+        :param u_height: Height of the device, in units
+        :param face: The rack face required; None for full-depth devices
+        """
+        length = max(self._to_length(u_height), 1)
+        available = ~self.get_occupied(face) & self.mask
+
+        # Progressively narrow the bitmap to positions at the bottom of a free run of the required length
+        run = 1
+        while run < length:
+            shift = min(run, length - run)
+            available &= available >> shift
+            run += shift
+
+        return available
+
+    def is_available(self, position, u_height=1, face=None):
+        """
+        Return True if a device of the given height can be installed at the specified position.
+
+        :param position: The lowest unit to be occupied
+        :param u_height: Height of the device, in units
+        :param face: The rack face required; None for full-depth devices
+        """
+        index = self._to_index(position)
+        if index % 1 or not 0 <= index < self.size:
+            return False
+        length = max(self._to_length(u_height), 1)
+        if index + length > self.size:
+            return False
+        bits = ((1 << length) - 1) << int(index)
+        return not self.get_occupied(face) & bits
+
+    def get_utilization(self):
+        """
+        Return the percentage of the rack which is occupied or reserved. A half-unit counts as available only if it
+        has a free unit above it and its unit is not reserved.
+        """
+        available = self.get_available() & ~self.reserved
+        occupied_count = self.size - bin(available).count('1')
+        return float(occupied_count) / self.size * 100
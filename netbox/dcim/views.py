@@ -1,5 +1,8 @@
+from collections import defaultdict
+
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist, FieldError
 from django.core.paginator import EmptyPage, PageNotAnInteger
 from django.db import transaction
 from django.db.models import Prefetch
@@ -15,7 +18,7 @@ from extras.views import ObjectConfigContextView
 from ipam.models import ASN, IPAddress, Prefix, Service, VLAN, VLANGroup
 from ipam.tables import AssignedIPAddressesTable, InterfaceVLANTable
 from netbox.views import generic
-from utilities.forms import ConfirmationForm
+from utilities.forms import ConfirmationForm, restrict_form_fields
 from utilities.paginator import EnhancedPaginator, get_paginate_count
 from utilities.permissions import get_permission_for_model
 from utilities.utils import count_related
@@ -25,6 +28,7 @@ from . import filtersets, forms, tables
 from .choices import DeviceFaceChoices
 from .constants import NONCONNECTABLE_IFACE_TYPES
 from .models import *
+from .utils import defer_component_instantiation, defer_path_updates
 
 CABLE_TERMINATION_TYPES = {
     'dcim.consoleport': ConsolePort,
@@ -1635,6 +1639,11 @@ class DeviceConsolePortsView(DeviceComponentsView):
     filterset = filtersets.ConsolePortFilterSet
     template_name = 'dcim/device/consoleports.html'
 
+    def get_children(self, request, parent):
+        return super().get_children(request, parent).prefetch_related(
+            Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+        )
+
 
 class DeviceConsoleServerPortsView(DeviceComponentsView):
     child_model = ConsoleServerPort
@@ -1649,6 +1658,11 @@ class DevicePowerPortsView(DeviceComponentsView):
     filterset = filtersets.PowerPortFilterSet
     template_name = 'dcim/device/powerports.html'
 
+    def get_children(self, request, parent):
+        return super().get_children(request, parent).prefetch_related(
+            Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+        )
+
 
 class DevicePowerOutletsView(DeviceComponentsView):
     child_model = PowerOutlet
@@ -1666,7 +1680,8 @@ class DeviceInterfacesView(DeviceComponentsView):
     def get_children(self, request, parent):
         return parent.vc_interfaces().restrict(request.user, 'view').prefetch_related(
             Prefetch('ip_addresses', queryset=IPAddress.objects.restrict(request.user)),
-            Prefetch('member_interfaces', queryset=Interface.objects.restrict(request.user))
+            Prefetch('member_interfaces', queryset=Interface.objects.restrict(request.user)),
+            Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
         )
 
 
@@ -1760,7 +1775,17 @@ class DeviceDeleteView(generic.ObjectDeleteView):
     queryset = Device.objects.all()
 
 
-class DeviceBulkImportView(generic.BulkImportView):
+class DeferComponentInstantiationMixin:
+    """
+    Defer the instantiation of components for new Devices and Modules until all objects have been created, so that
+    components for all objects are created together.
+    """
+    def _import_records(self, *args, **kwargs):
+        with defer_component_instantiation():
+            return super()._import_records(*args, **kwargs)
+
+
+class DeviceBulkImportView(DeferComponentInstantiationMixin, generic.BulkImportView):
     queryset = Device.objects.all()
     model_form = forms.DeviceCSVForm
     table = tables.DeviceImportTable
@@ -1828,7 +1853,7 @@ class ModuleDeleteView(generic.ObjectDeleteView):
     queryset = Module.objects.all()
 
 
-class ModuleBulkImportView(generic.BulkImportView):
+class ModuleBulkImportView(DeferComponentInstantiationMixin, generic.BulkImportView):
     queryset = Module.objects.all()
     model_form = forms.ModuleCSVForm
     table = tables.ModuleTable
@@ -1852,7 +1877,9 @@ class ModuleBulkDeleteView(generic.BulkDeleteView):
 #
 
 class ConsolePortListView(generic.ObjectListView):
-    queryset = ConsolePort.objects.all()
+    queryset = ConsolePort.objects.prefetch_related(
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+    )
     filterset = filtersets.ConsolePortFilterSet
     filterset_form = forms.ConsolePortFilterForm
     table = tables.ConsolePortTable
@@ -1970,7 +1997,9 @@ class ConsoleServerPortBulkDeleteView(generic.BulkDeleteView):
 #
 
 class PowerPortListView(generic.ObjectListView):
-    queryset = PowerPort.objects.all()
+    queryset = PowerPort.objects.prefetch_related(
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+    )
     filterset = filtersets.PowerPortFilterSet
     filterset_form = forms.PowerPortFilterForm
     table = tables.PowerPortTable
@@ -2088,7 +2117,9 @@ class PowerOutletBulkDeleteView(generic.BulkDeleteView):
 #
 
 class InterfaceListView(generic.ObjectListView):
-    queryset = Interface.objects.all()
+    queryset = Interface.objects.prefetch_related(
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+    )
     filterset = filtersets.InterfaceFilterSet
     filterset_form = forms.InterfaceFilterForm
     table = tables.InterfaceTable
@@ -2863,13 +2894,108 @@ class CableDeleteView(generic.ObjectDeleteView):
     queryset = Cable.objects.all()
 
 
-class CableBulkImportView(generic.BulkImportView):
+class DeferPathUpdatesMixin:
+    """
+    Defer the tracing of CablePaths until all objects have been processed, so that each affected path is traced only
+    once.
+    """
+    def post(self, request, *args, **kwargs):
+        with defer_path_updates():
+            return super().post(request, *args, **kwargs)
+
+
+class CableBulkImportView(DeferPathUpdatesMixin, generic.BulkImportView):
     queryset = Cable.objects.all()
     model_form = forms.CableCSVForm
     table = tables.CableTable
 
+    def _get_terminations(self, headers, records):
+        """
+        Retrieve all device component terminations referenced by the given CSV records, using one query per type of
+        component and device accessor. Returns a mapping of (content type ID, device ID, name) to termination objects.
+        """
+        lookups = defaultdict(lambda: (set(), set()))
+        for side in 'ab':
+            device_accessor = headers.get(f'side_{side}_device') or 'name'
+            for record in records:
+                device = record.get(f'side_{side}_device')
+                content_type = record.get(f'side_{side}_type')
+                name = record.get(f'side_{side}_name')
+                if device and content_type and name:
+                    devices, names = lookups[(content_type, device_accessor)]
+                    devices.add(device)
+                    names.add(name)
+
+        terminations = {}
+        for (content_type, device_accessor), (devices, names) in lookups.items():
+            try:
+                content_type = ContentType.objects.get_by_natural_key(*content_type.split('.'))
+                model = content_type.model_class()
+                model._meta.get_field('device')
+                queryset = model.objects.filter(**{
+                    f'device__{device_accessor}__in': devices,
+                    'name__in': names,
+                }).select_related('device__rack', 'device__location', 'device__site')
+                for termination in queryset:
+                    terminations[(content_type.pk, termination.device_id, termination.name)] = termination
+            except (AttributeError, ContentType.DoesNotExist, FieldDoesNotExist, FieldError, TypeError, ValueError):
+                # Invalid references are reported by the form
+                continue
+
+        return terminations
+
+    def _import_records(self, headers, records, request, start=1, stop_on_error=False):
+        """
+        Validate all records before creating any Cables, then create the Cables and their CableTerminations in bulk.
+        Terminations are retrieved in advance for all records, and each termination may be claimed by only one record.
+        """
+        terminations = self._get_terminations(headers, records)
+        claimed = {}
+        obj_forms = []
+        errors = []
+
+        for row, data in enumerate(records, start=start):
+            obj_form = self.model_form(data, headers=headers, terminations=terminations)
+            restrict_form_fields(obj_form, request.user)
+
+            if obj_form.is_valid():
+                # Check for terminations claimed by an earlier record
+                field_errors = []
+                keys = []
+                for side in 'ab':
+                    termination = obj_form.cleaned_data[f'side_{side}_name']
+                    key = (termination._meta.model, termination.pk)
+                    if key in claimed:
+                        field_errors.append((
+                            f'side_{side}_name',
+                            f"Side {side.upper()}: {termination.device} {termination} is already connected by row "
+                            f"{claimed[key]}"
+                        ))
+                    keys.append(key)
+                if not field_errors:
+                    # Claim the terminations only once the record is known to be valid
+                    for key in keys:
+                        claimed[key] = row
+                    obj_form.save(commit=False)
+                    obj_forms.append(obj_form)
+                    continue
+            else:
+                field_errors = [(field, err[0]) for field, err in obj_form.errors.items()]
+
+            errors.append((row, field_errors))
+            if stop_on_error:
+                return [], errors
+
+        new_objs = [obj_form.instance for obj_form in obj_forms]
+        with defer_path_updates():
+            Cable.bulk_create_with_terminations(new_objs)
+        for obj_form in obj_forms:
+            obj_form.save_m2m()
+
+        return new_objs, errors
+
 
-class CableBulkEditView(generic.BulkEditView):
+class CableBulkEditView(DeferPathUpdatesMixin, generic.BulkEditView):
     queryset = Cable.objects.prefetch_related(
         'terminations__termination', 'terminations___device', 'terminations___rack', 'terminations___location',
         'terminations___site',
@@ -2879,7 +3005,7 @@ class CableBulkEditView(generic.BulkEditView):
     form = forms.CableBulkEditForm
 
 
-class CableBulkDeleteView(generic.BulkDeleteView):
+class CableBulkDeleteView(DeferPathUpdatesMixin, generic.BulkDeleteView):
     queryset = Cable.objects.prefetch_related(
         'terminations__termination', 'terminations___device', 'terminations___rack', 'terminations___location',
         'terminations___site',
@@ -2893,7 +3019,9 @@ class CableBulkDeleteView(generic.BulkDeleteView):
 #
 
 class ConsoleConnectionsListView(generic.ObjectListView):
-    queryset = ConsolePort.objects.filter(_path__isnull=False).order_by('device')
+    queryset = ConsolePort.objects.filter(_path__isnull=False).prefetch_related(
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+    ).order_by('device')
     filterset = filtersets.ConsoleConnectionFilterSet
     filterset_form = forms.ConsoleConnectionFilterForm
     table = tables.ConsoleConnectionTable
@@ -2907,7 +3035,9 @@ class ConsoleConnectionsListView(generic.ObjectListView):
 
 
 class PowerConnectionsListView(generic.ObjectListView):
-    queryset = PowerPort.objects.filter(_path__isnull=False).order_by('device')
+    queryset = PowerPort.objects.filter(_path__isnull=False).prefetch_related(
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+    ).order_by('device')
     filterset = filtersets.PowerConnectionFilterSet
     filterset_form = forms.PowerConnectionFilterForm
     table = tables.PowerConnectionTable
@@ -2921,7 +3051,9 @@ class PowerConnectionsListView(generic.ObjectListView):
 
 
 class InterfaceConnectionsListView(generic.ObjectListView):
-    queryset = Interface.objects.filter(_path__isnull=False).order_by('device')
+    queryset = Interface.objects.filter(_path__isnull=False).prefetch_related(
+        Prefetch('_path', queryset=CablePath.objects.prefetch_path_objects())
+    ).order_by('device')
     filterset = filtersets.InterfaceConnectionFilterSet
     filterset_form = forms.InterfaceConnectionFilterForm
     table = tables.InterfaceConnectionTable
@@ -19,7 +19,7 @@ class ConfigRevisionAdmin(admin.ModelAdmin):
             'fields': ('POWERFEED_DEFAULT_VOLTAGE', 'POWERFEED_DEFAULT_AMPERAGE', 'POWERFEED_DEFAULT_MAX_UTILIZATION')
         }),
         ('IPAM', {
-            'fields': ('ENFORCE_GLOBAL_UNIQUE', 'PREFER_IPV4'),
+            'fields': ('ENFORCE_GLOBAL_UNIQUE', 'PREFER_IPV4', 'PREFIX_INDEX_ENABLED'),
         }),
         ('Security', {
             'fields': ('ALLOWED_URL_SCHEMES',),
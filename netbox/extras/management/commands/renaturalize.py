@@ -1,8 +1,52 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 from django.apps import apps
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
 from utilities.fields import NaturalOrderingField
 
+DEFAULT_BATCH_SIZE = 1000
+
+
+def renaturalize_field(model_label, field_name, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recalculate the values of a NaturalOrderingField. Rows are streamed from the database using a server-side cursor,
+    and only those rows whose naturalized value has changed are updated, in batches of batch_size. Returns the number
+    of rows updated and the total number of rows.
+
+    :param model_label: The label of the model (e.g. "dcim.Interface")
+    :param field_name: The name of the NaturalOrderingField
+    :param batch_size: The number of rows to retrieve and update at once
+    """
+    model = apps.get_model(model_label)
+    field = model._meta.get_field(field_name)
+    naturalize = field.naturalize_function
+
+    # Many rows typically share a value (e.g. interface names), so each unique value is naturalized only once
+    naturalized_values = {}
+    pending = []
+    count = total = 0
+
+    queryset = model.objects.order_by().values_list('pk', field.target_field, field.attname)
+    for pk, value, current_value in queryset.iterator(chunk_size=batch_size):
+        total += 1
+        if value not in naturalized_values:
+            naturalized_values[value] = naturalize(value, max_length=field.max_length)
+        if naturalized_values[value] == current_value:
+            continue
+
+        pending.append(model(pk=pk, **{field.attname: naturalized_values[value]}))
+        if len(pending) >= batch_size:
+            count += model.objects.bulk_update(pending, [field.name])
+            pending = []
+
+    if pending:
+        count += model.objects.bulk_update(pending, [field.name])
+
+    return count, total
+
 
 class Command(BaseCommand):
     help = "Recalculate natural ordering values for the specified models"
@@ -12,6 +56,14 @@ class Command(BaseCommand):
             'args', metavar='app_label.ModelName', nargs='*',
             help='One or more specific models (each prefixed with its app_label) to renaturalize',
         )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help=f'The number of rows to retrieve and update at once (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='The number of worker processes among which fields are divided (default: 1)',
+        )
 
     def _get_models(self, names):
         """
@@ -63,49 +115,51 @@ class Command(BaseCommand):
         return models
 
     def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        batch_size = options['batch_size']
+        processes = options['processes']
+        if batch_size < 1:
+            raise CommandError("Batch size must be a positive integer.")
+        if processes < 1:
+            raise CommandError("Number of processes must be a positive integer.")
 
         models = self._get_models(args)
+        fields = [
+            (model, field) for model, model_fields in models for field in model_fields
+        ]
 
-        if options['verbosity']:
+        if verbosity:
             self.stdout.write(f"Renaturalizing {len(models)} models.")
 
-        for model, fields in models:
-            for field in fields:
-                target_field = field.target_field
-                naturalize = field.naturalize_function
-                count = 0
-
-                # Print the model and field name
-                if options['verbosity']:
-                    self.stdout.write(
-                        f"{model._meta.label}.{field.target_field} ({field.name})... ",
-                        ending='\n' if options['verbosity'] >= 2 else ''
-                    )
-                    self.stdout.flush()
-
-                # Find all unique values for the field
-                queryset = model.objects.values_list(target_field, flat=True).order_by(target_field).distinct()
-                for value in queryset:
-                    naturalized_value = naturalize(value, max_length=field.max_length)
-
-                    if options['verbosity'] >= 2:
-                        self.stdout.write(f"  {value} -> {naturalized_value}", ending='')
-                        self.stdout.flush()
-
-                    # Update each unique field value in bulk
-                    changed = model.objects.filter(name=value).update(**{field.name: naturalized_value})
-
-                    if options['verbosity'] >= 2:
-                        self.stdout.write(f" ({changed})")
-                    count += changed
-
-                # Print the total count of alterations for the field
-                if options['verbosity'] >= 2:
-                    self.stdout.write(self.style.SUCCESS(
-                        f"{count} {model._meta.verbose_name_plural} updated ({queryset.count()} unique values)"
-                    ))
-                elif options['verbosity']:
-                    self.stdout.write(self.style.SUCCESS(str(count)))
-
-        if options['verbosity']:
+        if processes > 1:
+            # Close any open database connections before forking, so that each worker process opens its own
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork'))
+            with pool:
+                futures = [
+                    pool.submit(renaturalize_field, model._meta.label, field.name, batch_size)
+                    for model, field in fields
+                ]
+                results = (future.result() for future in futures)
+        else:
+            results = (
+                renaturalize_field(model._meta.label, field.name, batch_size) for model, field in fields
+            )
+
+        for (model, field), result in zip(fields, results):
+
+            # Print the model and field name
+            if verbosity:
+                self.stdout.write(f"{model._meta.label}.{field.target_field} ({field.name})... ", ending='')
+
+            # Print the total count of alterations for the field
+            count, total = result
+            if verbosity >= 2:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{count} of {total} {model._meta.verbose_name_plural} updated"
+                ))
+            elif verbosity:
+                self.stdout.write(self.style.SUCCESS(str(count)))
+
+        if verbosity:
             self.stdout.write(self.style.SUCCESS("Done."))
@@ -1,14 +1,21 @@
+import uuid
+from urllib.parse import urlencode
+
 from django.contrib.contenttypes.models import ContentType
+from django.http import QueryDict
 from django.urls import reverse
 from rest_framework import status
 
 from dcim.choices import SiteStatusChoices
-from dcim.models import Site
+from dcim.models import Rack, Site
+from dcim.views import SiteBulkDeleteView, SiteBulkEditView, SiteBulkImportView
 from extras.choices import *
-from extras.models import CustomField, ObjectChange, Tag
+from extras.models import CustomField, JobResult, ObjectChange, Tag
+from netbox.views.generic.jobs import run_bulk_delete, run_bulk_edit, run_bulk_import
 from utilities.testing import APITestCase
 from utilities.testing.utils import create_tags, post_data
 from utilities.testing.views import ModelViewTestCase
+from utilities.utils import NetBoxFakeRequest
 
 
 class ChangeLogViewTest(ModelViewTestCase):
@@ -203,6 +210,136 @@ class ChangeLogViewTest(ModelViewTestCase):
         self.assertEqual(objectchange.prechange_data['slug'], sites[0].slug)
         self.assertEqual(objectchange.postchange_data, None)
 
+    def test_bulk_import_objects_in_background(self):
+        headers = {'name': None, 'slug': None, 'status': None}
+        records = [
+            {'name': 'Site 1', 'slug': 'site-1', 'status': SiteStatusChoices.STATUS_ACTIVE},
+            {'name': 'Site 2', 'slug': 'site-2', 'status': SiteStatusChoices.STATUS_ACTIVE},
+            {'name': 'Site 3', 'slug': 'site-3', 'status': 'invalid'},
+            {'name': 'Site 4', 'slug': 'site-4', 'status': SiteStatusChoices.STATUS_ACTIVE},
+        ]
+        request = NetBoxFakeRequest({
+            'META': {},
+            'POST': {},
+            'GET': {},
+            'FILES': {},
+            'user': self.user,
+            'path': self._get_url('import'),
+            'id': uuid.uuid4(),
+        })
+        self.add_permissions('dcim.add_site')
+
+        # Without batching, no objects are imported if any record is invalid
+        job_result = JobResult.objects.create(
+            name='Import sites', obj_type=ContentType.objects.get_for_model(Site), user=self.user, job_id=uuid.uuid4()
+        )
+        run_bulk_import(request, SiteBulkImportView, headers, records, job_result=job_result)
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_FAILED)
+        self.assertEqual(job_result.data['succeeded'], 0)
+        self.assertEqual([error['row'] for error in job_result.data['errors']], [3])
+        self.assertFalse(Site.objects.exists())
+        self.assertEqual(ObjectChange.objects.count(), 0)
+
+        # With batching, valid records are imported and invalid records are skipped
+        job_result = JobResult.objects.create(
+            name='Import sites', obj_type=ContentType.objects.get_for_model(Site), user=self.user, job_id=uuid.uuid4()
+        )
+        run_bulk_import(request, SiteBulkImportView, headers, records, batch_size=2, job_result=job_result)
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_FAILED)
+        self.assertEqual(job_result.data['processed'], 4)
+        self.assertEqual(job_result.data['succeeded'], 3)
+        self.assertEqual(job_result.data['errors'][0]['row'], 3)
+        self.assertEqual(job_result.data['errors'][0]['record'], ['Site 3', 'site-3', 'invalid'])
+        self.assertEqual(
+            sorted(Site.objects.values_list('name', flat=True)), ['Site 1', 'Site 2', 'Site 4']
+        )
+        self.assertEqual(ObjectChange.objects.filter(request_id=request.id).count(), 3)
+
+    def test_bulk_update_objects_in_background(self):
+        sites = (
+            Site(name='Site 1', slug='site-1', status=SiteStatusChoices.STATUS_ACTIVE),
+            Site(name='Site 2', slug='site-2', status=SiteStatusChoices.STATUS_ACTIVE),
+            Site(name='Site 3', slug='site-3', status=SiteStatusChoices.STATUS_ACTIVE),
+        )
+        Site.objects.bulk_create(sites)
+        pk_list = [site.pk for site in sites]
+
+        form_data = {
+            'pk': pk_list,
+            '_apply': 'background',
+            'status': SiteStatusChoices.STATUS_PLANNED,
+        }
+        request = NetBoxFakeRequest({
+            'META': {},
+            'POST': QueryDict(urlencode(post_data(form_data), doseq=True)),
+            'GET': {},
+            'FILES': {},
+            'user': self.user,
+            'path': self._get_url('bulk_edit'),
+            'id': uuid.uuid4(),
+        })
+        self.add_permissions('dcim.view_site', 'dcim.change_site')
+
+        job_result = JobResult.objects.create(
+            name='Edit sites', obj_type=ContentType.objects.get_for_model(Site), user=self.user, job_id=uuid.uuid4()
+        )
+        run_bulk_edit(request, SiteBulkEditView, pk_list, initial_data={'pk': pk_list}, job_result=job_result)
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_COMPLETED)
+        self.assertEqual(job_result.data['succeeded'], 3)
+        self.assertEqual(Site.objects.filter(status=SiteStatusChoices.STATUS_PLANNED).count(), 3)
+
+        objectchange = ObjectChange.objects.get(
+            changed_object_type=ContentType.objects.get_for_model(Site),
+            changed_object_id=sites[0].pk
+        )
+        self.assertEqual(objectchange.action, ObjectChangeActionChoices.ACTION_UPDATE)
+        self.assertEqual(objectchange.request_id, request.id)
+        self.assertEqual(objectchange.prechange_data['status'], SiteStatusChoices.STATUS_ACTIVE)
+        self.assertEqual(objectchange.postchange_data['status'], SiteStatusChoices.STATUS_PLANNED)
+
+    def test_bulk_delete_objects_in_background(self):
+        sites = (
+            Site(name='Site 1', slug='site-1', status=SiteStatusChoices.STATUS_ACTIVE),
+            Site(name='Site 2', slug='site-2', status=SiteStatusChoices.STATUS_ACTIVE),
+            Site(name='Site 3', slug='site-3', status=SiteStatusChoices.STATUS_ACTIVE),
+        )
+        Site.objects.bulk_create(sites)
+        Rack.objects.create(site=sites[2], name='Rack 1')
+
+        request = NetBoxFakeRequest({
+            'META': {},
+            'POST': {},
+            'GET': {},
+            'FILES': {},
+            'user': self.user,
+            'path': self._get_url('bulk_delete'),
+            'id': uuid.uuid4(),
+        })
+        self.add_permissions('dcim.delete_site')
+
+        # Site 3 cannot be deleted because a Rack is assigned to it
+        job_result = JobResult.objects.create(
+            name='Delete sites', obj_type=ContentType.objects.get_for_model(Site), user=self.user, job_id=uuid.uuid4()
+        )
+        run_bulk_delete(request, SiteBulkDeleteView, [site.pk for site in sites], job_result=job_result)
+        self.assertEqual(job_result.status, JobResultStatusChoices.STATUS_FAILED)
+        self.assertEqual(job_result.data['processed'], 3)
+        self.assertEqual(job_result.data['succeeded'], 2)
+        self.assertEqual(job_result.data['errors'][0]['object'], 'Site 3')
+        self.assertEqual(list(Site.objects.values_list('name', flat=True)), ['Site 3'])
+
+        objectchange = ObjectChange.objects.get(
+            changed_object_type=ContentType.objects.get_for_model(Site),
+            changed_object_id=sites[0].pk
+        )
+        self.assertEqual(objectchange.action, ObjectChangeActionChoices.ACTION_DELETE)
+        self.assertFalse(
+            ObjectChange.objects.filter(
+                changed_object_type=ContentType.objects.get_for_model(Site),
+                changed_object_id=sites[2].pk
+            ).exists()
+        )
+
 
 class ChangeLogAPITest(APITestCase):
 
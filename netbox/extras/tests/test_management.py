@@ -0,0 +1,52 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from dcim.models import Device, Interface
+from extras.management.commands.renaturalize import renaturalize_field
+from utilities.ordering import naturalize, naturalize_interface
+from utilities.testing import create_test_device
+
+
+class RenaturalizeTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        device = create_test_device('Device 1')
+        for name, label in (('eth10', 'Port 10'), ('eth2', 'Port 2'), ('Ethernet1/1', 'Port 1')):
+            Interface.objects.create(device=device, name=name, label=label)
+
+    def renaturalize(self, *models, **kwargs):
+        stdout = StringIO()
+        call_command('renaturalize', *models, verbosity=2, stdout=stdout, **kwargs)
+        return stdout.getvalue()
+
+    def test_renaturalize(self):
+        Device.objects.update(_name='')
+        Interface.objects.update(_name='')
+
+        output = self.renaturalize('dcim.Device', 'dcim.Interface', batch_size=2)
+        self.assertIn('1 of 1 devices updated', output)
+        self.assertIn('3 of 3 interfaces updated', output)
+        for device in Device.objects.all():
+            self.assertEqual(device._name, naturalize(device.name, max_length=100))
+        for interface in Interface.objects.all():
+            self.assertEqual(interface._name, naturalize_interface(interface.name, max_length=100))
+
+        # Rows which are already correct are not updated
+        output = self.renaturalize('dcim.Device', 'dcim.Interface', batch_size=2)
+        self.assertIn('0 of 1 devices updated', output)
+        self.assertIn('0 of 3 interfaces updated', output)
+
+    def test_renaturalize_field_target_field(self):
+        field = Interface._meta.get_field('_name')
+
+        # Naturalize a field other than name
+        with patch.object(field, 'target_field', 'label'):
+            self.assertEqual(renaturalize_field('dcim.Interface', '_name'), (3, 3))
+            self.assertEqual(renaturalize_field('dcim.Interface', '_name'), (0, 3))
+
+        for interface in Interface.objects.all():
+            self.assertEqual(interface._name, naturalize_interface(interface.label, max_length=100))
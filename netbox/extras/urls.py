@@ -108,4 +108,8 @@ urlpatterns = [
     path('scripts/<str:module>.<str:name>/', views.ScriptView.as_view(), name='script'),
     path('scripts/results/<int:job_result_pk>/', views.ScriptResultView.as_view(), name='script_result'),
 
+    # Job results
+    path('job-results/<int:job_result_pk>/', views.JobResultView.as_view(), name='jobresult'),
+    path('job-results/<int:job_result_pk>/errors/', views.JobResultErrorsView.as_view(), name='jobresult_errors'),
+
 ]
@@ -1,7 +1,10 @@
+import csv
+
 from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Count, Q
-from django.http import Http404, HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.views.generic import View
@@ -758,3 +761,57 @@ class ScriptResultView(ContentTypePermissionRequiredMixin, GetScriptMixin, View)
             'result': result,
             'class_name': script.__class__.__name__
         })
+
+
+#
+# Job results
+#
+
+class JobResultView(LoginRequiredMixin, View):
+    """
+    Display the progress and outcome of a background job initiated by a bulk operation.
+    """
+    def get(self, request, job_result_pk):
+        result = get_job_result(request, job_result_pk)
+
+        # If this is an HTMX request, return only the result HTML
+        if is_htmx(request):
+            response = render(request, 'extras/htmx/jobresult.html', {
+                'result': result,
+            })
+            if result.completed:
+                response.status_code = 286
+            return response
+
+        return render(request, 'extras/jobresult.html', {
+            'result': result,
+        })
+
+
+class JobResultErrorsView(LoginRequiredMixin, View):
+    """
+    Export the records which could not be processed by a background bulk import job as CSV, along with their errors.
+    """
+    def get(self, request, job_result_pk):
+        result = get_job_result(request, job_result_pk)
+        if not result.data or 'headers' not in result.data:
+            raise Http404
+
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="netbox_{result.obj_type.model}_errors.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['row', *result.data['headers'], 'errors'])
+        for error in result.data['errors']:
+            writer.writerow([error['row'], *error['record'], '; '.join(error['errors'])])
+
+        return response
+
+
+def get_job_result(request, job_result_pk):
+    """
+    Return the specified JobResult. Users other than superusers may retrieve only their own JobResults.
+    """
+    queryset = JobResult.objects.all()
+    if not request.user.is_superuser:
+        queryset = queryset.filter(user=request.user)
+    return get_object_or_404(queryset, pk=job_result_pk)
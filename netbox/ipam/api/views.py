@@ -1,3 +1,5 @@
+import itertools
+
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.db import transaction
 from django.shortcuts import get_object_or_404
@@ -12,6 +14,7 @@ from circuits.models import Provider
 from dcim.models import Site
 from ipam import filtersets
 from ipam.models import *
+from ipam.utils import defer_prefix_hierarchy
 from netbox.api.viewsets import NetBoxModelViewSet
 from netbox.api.viewsets.mixins import ObjectValidationMixin
 from netbox.config import get_config
@@ -96,6 +99,22 @@ class PrefixViewSet(NetBoxModelViewSet):
             return serializers.PrefixLengthSerializer
         return super().get_serializer_class()
 
+    # Rebuild the prefix hierarchy once all prefixes in a bulk request have been processed
+
+    def perform_create(self, serializer):
+        if not getattr(serializer, 'many', False):
+            return super().perform_create(serializer)
+        with defer_prefix_hierarchy():
+            super().perform_create(serializer)
+
+    def perform_bulk_update(self, objects, update_data, partial):
+        with defer_prefix_hierarchy():
+            return super().perform_bulk_update(objects, update_data, partial)
+
+    def perform_bulk_destroy(self, objects):
+        with defer_prefix_hierarchy():
+            super().perform_bulk_destroy(objects)
+
 
 class IPRangeViewSet(NetBoxModelViewSet):
     queryset = IPRange.objects.prefetch_related('vrf', 'role', 'tenant', 'tags')
@@ -276,12 +295,9 @@ class AvailableIPAddressesView(ObjectValidationMixin, APIView):
         if MAX_PAGE_SIZE:
             limit = min(limit, MAX_PAGE_SIZE)
 
-        # Calculate available IPs within the parent
-        ip_list = []
-        for index, ip in enumerate(parent.get_available_ips(), start=1):
-            ip_list.append(ip)
-            if index == limit:
-                break
+        # Calculate available IPs within the parent, up to the limit
+        available_ips = itertools.chain.from_iterable(parent.get_available_ip_ranges())
+        ip_list = list(itertools.islice(available_ips, limit if limit > 0 else None))
         serializer = serializers.AvailableIPSerializer(ip_list, many=True, context={
             'request': request,
             'parent': parent,
@@ -303,8 +319,9 @@ class AvailableIPAddressesView(ObjectValidationMixin, APIView):
         requested_ips = request.data if isinstance(request.data, list) else [request.data]
 
         # Determine if the requested number of IPs is available
-        available_ips = parent.get_available_ips()
-        if available_ips.size < len(requested_ips):
+        available_ips = itertools.chain.from_iterable(parent.get_available_ip_ranges())
+        available_ips = list(itertools.islice(available_ips, len(requested_ips)))
+        if len(available_ips) < len(requested_ips):
             return Response(
                 {
                     "detail": f"An insufficient number of IP addresses are available within {parent} "
@@ -314,9 +331,8 @@ class AvailableIPAddressesView(ObjectValidationMixin, APIView):
             )
 
         # Assign addresses from the list of available IPs and copy VRF assignment from the parent
-        available_ips = iter(available_ips)
-        for requested_ip in requested_ips:
-            requested_ip['address'] = f'{next(available_ips)}/{parent.mask_length}'
+        for requested_ip, available_ip in zip(requested_ips, available_ips):
+            requested_ip['address'] = f'{available_ip}/{parent.mask_length}'
             requested_ip['vrf'] = parent.vrf.pk if parent.vrf else None
 
         # Initialize the serializer with a list or a single object depending on what was requested
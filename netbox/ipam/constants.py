@@ -27,6 +27,9 @@ VRF_RD_MAX_LENGTH = 21
 PREFIX_LENGTH_MIN = 1
 PREFIX_LENGTH_MAX = 127  # IPv6
 
+# The number of prefixes retrieved and updated at once when rebuilding the prefix hierarchy
+PREFIX_REBUILD_BATCH_SIZE = 1000
+
 
 #
 # IPAddresses
@@ -82,6 +85,9 @@ VLANGROUP_SCOPE_TYPES = (
     'region', 'sitegroup', 'site', 'location', 'rack', 'clustergroup', 'cluster',
 )
 
+# Resolved VLANGroup scopes of devices and virtual machines are cached for up to one hour
+VLANGROUP_SCOPE_CACHE_TIMEOUT = 3600
+
 
 #
 # Services
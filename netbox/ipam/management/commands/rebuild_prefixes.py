@@ -1,5 +1,11 @@
-from django.core.management.base import BaseCommand
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+
+from ipam.constants import PREFIX_REBUILD_BATCH_SIZE
 from ipam.models import Prefix, VRF
 from ipam.utils import rebuild_prefixes
 
@@ -7,21 +13,58 @@ from ipam.utils import rebuild_prefixes
 class Command(BaseCommand):
     help = "Rebuild the prefix hierarchy (depth and children counts)"
 
-    def handle(self, *model_names, **options):
-        self.stdout.write(f'Rebuilding {Prefix.objects.count()} prefixes...')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PREFIX_REBUILD_BATCH_SIZE,
+            help=f'The number of prefixes to retrieve and update at once (default: {PREFIX_REBUILD_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='The number of worker processes among which VRFs are divided (default: 1)',
+        )
 
-        # Reset existing counts
-        Prefix.objects.update(_depth=0, _children=0)
+    def handle(self, *model_names, **options):
+        batch_size = options['batch_size']
+        processes = options['processes']
+        if batch_size < 1:
+            raise CommandError("Batch size must be a positive integer.")
+        if processes < 1:
+            raise CommandError("Number of processes must be a positive integer.")
 
-        # Rebuild the global table
-        global_count = Prefix.objects.filter(vrf__isnull=True).count()
-        self.stdout.write(f'Global: {global_count} prefixes...')
-        rebuild_prefixes(None)
+        # Count the prefixes in the global table and each VRF, and rebuild the largest first
+        vrf_counts = dict(
+            Prefix.objects.order_by().values('vrf').annotate(count=Count('pk')).values_list('vrf', 'count')
+        )
+        vrf_ids = sorted(vrf_counts, key=lambda vrf_id: vrf_counts[vrf_id], reverse=True)
+        vrf_names = {vrf.pk: f'VRF {vrf}' for vrf in VRF.objects.filter(pk__in=vrf_ids)}
+        vrf_names[None] = 'Global'
+        total = sum(vrf_counts.values())
+        self.stdout.write(f'Rebuilding {total} prefixes in {len(vrf_ids)} VRFs...')
 
-        # Rebuild each VRF
-        for vrf in VRF.objects.all():
-            vrf_count = Prefix.objects.filter(vrf=vrf).count()
-            self.stdout.write(f'VRF {vrf}: {vrf_count} prefixes...')
-            rebuild_prefixes(vrf.pk)
+        if processes > 1:
+            # Close any open database connections before forking, so that each worker process opens its own
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork'))
+            with pool:
+                futures = {
+                    pool.submit(rebuild_prefixes, vrf_id, batch_size): vrf_id for vrf_id in vrf_ids
+                }
+                results = ((futures[future], future.result()) for future in as_completed(futures))
+                self.report(results, vrf_names, total)
+        else:
+            results = ((vrf_id, rebuild_prefixes(vrf_id, batch_size)) for vrf_id in vrf_ids)
+            self.report(results, vrf_names, total)
 
         self.stdout.write(self.style.SUCCESS('Finished.'))
+
+    def report(self, results, vrf_names, total):
+        """
+        Report the progress of the rebuild as each VRF is completed.
+        """
+        completed = 0
+        for vrf_id, (count, vrf_total) in results:
+            completed += vrf_total
+            self.stdout.write(
+                f'{vrf_names[vrf_id]}: updated {count} of {vrf_total} prefixes '
+                f'({int(completed * 100 / total)}% complete)'
+            )
@@ -14,7 +14,8 @@ from ipam.choices import *
 from ipam.constants import *
 from ipam.fields import IPNetworkField, IPAddressField
 from ipam.managers import IPAddressManager
-from ipam.querysets import PrefixQuerySet
+from ipam.querysets import PrefixQuerySet, get_available_ip_ranges
+from ipam.trees import get_prefix_tree
 from ipam.validators import DNSValidator
 from netbox.config import get_config
 from virtualization.models import VirtualMachine
@@ -452,6 +453,11 @@ class Prefix(GetAvailablePrefixesMixin, NetBoxModel):
         """
         Return all containing Prefixes in the hierarchy.
         """
+        if get_config().PREFIX_INDEX_ENABLED:
+            return Prefix.objects.filter(
+                pk__in=get_prefix_tree(self.vrf_id).get_parents(self.prefix, include_self=include_self)
+            )
+
         lookup = 'net_contains_or_equals' if include_self else 'net_contains'
         return Prefix.objects.filter(**{
             'vrf': self.vrf,
@@ -462,6 +468,11 @@ class Prefix(GetAvailablePrefixesMixin, NetBoxModel):
         """
         Return all covered Prefixes in the hierarchy.
         """
+        if get_config().PREFIX_INDEX_ENABLED:
+            return Prefix.objects.filter(
+                pk__in=get_prefix_tree(self.vrf_id).get_children(self.prefix, include_self=include_self)
+            )
+
         lookup = 'net_contained_or_equal' if include_self else 'net_contained'
         return Prefix.objects.filter(**{
             'vrf': self.vrf,
@@ -479,7 +490,18 @@ class Prefix(GetAvailablePrefixesMixin, NetBoxModel):
         if self.vrf is None and self.status == PrefixStatusChoices.STATUS_CONTAINER:
             return Prefix.objects.filter(prefix__net_contained=str(self.prefix))
         else:
-            return Prefix.objects.filter(prefix__net_contained=str(self.prefix), vrf=self.vrf)
+            return self.get_children()
+
+    def get_available_prefixes(self):
+        """
+        Return all available Prefixes within this prefix as an IPSet.
+        """
+        if get_config().PREFIX_INDEX_ENABLED and not (
+            self.vrf is None and self.status == PrefixStatusChoices.STATUS_CONTAINER
+        ):
+            return get_prefix_tree(self.vrf_id).get_available_prefixes(self.prefix)
+
+        return super().get_available_prefixes()
 
     def get_child_ranges(self):
         """
@@ -501,6 +523,36 @@ class Prefix(GetAvailablePrefixesMixin, NetBoxModel):
         else:
             return IPAddress.objects.filter(address__net_host_contained=str(self.prefix), vrf=self.vrf)
 
+    def get_available_ip_ranges(self):
+        """
+        Yield each run of available IPs within this prefix as an IPRange, in order. Available IPs are determined by the
+        database as they are requested, so only as much of the prefix as is consumed need be examined.
+        """
+        if self.mark_utilized:
+            return
+
+        first, last = self.prefix.first, self.prefix.last
+
+        # IPv6 /127's, pool, or IPv4 /31-/32 sets are fully usable
+        if not (
+            (self.family == 6 and self.prefix.prefixlen >= 127) or self.is_pool or
+            (self.family == 4 and self.prefix.prefixlen >= 31)
+        ):
+            if self.family == 4:
+                # For "normal" IPv4 prefixes, omit first and last addresses
+                first, last = first + 1, last - 1
+            else:
+                # For IPv6 prefixes, omit the Subnet-Router anycast address
+                # per RFC 4291
+                first += 1
+
+        yield from get_available_ip_ranges(
+            netaddr.IPAddress(first, self.family),
+            netaddr.IPAddress(last, self.family),
+            self.get_child_ips(),
+            self.get_child_ranges()
+        )
+
     def get_available_ips(self):
         """
         Return all available IPs within this prefix as an IPSet.
@@ -508,37 +560,19 @@ class Prefix(GetAvailablePrefixesMixin, NetBoxModel):
         if self.mark_utilized:
             return list()
 
-        prefix = netaddr.IPSet(self.prefix)
-        child_ips = netaddr.IPSet([ip.address.ip for ip in self.get_child_ips()])
-        child_ranges = netaddr.IPSet()
-        for iprange in self.get_child_ranges():
-            child_ranges.add(iprange.range)
-        available_ips = prefix - child_ips - child_ranges
-
-        # IPv6 /127's, pool, or IPv4 /31-/32 sets are fully usable
-        if (self.family == 6 and self.prefix.prefixlen >= 127) or self.is_pool or (self.family == 4 and self.prefix.prefixlen >= 31):
-            return available_ips
-
-        if self.family == 4:
-            # For "normal" IPv4 prefixes, omit first and last addresses
-            available_ips -= netaddr.IPSet([
-                netaddr.IPAddress(self.prefix.first),
-                netaddr.IPAddress(self.prefix.last),
-            ])
-        else:
-            # For IPv6 prefixes, omit the Subnet-Router anycast address
-            # per RFC 4291
-            available_ips -= netaddr.IPSet([netaddr.IPAddress(self.prefix.first)])
+        available_ips = netaddr.IPSet()
+        for ip_range in self.get_available_ip_ranges():
+            available_ips.add(ip_range)
         return available_ips
 
     def get_first_available_ip(self):
         """
         Return the first available IP within the prefix (or None).
         """
-        available_ips = self.get_available_ips()
-        if not available_ips:
+        ip_range = next(self.get_available_ip_ranges(), None)
+        if ip_range is None:
             return None
-        return '{}/{}'.format(next(available_ips.__iter__()), self.prefix.prefixlen)
+        return '{}/{}'.format(netaddr.IPAddress(ip_range.first, self.family), self.prefix.prefixlen)
 
     def get_utilization(self):
         """
@@ -731,25 +765,31 @@ class IPRange(NetBoxModel):
             vrf=self.vrf
         )
 
+    def get_available_ip_ranges(self):
+        """
+        Yield each run of available IPs within this range as a netaddr.IPRange, in order.
+        """
+        yield from get_available_ip_ranges(self.start_address.ip, self.end_address.ip, self.get_child_ips())
+
     def get_available_ips(self):
         """
         Return all available IPs within this range as an IPSet.
         """
-        range = netaddr.IPRange(self.start_address.ip, self.end_address.ip)
-        child_ips = netaddr.IPSet([ip.address.ip for ip in self.get_child_ips()])
-
-        return netaddr.IPSet(range) - child_ips
+        available_ips = netaddr.IPSet()
+        for ip_range in self.get_available_ip_ranges():
+            available_ips.add(ip_range)
+        return available_ips
 
     @cached_property
     def first_available_ip(self):
         """
         Return the first available IP within the range (or None).
         """
-        available_ips = self.get_available_ips()
-        if not available_ips:
+        ip_range = next(self.get_available_ip_ranges(), None)
+        if ip_range is None:
             return None
 
-        return '{}/{}'.format(next(available_ips.__iter__()), self.start_address.prefixlen)
+        return '{}/{}'.format(netaddr.IPAddress(ip_range.first, self.family), self.start_address.prefixlen)
 
     @cached_property
     def utilization(self):
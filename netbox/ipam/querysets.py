@@ -1,8 +1,119 @@
+import uuid
+
+import netaddr
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connections, transaction
 from django.db.models import Q
 from django.db.models.expressions import RawSQL
 
 from utilities.querysets import RestrictedQuerySet
+from .constants import VLANGROUP_SCOPE_CACHE_TIMEOUT
+
+VLANGROUP_SCOPE_CACHE_KEY_PREFIX = 'ipam.vlangroup_scope'
+
+
+def get_vlangroup_scope_cache_key(*args):
+    """
+    Return the cache key for a resolved VLANGroup scope. Keys include the current cache generation, so that all
+    cached scopes can be invalidated at once by invalidate_vlangroup_scopes().
+    """
+    generation_key = f'{VLANGROUP_SCOPE_CACHE_KEY_PREFIX}.generation'
+    generation = cache.get(generation_key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(generation_key, generation, None)
+    return '.'.join([VLANGROUP_SCOPE_CACHE_KEY_PREFIX, generation, *(str(arg) for arg in args)])
+
+
+def get_vlangroup_ids(get_scope, *args):
+    """
+    Return the IDs of all VLANGroups matching a scope, computing them only if a cached copy is not available.
+
+    :param get_scope: A callable which returns a Q object matching the applicable VLANGroups
+    :param args: The attributes which determine the scope (e.g. a device's site, location, and rack IDs)
+    """
+    from .models import VLANGroup
+
+    cache_key = get_vlangroup_scope_cache_key(*args)
+    vlan_group_ids = cache.get(cache_key)
+    if vlan_group_ids is None:
+        vlan_group_ids = list(VLANGroup.objects.filter(get_scope()).values_list('pk', flat=True))
+        cache.set(cache_key, vlan_group_ids, VLANGROUP_SCOPE_CACHE_TIMEOUT)
+
+    return vlan_group_ids
+
+
+def invalidate_vlangroup_scopes():
+    """
+    Discard all cached VLANGroup scopes. Called whenever a VLANGroup's scope or the site/location hierarchy changes.
+    Scopes are invalidated both immediately and once the current transaction has been committed, so that no scope
+    resolved from uncommitted data outlives it.
+    """
+    def invalidate():
+        cache.set(f'{VLANGROUP_SCOPE_CACHE_KEY_PREFIX}.generation', uuid.uuid4().hex, None)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def get_available_ip_ranges(first, last, ipaddresses, ipranges=None, chunk_size=100):
+    """
+    Yield each run of available addresses between first and last (inclusive) as a netaddr.IPRange, in order. The
+    database scans the occupied addresses (IPAddresses and IPRanges) in order and returns only the gaps between them,
+    which are retrieved chunk_size at a time using a server-side cursor, so that iteration can stop as soon as enough
+    addresses have been found.
+
+    :param first: The first usable address (a netaddr.IPAddress)
+    :param last: The last usable address (a netaddr.IPAddress)
+    :param ipaddresses: A queryset of the IPAddresses occupying the space
+    :param ipranges: A queryset of the IPRanges occupying the space (optional)
+    """
+    connection = connections[ipaddresses.db]
+    first, last = netaddr.IPAddress(first), netaddr.IPAddress(last)
+
+    # Compile each occupied address (or range of addresses) as a (lo, hi) interval
+    sql, params = ipaddresses.order_by().values_list('address').query.sql_with_params()
+    occupied = [f'SELECT host(a.address)::inet AS lo, host(a.address)::inet AS hi FROM ({sql}) a(address)']
+    occupied_params = list(params)
+    if ipranges is not None:
+        sql, params = ipranges.order_by().values_list('start_address', 'end_address').query.sql_with_params()
+        occupied.append(
+            f'SELECT host(r.start_address)::inet, host(r.end_address)::inet FROM ({sql}) r(start_address, end_address)'
+        )
+        occupied_params.extend(params)
+    occupied_sql = f'WITH occupied AS ({" UNION ALL ".join(occupied)}) '
+    bounds = [str(first), str(last)]
+
+    # A gap precedes each interval which begins beyond the end of all preceding intervals
+    gaps_sql = occupied_sql + (
+        'SELECT host(prev_hi), host(lo) FROM ('
+        '  SELECT GREATEST(lo, %s::inet) AS lo, MAX(LEAST(hi, %s::inet)) OVER ('
+        '    ORDER BY lo, hi ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING'
+        '  ) AS prev_hi'
+        '  FROM occupied WHERE hi >= %s::inet AND lo <= %s::inet'
+        ') o '
+        'WHERE CASE WHEN prev_hi IS NULL THEN lo > %s::inet WHEN lo > prev_hi THEN lo - 1 > prev_hi ELSE FALSE END '
+        'ORDER BY lo'
+    )
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(gaps_sql, occupied_params + bounds + bounds + [str(first)])
+        while rows := cursor.fetchmany(chunk_size):
+            for prev_hi, lo in rows:
+                start = first if prev_hi is None else netaddr.IPAddress(prev_hi) + 1
+                yield netaddr.IPRange(start, netaddr.IPAddress(lo) - 1)
+
+    # Finally, find any gap following the last interval
+    with connection.cursor() as cursor:
+        cursor.execute(
+            occupied_sql + 'SELECT host(MAX(hi)) FROM occupied WHERE hi >= %s::inet AND lo <= %s::inet',
+            occupied_params + bounds
+        )
+        max_hi = cursor.fetchone()[0]
+    if max_hi is None:
+        yield netaddr.IPRange(first, last)
+    elif netaddr.IPAddress(max_hi) < last:
+        yield netaddr.IPRange(netaddr.IPAddress(max_hi) + 1, last)
 
 
 class PrefixQuerySet(RestrictedQuerySet):
@@ -36,39 +147,43 @@ class VLANQuerySet(RestrictedQuerySet):
         """
         Return all VLANs available to the specified Device.
         """
-        from .models import VLANGroup
-
-        # Find all relevant VLANGroups
-        q = Q()
-        if device.site.region:
-            q |= Q(
-                scope_type=ContentType.objects.get_by_natural_key('dcim', 'region'),
-                scope_id__in=device.site.region.get_ancestors(include_self=True)
-            )
-        if device.site.group:
+        def get_scope():
+            q = Q()
+            if device.site.region:
+                q |= Q(
+                    scope_type=ContentType.objects.get_by_natural_key('dcim', 'region'),
+                    scope_id__in=device.site.region.get_ancestors(include_self=True)
+                )
+            if device.site.group:
+                q |= Q(
+                    scope_type=ContentType.objects.get_by_natural_key('dcim', 'sitegroup'),
+                    scope_id__in=device.site.group.get_ancestors(include_self=True)
+                )
             q |= Q(
-                scope_type=ContentType.objects.get_by_natural_key('dcim', 'sitegroup'),
-                scope_id__in=device.site.group.get_ancestors(include_self=True)
+                scope_type=ContentType.objects.get_by_natural_key('dcim', 'site'),
+                scope_id=device.site_id
             )
-        q |= Q(
-            scope_type=ContentType.objects.get_by_natural_key('dcim', 'site'),
-            scope_id=device.site_id
+            if device.location:
+                q |= Q(
+                    scope_type=ContentType.objects.get_by_natural_key('dcim', 'location'),
+                    scope_id__in=device.location.get_ancestors(include_self=True)
+                )
+            if device.rack:
+                q |= Q(
+                    scope_type=ContentType.objects.get_by_natural_key('dcim', 'rack'),
+                    scope_id=device.rack_id
+                )
+            return q
+
+        # Find all relevant VLANGroups
+        vlan_group_ids = get_vlangroup_ids(
+            get_scope, 'device', device.site_id, device.location_id, device.rack_id
         )
-        if device.location:
-            q |= Q(
-                scope_type=ContentType.objects.get_by_natural_key('dcim', 'location'),
-                scope_id__in=device.location.get_ancestors(include_self=True)
-            )
-        if device.rack:
-            q |= Q(
-                scope_type=ContentType.objects.get_by_natural_key('dcim', 'rack'),
-                scope_id=device.rack_id
-            )
 
         # Return all applicable VLANs
         return self.filter(
-            Q(group__in=VLANGroup.objects.filter(q)) |
-            Q(site=device.site) |
+            Q(group__in=vlan_group_ids) |
+            Q(site_id=device.site_id) |
             Q(group__scope_id__isnull=True, site__isnull=True) |  # Global group VLANs
             Q(group__isnull=True, site__isnull=True)  # Global VLANs
         )
@@ -77,43 +192,44 @@ class VLANQuerySet(RestrictedQuerySet):
         """
         Return all VLANs available to the specified VirtualMachine.
         """
-        from .models import VLANGroup
-
-        # Find all relevant VLANGroups
-        q = Q()
-        if vm.cluster.site:
-            if vm.cluster.site.region:
+        def get_scope():
+            q = Q()
+            if vm.cluster.site:
+                if vm.cluster.site.region:
+                    q |= Q(
+                        scope_type=ContentType.objects.get_by_natural_key('dcim', 'region'),
+                        scope_id__in=vm.cluster.site.region.get_ancestors(include_self=True)
+                    )
+                if vm.cluster.site.group:
+                    q |= Q(
+                        scope_type=ContentType.objects.get_by_natural_key('dcim', 'sitegroup'),
+                        scope_id__in=vm.cluster.site.group.get_ancestors(include_self=True)
+                    )
                 q |= Q(
-                    scope_type=ContentType.objects.get_by_natural_key('dcim', 'region'),
-                    scope_id__in=vm.cluster.site.region.get_ancestors(include_self=True)
+                    scope_type=ContentType.objects.get_by_natural_key('dcim', 'site'),
+                    scope_id=vm.cluster.site_id
                 )
-            if vm.cluster.site.group:
+            if vm.cluster.group:
                 q |= Q(
-                    scope_type=ContentType.objects.get_by_natural_key('dcim', 'sitegroup'),
-                    scope_id__in=vm.cluster.site.group.get_ancestors(include_self=True)
+                    scope_type=ContentType.objects.get_by_natural_key('virtualization', 'clustergroup'),
+                    scope_id=vm.cluster.group_id
                 )
             q |= Q(
-                scope_type=ContentType.objects.get_by_natural_key('dcim', 'site'),
-                scope_id=vm.cluster.site_id
-            )
-        if vm.cluster.group:
-            q |= Q(
-                scope_type=ContentType.objects.get_by_natural_key('virtualization', 'clustergroup'),
-                scope_id=vm.cluster.group_id
+                scope_type=ContentType.objects.get_by_natural_key('virtualization', 'cluster'),
+                scope_id=vm.cluster_id
             )
-        q |= Q(
-            scope_type=ContentType.objects.get_by_natural_key('virtualization', 'cluster'),
-            scope_id=vm.cluster_id
-        )
-        vlan_groups = VLANGroup.objects.filter(q)
+            return q
+
+        # Find all relevant VLANGroups
+        vlan_group_ids = get_vlangroup_ids(get_scope, 'cluster', vm.cluster_id)
 
         # Return all applicable VLANs
         q = (
-            Q(group__in=vlan_groups) |
+            Q(group__in=vlan_group_ids) |
             Q(group__scope_id__isnull=True, site__isnull=True) |  # Global group VLANs
             Q(group__isnull=True, site__isnull=True)  # Global VLANs
         )
-        if vm.cluster.site:
-            q |= Q(site=vm.cluster.site)
+        if vm.cluster.site_id:
+            q |= Q(site_id=vm.cluster.site_id)
 
         return self.filter(q)
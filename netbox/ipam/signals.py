@@ -1,29 +1,55 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
-from dcim.models import Device
-from virtualization.models import VirtualMachine
-from .models import IPAddress, Prefix
+from dcim.models import Device, Location, Region, Site, SiteGroup
+from virtualization.models import Cluster, ClusterGroup, VirtualMachine
+from .models import IPAddress, Prefix, VLANGroup
+from .querysets import invalidate_vlangroup_scopes
+from .trees import invalidate_prefix_trees
+from .utils import get_prefix_hierarchy_queue
 
 
-def update_parents_children(prefix):
+def add_to_hierarchy(prefix):
     """
-    Update depth on prefix & containing prefixes
+    Account for the addition of a Prefix to the hierarchy of its VRF: increment the child count of all containing
+    Prefixes and, if the network was not already present, the depth of all contained Prefixes. Then set the depth and
+    child count of the Prefix itself.
     """
-    parents = prefix.get_parents(include_self=True).annotate_hierarchy()
-    for parent in parents:
-        parent._children = parent.hierarchy_children
-    Prefix.objects.bulk_update(parents, ['_children'], batch_size=100)
+    prefixes = Prefix.objects.filter(vrf_id=prefix.vrf_id).exclude(pk=prefix.pk)
 
+    prefixes.filter(prefix__net_contains=prefix.prefix).update(_children=F('_children') + 1)
+    if not prefixes.filter(prefix=prefix.prefix).exists():
+        prefixes.filter(prefix__net_contained=prefix.prefix).update(_depth=F('_depth') + 1)
 
-def update_children_depth(prefix):
+    prefix._depth = prefixes.filter(
+        prefix__net_contains=prefix.prefix
+    ).order_by().values('prefix').distinct().count()
+    prefix._children = prefixes.filter(prefix__net_contained=prefix.prefix).count()
+    Prefix.objects.filter(pk=prefix.pk).update(_depth=prefix._depth, _children=prefix._children)
+
+
+def remove_from_hierarchy(prefix, vrf_id, network, duplicates=None):
     """
-    Update children count on prefix & contained prefixes
+    Account for the removal of a Prefix from the hierarchy of a VRF: decrement the child count of all Prefixes which
+    contained it and, if no other Prefix represents the same network, the depth of all Prefixes it contained.
+
+    :param prefix: The Prefix being removed (or moved)
+    :param vrf_id: The ID of the VRF from which the Prefix has been removed
+    :param network: The network of the Prefix prior to its removal
+    :param duplicates: The IDs of all Prefixes (including this one) which represented the same network prior to a
+        deletion. When several are deleted at once, only the first adjusts the depth of contained Prefixes.
     """
-    children = prefix.get_children(include_self=True).annotate_hierarchy()
-    for child in children:
-        child._depth = child.hierarchy_depth
-    Prefix.objects.bulk_update(children, ['_depth'], batch_size=100)
+    prefixes = Prefix.objects.filter(vrf_id=vrf_id).exclude(pk=prefix.pk)
+
+    # Never decrement below zero, in case the stored hierarchy is out of sync (e.g. following a bulk_create())
+    prefixes.filter(prefix__net_contains=network).update(_children=Greatest(F('_children') - 1, 0))
+    if prefixes.filter(prefix=network).exists():
+        return
+    if duplicates and prefix.pk != min(duplicates):
+        return
+    prefixes.filter(prefix__net_contained=network).update(_depth=Greatest(F('_depth') - 1, 0))
 
 
 @receiver(post_save, sender=Prefix)
@@ -32,21 +58,45 @@ def handle_prefix_saved(instance, created, **kwargs):
     # Prefix has changed (or new instance has been created)
     if created or instance.vrf_id != instance._vrf_id or instance.prefix != instance._prefix:
 
-        update_parents_children(instance)
-        update_children_depth(instance)
+        # Defer to a rebuild of the affected VRFs (and the invalidation of their PrefixTrees), if requested
+        if queue := get_prefix_hierarchy_queue():
+            queue.add(instance, instance.vrf_id, instance._vrf_id)
+
+        else:
+            invalidate_prefix_trees(instance.vrf_id, instance._vrf_id)
+
+            # If this is not a new prefix, clean up parent/children of previous prefix
+            if not created:
+                remove_from_hierarchy(instance, instance._vrf_id, instance._prefix)
+            add_to_hierarchy(instance)
+
+        instance._prefix = instance.prefix
+        instance._vrf_id = instance.vrf_id
+
+
+@receiver(pre_delete, sender=Prefix)
+def handle_prefix_deleting(instance, **kwargs):
+    """
+    Record all Prefixes representing the same network as a Prefix about to be deleted. (Duplicates may be deleted
+    together, in which case all of them are gone by the time post_delete is sent.)
+    """
+    if get_prefix_hierarchy_queue() is not None:
+        return
 
-        # If this is not a new prefix, clean up parent/children of previous prefix
-        if not created:
-            old_prefix = Prefix(vrf_id=instance._vrf_id, prefix=instance._prefix)
-            update_parents_children(old_prefix)
-            update_children_depth(old_prefix)
+    instance._duplicates = list(
+        Prefix.objects.filter(vrf_id=instance.vrf_id, prefix=instance.prefix).values_list('pk', flat=True)
+    )
 
 
 @receiver(post_delete, sender=Prefix)
 def handle_prefix_deleted(instance, **kwargs):
 
-    update_parents_children(instance)
-    update_children_depth(instance)
+    if queue := get_prefix_hierarchy_queue():
+        queue.add(instance, instance.vrf_id)
+        return
+
+    invalidate_prefix_trees(instance.vrf_id)
+    remove_from_hierarchy(instance, instance.vrf_id, instance.prefix, getattr(instance, '_duplicates', None))
 
 
 @receiver(pre_delete, sender=IPAddress)
@@ -62,3 +112,26 @@ def clear_primary_ip(instance, **kwargs):
     virtualmachine = VirtualMachine.objects.filter(**{field_name: instance}).first()
     if virtualmachine:
         virtualmachine.save()
+
+
+@receiver((post_save, post_delete), sender=VLANGroup)
+def handle_vlangroup_changed(instance, **kwargs):
+    """
+    Discard cached VLANGroup scopes whenever a VLANGroup is created, modified, or deleted.
+    """
+    invalidate_vlangroup_scopes()
+
+
+@receiver((post_save, post_delete), sender=Region)
+@receiver((post_save, post_delete), sender=SiteGroup)
+@receiver((post_save, post_delete), sender=Site)
+@receiver((post_save, post_delete), sender=Location)
+@receiver((post_save, post_delete), sender=ClusterGroup)
+@receiver((post_save, post_delete), sender=Cluster)
+def handle_vlangroup_scope_hierarchy_changed(instance, created=False, **kwargs):
+    """
+    Discard cached VLANGroup scopes when an object within the scope hierarchy is moved or deleted. (New objects cannot
+    yet belong to a cached scope.)
+    """
+    if not created:
+        invalidate_vlangroup_scopes()
@@ -1,10 +1,15 @@
 from netaddr import IPNetwork, IPSet
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.test import TestCase, override_settings
 
-from dcim.models import Interface, Device, DeviceRole, DeviceType, Manufacturer, Site
+from dcim.models import Interface, Device, DeviceRole, DeviceType, Manufacturer, Region, Site
 from ipam.choices import IPAddressRoleChoices, PrefixStatusChoices
 from ipam.models import Aggregate, IPAddress, IPRange, Prefix, RIR, VLAN, VLANGroup, VRF, L2VPN, L2VPNTermination
+from ipam.querysets import get_vlangroup_scope_cache_key
+from ipam.trees import PrefixTree, get_cache_key
+from ipam.utils import defer_prefix_hierarchy, rebuild_prefixes
+from virtualization.models import Cluster, ClusterGroup, ClusterType, VirtualMachine
 
 
 class TestAggregate(TestCase):
@@ -160,6 +165,28 @@ class TestPrefix(TestCase):
 
         self.assertEqual(available_ips, missing_ips)
 
+    def test_get_available_ip_ranges(self):
+
+        parent_prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24'))
+        IPAddress.objects.bulk_create((
+            IPAddress(address=IPNetwork('10.0.0.0/24')),
+            IPAddress(address=IPNetwork('10.0.0.5/24')),
+            IPAddress(address=IPNetwork('10.0.0.6/24')),
+            IPAddress(address=IPNetwork('10.0.0.6/24')),
+            IPAddress(address=IPNetwork('10.0.0.15/24')),
+        ))
+        IPRange.objects.create(
+            start_address=IPNetwork('10.0.0.10/24'),
+            end_address=IPNetwork('10.0.0.20/24')
+        )
+
+        available_ranges = [(str(r[0]), str(r[-1])) for r in parent_prefix.get_available_ip_ranges()]
+        self.assertEqual(available_ranges, [
+            ('10.0.0.1', '10.0.0.4'),
+            ('10.0.0.7', '10.0.0.9'),
+            ('10.0.0.21', '10.0.0.254'),
+        ])
+
     def test_get_first_available_prefix(self):
 
         prefixes = Prefix.objects.bulk_create((
@@ -449,6 +476,87 @@ class TestPrefixHierarchy(TestCase):
         self.assertEqual(prefixes[3]._depth, 2)
         self.assertEqual(prefixes[3]._children, 0)
 
+    def test_delete_duplicate_prefixes4(self):
+        # Delete both instances of a duplicated 10.0.0.0/16
+        Prefix(prefix='10.0.0.0/16').save()
+        Prefix.objects.filter(prefix='10.0.0.0/16').delete()
+
+        prefixes = Prefix.objects.filter(prefix__family=4)
+        self.assertEqual(prefixes[0].prefix, IPNetwork('10.0.0.0/8'))
+        self.assertEqual(prefixes[0]._depth, 0)
+        self.assertEqual(prefixes[0]._children, 1)
+        self.assertEqual(prefixes[1].prefix, IPNetwork('10.0.0.0/24'))
+        self.assertEqual(prefixes[1]._depth, 1)
+        self.assertEqual(prefixes[1]._children, 0)
+
+    def test_defer_prefix_hierarchy(self):
+        tree_version = cache.get(get_cache_key(None))
+        with self.captureOnCommitCallbacks(execute=True):
+            with defer_prefix_hierarchy():
+                Prefix(prefix='10.0.0.0/12').save()
+                Prefix.objects.get(prefix='10.0.0.0/24').delete()
+                prefix = Prefix(prefix='10.0.0.0/20')
+                prefix.save()
+
+                # Hierarchy and PrefixTrees are not updated until the transaction has been committed
+                self.assertEqual(Prefix.objects.get(prefix='10.0.0.0/8')._children, 2)
+                self.assertEqual(cache.get(get_cache_key(None)), tree_version)
+
+        self.assertNotEqual(cache.get(get_cache_key(None)), tree_version)
+
+        prefixes = Prefix.objects.filter(prefix__family=4)
+        self.assertEqual(
+            [(str(p.prefix), p._depth, p._children) for p in prefixes],
+            [('10.0.0.0/8', 0, 3), ('10.0.0.0/12', 1, 2), ('10.0.0.0/16', 2, 1), ('10.0.0.0/20', 3, 0)]
+        )
+        self.assertEqual((prefix._depth, prefix._children), (3, 0))
+
+    def test_rebuild_prefixes(self):
+        Prefix(prefix='10.0.0.0/16').save()
+        Prefix.objects.update(_depth=0, _children=0)
+        self.assertEqual(rebuild_prefixes(None), (7, 7))
+
+        prefixes = Prefix.objects.filter(prefix__family=4)
+        self.assertEqual(
+            [(p._depth, p._children) for p in prefixes],
+            [(0, 3), (1, 1), (1, 1), (2, 0)]
+        )
+        prefixes = Prefix.objects.filter(prefix__family=6)
+        self.assertEqual(
+            [(p._depth, p._children) for p in prefixes],
+            [(0, 2), (1, 1), (2, 0)]
+        )
+
+        # Prefixes which are already correct are not updated
+        self.assertEqual(rebuild_prefixes(None), (0, 7))
+
+    def test_prefix_tree(self):
+        Prefix(prefix='10.0.0.0/16').save()
+        Prefix(prefix='10.1.0.0/16').save()
+        tree = PrefixTree(Prefix.objects.values_list('pk', 'prefix'))
+
+        def get_pks(**kwargs):
+            return set(Prefix.objects.filter(**kwargs).values_list('pk', flat=True))
+
+        self.assertEqual(set(tree.get_parents('10.0.0.0/24')), get_pks(prefix__net_contains='10.0.0.0/24'))
+        self.assertEqual(tree.get_parents('10.0.0.0/8'), [])
+        self.assertEqual(set(tree.get_parents('10.0.0.0/8', include_self=True)), get_pks(prefix='10.0.0.0/8'))
+        self.assertEqual(set(tree.get_children('10.0.0.0/8')), get_pks(prefix__net_contained='10.0.0.0/8'))
+        self.assertEqual(set(tree.get_children('10.0.0.0/12')), get_pks(prefix__net_contained='10.0.0.0/12'))
+        self.assertEqual(tree.get_children('10.1.0.0/16'), [])
+        self.assertEqual(tree.get_depth('10.0.0.0/24'), 2)
+        self.assertEqual(tree.get_depth('10.0.1.0/24'), 2)
+        self.assertEqual(tree.get_children_count('10.0.0.0/8'), 4)
+        self.assertEqual(tree.get_children_count('10.0.0.0/16'), 1)
+        self.assertEqual(
+            tree.get_child_networks('10.0.0.0/8'),
+            [IPNetwork('10.0.0.0/16'), IPNetwork('10.1.0.0/16')]
+        )
+        self.assertEqual(
+            tree.get_available_prefixes(IPNetwork('2001:db8::/32')),
+            IPSet(['2001:db8::/32']) - IPSet(['2001:db8::/40'])
+        )
+
 
 class TestIPAddress(TestCase):
 
@@ -541,6 +649,65 @@ class TestVLANGroup(TestCase):
         self.assertEqual(vlangroup.get_next_available_vid(), 105)
 
 
+class TestVLANScope(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        regions = (
+            Region.objects.create(name='Region 1', slug='region-1'),
+            Region.objects.create(name='Region 2', slug='region-2'),
+        )
+        site = Site.objects.create(name='Site 1', slug='site-1', region=regions[0])
+        manufacturer = Manufacturer.objects.create(name='Manufacturer 1', slug='manufacturer-1')
+        device_type = DeviceType.objects.create(model='Device Type 1', slug='device-type-1', manufacturer=manufacturer)
+        device_role = DeviceRole.objects.create(name='Device Role 1', slug='device-role-1')
+        Device.objects.create(name='Device 1', site=site, device_type=device_type, device_role=device_role)
+
+        vlangroup = VLANGroup.objects.create(name='VLAN Group 1', slug='vlan-group-1', scope=regions[1])
+        VLAN.objects.create(name='VLAN 100', vid=100, group=vlangroup)
+
+    def test_get_for_device_scope_invalidation(self):
+        device = Device.objects.first()
+        vlangroup = VLANGroup.objects.first()
+        self.assertFalse(VLAN.objects.get_for_device(device).exists())
+
+        # Moving the device's region beneath the VLANGroup's region brings the VLAN into scope
+        region = device.site.region
+        region.parent = vlangroup.scope
+        region.save()
+        device = Device.objects.get(pk=device.pk)
+        self.assertTrue(VLAN.objects.get_for_device(device).exists())
+
+        # Re-scoping the VLANGroup to another site takes it back out of scope
+        vlangroup.scope = Site.objects.create(name='Site 2', slug='site-2')
+        vlangroup.save()
+        self.assertFalse(VLAN.objects.get_for_device(device).exists())
+
+    def test_get_for_virtualmachine_scope_invalidation(self):
+        cluster_type = ClusterType.objects.create(name='Cluster Type 1', slug='cluster-type-1')
+        cluster_groups = (
+            ClusterGroup.objects.create(name='Cluster Group 1', slug='cluster-group-1'),
+            ClusterGroup.objects.create(name='Cluster Group 2', slug='cluster-group-2'),
+        )
+        cluster = Cluster.objects.create(name='Cluster 1', type=cluster_type, group=cluster_groups[0])
+        vm = VirtualMachine.objects.create(name='VM 1', cluster=cluster)
+        vlangroup = VLANGroup.objects.create(name='VLAN Group 2', slug='vlan-group-2', scope=cluster_groups[0])
+        VLAN.objects.create(name='VLAN 200', vid=200, group=vlangroup)
+        self.assertTrue(VLAN.objects.get_for_virtualmachine(vm).filter(vid=200).exists())
+
+        # Moving the cluster to another group takes the VLAN out of scope
+        cluster.group = cluster_groups[1]
+        cluster.save()
+        vm = VirtualMachine.objects.get(pk=vm.pk)
+        self.assertFalse(VLAN.objects.get_for_virtualmachine(vm).filter(vid=200).exists())
+
+        # Modifying or deleting a ClusterGroup discards all cached scopes
+        for action in (cluster_groups[1].save, cluster_groups[0].delete):
+            cache_key = get_vlangroup_scope_cache_key('cluster', cluster.pk)
+            action()
+            self.assertNotEqual(get_vlangroup_scope_cache_key('cluster', cluster.pk), cache_key)
+
+
 class TestL2VPNTermination(TestCase):
 
     @classmethod
@@ -378,6 +378,42 @@ class PrefixTestCase(ViewTestCases.PrimaryObjectViewTestCase):
         url = reverse('ipam:prefix_ipaddresses', kwargs={'pk': prefix.pk})
         self.assertHttpStatus(self.client.get(url), 200)
 
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_prefix_ipaddresses_available(self):
+        prefix = Prefix.objects.create(prefix=IPNetwork('192.168.0.0/24'))
+        ip_addresses = (
+            IPAddress(address=IPNetwork('192.168.0.2/24')),
+            IPAddress(address=IPNetwork('192.168.0.5/24')),
+        )
+        IPAddress.objects.bulk_create(ip_addresses)
+        IPRange.objects.create(start_address='192.168.0.10/24', end_address='192.168.0.20/24', size=11)
+        url = reverse('ipam:prefix_ipaddresses', kwargs={'pk': prefix.pk})
+
+        # Available IPs are interleaved with the child IPs, regardless of any IP ranges or mark_utilized
+        expected = [
+            (1, '192.168.0.1/24'),
+            ip_addresses[0],
+            (2, '192.168.0.3/24'),
+            ip_addresses[1],
+            (249, '192.168.0.6/24'),
+        ]
+        for mark_utilized in (False, True):
+            Prefix.objects.filter(pk=prefix.pk).update(mark_utilized=mark_utilized)
+            response = self.client.get(url)
+            self.assertHttpStatus(response, 200)
+            self.assertEqual(list(response.context['table'].data), expected)
+
+        # The IPv6 Subnet-Router anycast address is listed as available
+        prefix = Prefix.objects.create(prefix=IPNetwork('2001:db8::/126'))
+        url = reverse('ipam:prefix_ipaddresses', kwargs={'pk': prefix.pk})
+        response = self.client.get(url)
+        self.assertHttpStatus(response, 200)
+        self.assertEqual(list(response.context['table'].data), [(4, '2001:db8::/126')])
+
+        # Available IPs can be hidden
+        response = self.client.get(url, {'show_available': 'false'})
+        self.assertEqual(list(response.context['table'].data), [])
+
 
 class IPRangeTestCase(ViewTestCases.PrimaryObjectViewTestCase):
     model = IPRange
@@ -0,0 +1,220 @@
+import uuid
+from bisect import bisect_left, bisect_right
+
+import netaddr
+from django.core.cache import cache
+from django.db import transaction
+
+__all__ = (
+    'PrefixTree',
+    'get_prefix_tree',
+    'invalidate_prefix_trees',
+)
+
+CACHE_KEY_PREFIX = 'ipam.prefix_tree'
+
+# PrefixTrees built by this process, keyed by VRF ID, along with the version of each
+_prefix_trees = {}
+
+
+class PrefixNode:
+    """
+    A distinct network within a PrefixTree, along with the IDs of all Prefixes representing it. Child nodes are the
+    outermost networks contained by this one, ordered by their first address.
+    """
+    __slots__ = ('version', 'first', 'last', 'prefixlen', 'pks', 'children', 'child_firsts', 'count')
+
+    def __init__(self, version, first, last, prefixlen, pks):
+        self.version = version
+        self.first = first
+        self.last = last
+        self.prefixlen = prefixlen
+        self.pks = pks
+        self.children = []
+        self.child_firsts = []
+        # The number of Prefixes (including duplicates) contained by this network
+        self.count = 0
+
+    @property
+    def network(self):
+        return netaddr.IPNetwork((self.first, self.prefixlen), version=self.version)
+
+    def contains(self, version, first, last):
+        return self.version == version and self.first <= first and last <= self.last
+
+    def add_child(self, node):
+        self.children.append(node)
+        self.child_firsts.append(node.first)
+
+    def walk(self, depth=0):
+        """
+        Yield this node and all nodes beneath it as (node, depth) tuples, in hierarchical order.
+        """
+        yield self, depth
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+
+class PrefixTree:
+    """
+    An in-memory radix tree of all Prefixes within a VRF (or the global table), which can answer questions about the
+    prefix hierarchy without querying the database. Each node represents a distinct network; nodes are nested
+    according to containment, and the children of each node are kept sorted so that the node containing any network
+    can be found by binary search at each level.
+
+    :param prefixes: An iterable of (ID, IPNetwork) tuples
+    """
+    def __init__(self, prefixes):
+        # A virtual root node per address family
+        self.roots = {
+            4: PrefixNode(4, 0, 2 ** 32 - 1, 0, []),
+            6: PrefixNode(6, 0, 2 ** 128 - 1, 0, []),
+        }
+
+        # Parents sort ahead of their children
+        prefixes = sorted(prefixes, key=lambda p: (p[1].version, p[1].first, p[1].prefixlen))
+
+        stack = []
+        for pk, prefix in prefixes:
+            version, first, last = prefix.version, prefix.first, prefix.last
+
+            # Handle duplicate prefixes
+            if stack and (stack[-1].version, stack[-1].first, stack[-1].last) == (version, first, last):
+                stack[-1].pks.append(pk)
+                for node in stack[:-1]:
+                    node.count += 1
+                continue
+
+            # Pop nodes from the stack until we reach a parent of this prefix (or the root)
+            while stack and not stack[-1].contains(version, first, last):
+                stack.pop()
+            if not stack:
+                stack.append(self.roots[version])
+
+            node = PrefixNode(version, first, last, prefix.prefixlen, [pk])
+            stack[-1].add_child(node)
+            for parent in stack:
+                parent.count += 1
+            stack.append(node)
+
+    def _find(self, prefix):
+        """
+        Return the list of nodes which contain or are equal to the given network, from the outermost inwards.
+        """
+        prefix = netaddr.IPNetwork(prefix)
+        version, first, last = prefix.version, prefix.first, prefix.last
+
+        path = []
+        node = self.roots[version]
+        while True:
+            i = bisect_right(node.child_firsts, first) - 1
+            if i < 0 or node.children[i].last < last:
+                return path
+            node = node.children[i]
+            path.append(node)
+            if node.first == first and node.last == last:
+                return path
+
+    def _find_contained(self, prefix):
+        """
+        Return the outermost nodes contained by (but not equal to) the given network, along with the node equal to it
+        (if any).
+        """
+        prefix = netaddr.IPNetwork(prefix)
+        path = self._find(prefix)
+        if path and path[-1].first == prefix.first and path[-1].last == prefix.last:
+            return path[-1].children, path[-1]
+
+        # The network is not itself present in the tree: find the children of its closest parent that fall within it
+        parent = path[-1] if path else self.roots[prefix.version]
+        start = bisect_left(parent.child_firsts, prefix.first)
+        end = bisect_right(parent.child_firsts, prefix.last)
+        return parent.children[start:end], None
+
+    def get_parents(self, prefix, include_self=False):
+        """
+        Return the IDs of all Prefixes which contain the given network.
+        """
+        path = self._find(prefix)
+        prefix = netaddr.IPNetwork(prefix)
+        if path and not include_self and path[-1].first == prefix.first and path[-1].last == prefix.last:
+            path = path[:-1]
+        return [pk for node in path for pk in node.pks]
+
+    def get_children(self, prefix, include_self=False):
+        """
+        Return the IDs of all Prefixes contained by the given network.
+        """
+        children, node = self._find_contained(prefix)
+        pks = list(node.pks) if node and include_self else []
+        for child in children:
+            pks.extend(pk for n, _ in child.walk() for pk in n.pks)
+        return pks
+
+    def get_child_networks(self, prefix):
+        """
+        Return the outermost networks contained by the given network. Together these cover all space within the
+        network which has been allocated to child Prefixes.
+        """
+        children, _ = self._find_contained(prefix)
+        return [child.network for child in children]
+
+    def get_depth(self, prefix):
+        """
+        Return the number of distinct networks which contain the given network.
+        """
+        path = self._find(prefix)
+        prefix = netaddr.IPNetwork(prefix)
+        if path and path[-1].first == prefix.first and path[-1].last == prefix.last:
+            return len(path) - 1
+        return len(path)
+
+    def get_children_count(self, prefix):
+        """
+        Return the number of Prefixes (including duplicates) contained by the given network.
+        """
+        children, _ = self._find_contained(prefix)
+        return sum(len(child.pks) + child.count for child in children)
+
+    def get_available_prefixes(self, prefix):
+        """
+        Return all space within the given network which has not been allocated to a child Prefix, as an IPSet.
+        """
+        return netaddr.IPSet([prefix]) - netaddr.IPSet(self.get_child_networks(prefix))
+
+
+def get_cache_key(vrf_id):
+    return f'{CACHE_KEY_PREFIX}.{vrf_id}.version'
+
+
+def get_prefix_tree(vrf_id):
+    """
+    Return the PrefixTree for a VRF (or the global table, if vrf_id is None). Trees are built lazily and retained by
+    each process until a change to the VRF's Prefixes is signalled via invalidate_prefix_trees().
+    """
+    from .models import Prefix
+
+    version = cache.get(get_cache_key(vrf_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(get_cache_key(vrf_id), version, None)
+
+    if vrf_id in _prefix_trees and _prefix_trees[vrf_id][0] == version:
+        return _prefix_trees[vrf_id][1]
+
+    tree = PrefixTree(Prefix.objects.filter(vrf_id=vrf_id).order_by().values_list('pk', 'prefix'))
+    _prefix_trees[vrf_id] = (version, tree)
+
+    return tree
+
+
+def invalidate_prefix_trees(*vrf_ids):
+    """
+    Discard the PrefixTrees for the specified VRFs in all processes. Trees are invalidated both immediately and once the
+    current transaction has been committed, so that no tree built from uncommitted data outlives it.
+    """
+    def invalidate():
+        cache.set_many({get_cache_key(vrf_id): uuid.uuid4().hex for vrf_id in vrf_ids}, None)
+
+    invalidate()
+    transaction.on_commit(invalidate)
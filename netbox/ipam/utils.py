@@ -1,7 +1,12 @@
+from contextlib import contextmanager
+
 import netaddr
+from django.db import connection, transaction
 
+from netbox import thread_locals
 from .constants import *
 from .models import Prefix, VLAN
+from .trees import invalidate_prefix_trees
 
 
 def add_requested_prefixes(parent, prefix_list, show_available=True, show_assigned=True):
@@ -126,61 +131,142 @@ def add_available_vlans(vlans, vlan_group=None):
     return vlans
 
 
-def rebuild_prefixes(vrf):
+def _update_hierarchy(updates):
     """
-    Rebuild the prefix hierarchy for all prefixes in the specified VRF (or global table).
+    Write the depth and child count of many Prefixes in a single query.
+
+    :param updates: A list of (ID, depth, children) tuples
     """
-    def contains(parent, child):
-        return child in parent and child != parent
+    quote = connection.ops.quote_name
+    values = ', '.join(['(%s, %s, %s)'] * len(updates))
+    sql = (
+        f'UPDATE {quote(Prefix._meta.db_table)} SET {quote("_depth")} = v.depth, {quote("_children")} = v.children '
+        f'FROM (VALUES {values}) AS v(id, depth, children) WHERE {quote(Prefix._meta.db_table)}.{quote("id")} = v.id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for update in updates for value in update])
 
-    def push_to_stack(prefix):
-        # Increment child count on parent nodes
-        for n in stack:
-            n['children'] += 1
-        stack.append({
-            'pk': [prefix['pk']],
-            'prefix': prefix['prefix'],
-            'children': 0,
-        })
 
-    stack = []
-    update_queue = []
-    prefixes = Prefix.objects.filter(vrf=vrf).values('pk', 'prefix')
+def rebuild_prefixes(vrf, batch_size=PREFIX_REBUILD_BATCH_SIZE):
+    """
+    Rebuild the prefix hierarchy for all prefixes in the specified VRF (or global table). Prefixes are streamed from
+    the database in hierarchical order using a server-side cursor, and only those whose depth or child count has
+    changed are written back, batch_size at a time. Returns the number of prefixes updated and the total number of
+    prefixes.
 
-    # Iterate through all Prefixes in the VRF, growing and shrinking the stack as we go
-    for i, p in enumerate(prefixes):
+    :param vrf: The VRF (or VRF ID) to rebuild, or None for the global table
+    :param batch_size: The number of prefixes to retrieve and update at once
+    """
+    prefixes = Prefix.objects.filter(vrf=vrf).order_by('prefix', 'pk').values_list(
+        'pk', 'prefix', '_depth', '_children'
+    )
+    stack = []
+    pending = []
+    count = total = 0
 
-        # Grow the stack if this is a child of the most recent prefix
-        if not stack or contains(stack[-1]['prefix'], p['prefix']):
-            push_to_stack(p)
+    def pop():
+        nonlocal count
+        node = stack.pop()
+        for pk, depth, children in node['prefixes']:
+            if (depth, children) != (len(stack), node['children']):
+                pending.append((pk, len(stack), node['children']))
+        if len(pending) >= batch_size:
+            _update_hierarchy(pending)
+            count += len(pending)
+            pending.clear()
+
+    # Parents sort ahead of their children, so each Prefix is a child of the most recent Prefix containing it
+    for pk, prefix, depth, children in prefixes.iterator(chunk_size=batch_size):
+        total += 1
+        version, first, last = prefix.version, prefix.first, prefix.last
 
         # Handle duplicate prefixes
-        elif stack[-1]['prefix'] == p['prefix']:
-            stack[-1]['pk'].append(p['pk'])
-
-        # If this is a sibling or parent of the most recent prefix, pop nodes from the
-        # stack until we reach a parent prefix (or the root)
-        else:
-            while stack and not contains(stack[-1]['prefix'], p['prefix']):
-                node = stack.pop()
-                for pk in node['pk']:
-                    update_queue.append(
-                        Prefix(pk=pk, _depth=len(stack), _children=node['children'])
-                    )
-            push_to_stack(p)
-
-        # Flush the update queue once it reaches 100 Prefixes
-        if len(update_queue) >= 100:
-            Prefix.objects.bulk_update(update_queue, ['_depth', '_children'])
-            update_queue = []
+        if stack and (stack[-1]['version'], stack[-1]['first'], stack[-1]['last']) == (version, first, last):
+            stack[-1]['prefixes'].append((pk, depth, children))
+            for node in stack[:-1]:
+                node['children'] += 1
+            continue
+
+        # Pop nodes from the stack until we reach a parent of this prefix (or the root)
+        while stack and not (
+            stack[-1]['version'] == version and stack[-1]['first'] <= first and last <= stack[-1]['last']
+        ):
+            pop()
+
+        for node in stack:
+            node['children'] += 1
+        stack.append({
+            'version': version,
+            'first': first,
+            'last': last,
+            'prefixes': [(pk, depth, children)],
+            'children': 0,
+        })
 
     # Clear out any prefixes remaining in the stack
     while stack:
-        node = stack.pop()
-        for pk in node['pk']:
-            update_queue.append(
-                Prefix(pk=pk, _depth=len(stack), _children=node['children'])
-            )
+        pop()
+    if pending:
+        _update_hierarchy(pending)
+        count += len(pending)
+
+    return count, total
+
+
+class PrefixHierarchyQueue:
+    """
+    Collects the VRFs whose prefix hierarchy has been affected by changes to Prefixes, so that the hierarchy of each
+    can be rebuilt once (rather than updated for every Prefix) after the changes have been committed.
+    """
+    def __init__(self):
+        self.vrf_ids = set()
+        self.prefixes = []
+
+    def add(self, prefix, *vrf_ids):
+        self.vrf_ids.update(vrf_ids)
+        self.prefixes.append(prefix)
+
+    def flush(self):
+        with transaction.atomic():
+            for vrf_id in self.vrf_ids:
+                rebuild_prefixes(vrf_id)
+
+        # Discard the PrefixTrees of the affected VRFs once, rather than for every Prefix
+        if self.vrf_ids:
+            invalidate_prefix_trees(*self.vrf_ids)
+
+        # Refresh the depth and child count of the affected Prefixes which still exist
+        hierarchy = {
+            pk: (depth, children) for pk, depth, children in Prefix.objects.filter(
+                pk__in=[prefix.pk for prefix in self.prefixes if prefix.pk]
+            ).values_list('pk', '_depth', '_children')
+        }
+        for prefix in self.prefixes:
+            if prefix.pk in hierarchy:
+                prefix._depth, prefix._children = hierarchy[prefix.pk]
+
+
+def get_prefix_hierarchy_queue():
+    """
+    Return the active PrefixHierarchyQueue, if any.
+    """
+    return getattr(thread_locals, 'prefix_hierarchy_queue', None)
 
-    # Final flush of any remaining Prefixes
-    Prefix.objects.bulk_update(update_queue, ['_depth', '_children'])
+
+@contextmanager
+def defer_prefix_hierarchy():
+    """
+    Suspend the maintenance of prefix depth and child counts as Prefixes are created, modified, or deleted. Once the
+    current transaction has been committed (or at the end of the block, if no transaction is active), the hierarchy of
+    each affected VRF is rebuilt and its PrefixTrees are invalidated. Nested blocks defer to the outermost.
+    """
+    if get_prefix_hierarchy_queue() is not None:
+        yield
+        return
+
+    queue = thread_locals.prefix_hierarchy_queue = PrefixHierarchyQueue()
+    try:
+        yield
+    finally:
+        del thread_locals.prefix_hierarchy_queue
+    transaction.on_commit(queue.flush)
@@ -9,6 +9,7 @@ from circuits.tables import ProviderTable
 from dcim.filtersets import InterfaceFilterSet
 from dcim.models import Interface, Site, Device
 from dcim.tables import SiteTable
+from netbox.config import get_config
 from netbox.views import generic
 from utilities.utils import count_related
 from virtualization.filtersets import VMInterfaceFilterSet
@@ -18,7 +19,8 @@ from .constants import *
 from .models import *
 from .models import ASN
 from .tables.l2vpn import L2VPNTable, L2VPNTerminationTable
-from .utils import add_requested_prefixes, add_available_ipaddresses, add_available_vlans
+from .trees import get_prefix_tree
+from .utils import add_requested_prefixes, add_available_ipaddresses, add_available_vlans, defer_prefix_hierarchy
 
 
 #
@@ -432,11 +434,18 @@ class PrefixView(generic.ObjectView):
             aggregate = None
 
         # Parent prefixes table
-        parent_prefixes = Prefix.objects.restrict(request.user, 'view').filter(
-            Q(vrf=instance.vrf) | Q(vrf__isnull=True)
-        ).filter(
-            prefix__net_contains=str(instance.prefix)
-        ).prefetch_related(
+        if get_config().PREFIX_INDEX_ENABLED:
+            parent_pks = get_prefix_tree(None).get_parents(instance.prefix)
+            if instance.vrf_id:
+                parent_pks += get_prefix_tree(instance.vrf_id).get_parents(instance.prefix)
+            parent_prefixes = Prefix.objects.filter(pk__in=parent_pks)
+        else:
+            parent_prefixes = Prefix.objects.filter(
+                Q(vrf=instance.vrf) | Q(vrf__isnull=True)
+            ).filter(
+                prefix__net_contains=str(instance.prefix)
+            )
+        parent_prefixes = parent_prefixes.restrict(request.user, 'view').prefetch_related(
             'site', 'role', 'tenant', 'vlan',
         )
         parent_prefix_table = tables.PrefixTable(
@@ -549,20 +558,35 @@ class PrefixDeleteView(generic.ObjectDeleteView):
     queryset = Prefix.objects.all()
 
 
+class DeferPrefixHierarchyMixin:
+    """
+    Defer the maintenance of the prefix hierarchy until all objects have been processed, so that the hierarchy of each
+    affected VRF is rebuilt only once.
+    """
+    def post(self, request, *args, **kwargs):
+        with defer_prefix_hierarchy():
+            return super().post(request, *args, **kwargs)
+
+
 class PrefixBulkImportView(generic.BulkImportView):
     queryset = Prefix.objects.all()
     model_form = forms.PrefixCSVForm
     table = tables.PrefixTable
 
+    def _import_records(self, *args, **kwargs):
+        # Rebuild the hierarchy once per import (or per batch, for background imports)
+        with defer_prefix_hierarchy():
+            return super()._import_records(*args, **kwargs)
+
 
-class PrefixBulkEditView(generic.BulkEditView):
+class PrefixBulkEditView(DeferPrefixHierarchyMixin, generic.BulkEditView):
     queryset = Prefix.objects.prefetch_related('vrf__tenant')
     filterset = filtersets.PrefixFilterSet
     table = tables.PrefixTable
     form = forms.PrefixBulkEditForm
 
 
-class PrefixBulkDeleteView(generic.BulkDeleteView):
+class PrefixBulkDeleteView(DeferPrefixHierarchyMixin, generic.BulkDeleteView):
     queryset = Prefix.objects.prefetch_related('vrf__tenant')
     filterset = filtersets.PrefixFilterSet
     table = tables.PrefixTable
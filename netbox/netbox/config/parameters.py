@@ -65,6 +65,13 @@ PARAMS = (
         description="Prefer IPv4 addresses over IPv6",
         field=forms.BooleanField
     ),
+    ConfigParam(
+        name='PREFIX_INDEX_ENABLED',
+        label='In-memory prefix index',
+        default=False,
+        description="Answer prefix hierarchy queries using an in-memory index of each VRF",
+        field=forms.BooleanField
+    ),
 
     # Racks
     ConfigParam(
@@ -3,3 +3,6 @@ NESTED_SERIALIZER_PREFIX = 'Nested'
 
 # Max results per object type
 SEARCH_MAX_RESULTS = 15
+
+# Number of objects processed between progress updates by background bulk operations
+BULK_JOB_BATCH_SIZE = 100
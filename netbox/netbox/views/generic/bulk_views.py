@@ -8,7 +8,7 @@ from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.db import transaction, IntegrityError
 from django.db.models import ManyToManyField, ProtectedError
 from django.db.models.fields.reverse_related import ManyToManyRel
-from django.forms import Form, ModelMultipleChoiceField, MultipleHiddenInput
+from django.forms import BooleanField, Form, IntegerField, ModelMultipleChoiceField, MultipleHiddenInput
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django_tables2.export import TableExport
@@ -25,7 +25,8 @@ from utilities.htmx import is_htmx
 from utilities.permissions import get_permission_for_model
 from utilities.views import GetReturnURLMixin
 from .base import BaseMultiObjectView
-from .mixins import ActionsMixin, TableMixin
+from .jobs import run_bulk_delete, run_bulk_edit, run_bulk_import
+from .mixins import ActionsMixin, BackgroundJobMixin, TableMixin
 from .utils import get_prerequisite_model
 
 __all__ = (
@@ -286,7 +287,7 @@ class BulkCreateView(GetReturnURLMixin, BaseMultiObjectView):
         })
 
 
-class BulkImportView(GetReturnURLMixin, BaseMultiObjectView):
+class BulkImportView(BackgroundJobMixin, GetReturnURLMixin, BaseMultiObjectView):
     """
     Import objects in bulk (CSV format).
 
@@ -307,6 +308,19 @@ class BulkImportView(GetReturnURLMixin, BaseMultiObjectView):
                 from_form=self.model_form,
                 required=False
             )
+            background_job = BooleanField(
+                label="Run as background job",
+                required=False,
+                help_text="Import the data in a background job rather than within this request (recommended for large "
+                          "imports)"
+            )
+            batch_size = IntegerField(
+                required=False,
+                min_value=1,
+                help_text="Commit each batch of this many rows independently when running as a background job, "
+                          "skipping and reporting any invalid rows. If not set, no rows are imported unless all are "
+                          "valid."
+            )
 
             def clean(self):
                 csv_rows = self.cleaned_data['csv'][1] if 'csv' in self.cleaned_data else None
@@ -322,13 +336,36 @@ class BulkImportView(GetReturnURLMixin, BaseMultiObjectView):
         return ImportForm(*args, **kwargs)
 
     def _create_objects(self, form, request):
-        new_objs = []
         if request.FILES:
             headers, records = form.cleaned_data['csv_file']
         else:
             headers, records = form.cleaned_data['csv']
 
-        for row, data in enumerate(records, start=1):
+        # Abort the transaction on the first validation error
+        new_objs, errors = self._import_records(headers, records, request, stop_on_error=True)
+        if errors:
+            row, field_errors = errors[0]
+            for field, err in field_errors:
+                form.add_error('csv', f'Row {row} {field}: {err}')
+            raise ValidationError("")
+
+        return new_objs
+
+    def _import_records(self, headers, records, request, start=1, stop_on_error=False):
+        """
+        Bind each CSV record to a new model form instance and save it. Return the list of new objects along with a list
+        of (row, field_errors) tuples for all invalid records, where field_errors is a list of (field, error) tuples.
+
+        :param headers: The CSV headers, as returned by parse_csv()
+        :param records: A list of CSV records, as returned by parse_csv()
+        :param request: The current request
+        :param start: The row number of the first record
+        :param stop_on_error: If True, stop processing records upon encountering the first invalid record
+        """
+        new_objs = []
+        errors = []
+
+        for row, data in enumerate(records, start=start):
             obj_form = self.model_form(data, headers=headers)
             restrict_form_fields(obj_form, request.user)
 
@@ -336,11 +373,11 @@ class BulkImportView(GetReturnURLMixin, BaseMultiObjectView):
                 obj = self._save_obj(obj_form, request)
                 new_objs.append(obj)
             else:
-                for field, err in obj_form.errors.items():
-                    form.add_error('csv', f'Row {row} {field}: {err[0]}')
-                raise ValidationError("")
+                errors.append((row, [(field, err[0]) for field, err in obj_form.errors.items()]))
+                if stop_on_error:
+                    break
 
-        return new_objs
+        return new_objs, errors
 
     def _save_obj(self, obj_form, request):
         """
@@ -372,6 +409,16 @@ class BulkImportView(GetReturnURLMixin, BaseMultiObjectView):
         if form.is_valid():
             logger.debug("Form validation was successful")
 
+            if form.cleaned_data['background_job']:
+                if request.FILES:
+                    headers, records = form.cleaned_data['csv_file']
+                else:
+                    headers, records = form.cleaned_data['csv']
+                return self._enqueue_job(
+                    request, run_bulk_import, f'Import {self.queryset.model._meta.verbose_name_plural}',
+                    include_data=False, headers=headers, records=records, batch_size=form.cleaned_data['batch_size']
+                )
+
             try:
                 # Iterate through CSV data and bind each row to a new model form instance.
                 with transaction.atomic():
@@ -414,7 +461,7 @@ class BulkImportView(GetReturnURLMixin, BaseMultiObjectView):
         })
 
 
-class BulkEditView(GetReturnURLMixin, BaseMultiObjectView):
+class BulkEditView(BackgroundJobMixin, GetReturnURLMixin, BaseMultiObjectView):
     """
     Edit objects in bulk.
 
@@ -429,7 +476,14 @@ class BulkEditView(GetReturnURLMixin, BaseMultiObjectView):
     def get_required_permission(self):
         return get_permission_for_model(self.queryset.model, 'change')
 
-    def _update_objects(self, form, request):
+    def _update_objects(self, form, request, objects=None):
+        """
+        Apply the changes specified by the bulk edit form and return the list of updated objects.
+
+        :param form: The validated bulk edit form
+        :param request: The current request
+        :param objects: The objects to update (defaults to all objects selected in the form)
+        """
         custom_fields = getattr(form, 'custom_fields', [])
         standard_fields = [
             field for field in form.fields if field not in list(custom_fields) + ['pk']
@@ -437,7 +491,10 @@ class BulkEditView(GetReturnURLMixin, BaseMultiObjectView):
         nullified_fields = request.POST.getlist('_nullify')
         updated_objects = []
 
-        for obj in self.queryset.filter(pk__in=form.cleaned_data['pk']):
+        if objects is None:
+            objects = self.queryset.filter(pk__in=form.cleaned_data['pk'])
+
+        for obj in objects:
 
             # Take a snapshot of change-logged models
             if hasattr(obj, 'snapshot'):
@@ -525,6 +582,12 @@ class BulkEditView(GetReturnURLMixin, BaseMultiObjectView):
             if form.is_valid():
                 logger.debug("Form validation was successful")
 
+                if request.POST.get('_apply') == 'background':
+                    return self._enqueue_job(
+                        request, run_bulk_edit, f'Edit {model._meta.verbose_name_plural}', pk_list=list(pk_list),
+                        initial_data=initial_data
+                    )
+
                 try:
 
                     with transaction.atomic():
@@ -659,7 +722,7 @@ class BulkRenameView(GetReturnURLMixin, BaseMultiObjectView):
         })
 
 
-class BulkDeleteView(GetReturnURLMixin, BaseMultiObjectView):
+class BulkDeleteView(BackgroundJobMixin, GetReturnURLMixin, BaseMultiObjectView):
     """
     Delete objects in bulk.
 
@@ -710,6 +773,11 @@ class BulkDeleteView(GetReturnURLMixin, BaseMultiObjectView):
             if form.is_valid():
                 logger.debug("Form validation was successful")
 
+                if request.POST.get('_confirm') == 'background':
+                    return self._enqueue_job(
+                        request, run_bulk_delete, f'Delete {model._meta.verbose_name_plural}', pk_list=list(pk_list)
+                    )
+
                 # Delete objects
                 queryset = self.queryset.filter(pk__in=pk_list)
                 deleted_count = queryset.count()
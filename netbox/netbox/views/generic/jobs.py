@@ -0,0 +1,280 @@
+import logging
+import traceback
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import ProtectedError
+
+from extras.choices import JobResultStatusChoices
+from extras.context_managers import change_logging
+from extras.signals import clear_webhooks
+from netbox.constants import BULK_JOB_BATCH_SIZE
+from utilities.exceptions import AbortRequest, AbortTransaction, PermissionsViolation
+from utilities.forms import restrict_form_fields
+
+__all__ = (
+    'run_bulk_delete',
+    'run_bulk_edit',
+    'run_bulk_import',
+)
+
+
+def _add_errors(job_result, records, start, errors, reason=None):
+    """
+    Record the invalid records in a batch on the JobResult, along with their errors.
+
+    :param job_result: The JobResult to update
+    :param records: The batch of records
+    :param start: The row number of the first record in the batch
+    :param errors: A list of (row, field_errors) tuples, as returned by BulkImportView._import_records()
+    :param reason: If set, all other records in the batch are also recorded with this message
+    """
+    field_errors = dict(errors)
+    for row, record in enumerate(records, start=start):
+        if row in field_errors:
+            messages = [f'{field}: {err}' for field, err in field_errors[row]]
+        elif reason:
+            messages = [reason]
+        else:
+            continue
+        job_result.data['errors'].append({
+            'row': row,
+            'record': list(record.values()),
+            'errors': messages,
+        })
+
+
+def run_bulk_import(request, view_class, headers, records, batch_size=None, return_url=None, **kwargs):
+    """
+    Import objects from parsed CSV data as a background job. Records are processed in batches of batch_size, and each
+    batch is committed independently with any invalid records skipped. If batch_size is not set, all records are
+    processed as a single batch, which is committed only if every record is valid. Progress is recorded on the
+    JobResult as each batch is completed, along with the details of every record which was not imported.
+
+    :param request: A copy of the request which initiated the import
+    :param view_class: The BulkImportView subclass handling the import
+    :param headers: The CSV headers, as returned by parse_csv()
+    :param records: A list of CSV records, as returned by parse_csv()
+    :param batch_size: The number of records to commit at once (optional)
+    :param return_url: The URL to which the user is directed upon completion (optional)
+    """
+    job_result = kwargs.pop('job_result')
+    logger = logging.getLogger('netbox.jobs.run_bulk_import')
+
+    view = view_class()
+    view.queryset = view.queryset.restrict(request.user, 'add')
+    model = view.queryset.model
+
+    job_result.status = JobResultStatusChoices.STATUS_RUNNING
+    job_result.data = {
+        'total': len(records),
+        'processed': 0,
+        'succeeded': 0,
+        'headers': [f'{field}.{to_field}' if to_field else field for field, to_field in headers.items()],
+        'errors': [],
+        'return_url': return_url,
+    }
+    job_result.save()
+    logger.info(f"Importing {len(records)} {model._meta.verbose_name_plural} (batch size: {batch_size})")
+
+    errored = False
+    for i in range(0, len(records), batch_size or len(records) or 1):
+        batch = records[i:i + batch_size] if batch_size else records
+        start = i + 1
+        new_objs, errors, reason = [], [], None
+
+        with change_logging(request):
+            try:
+                with transaction.atomic():
+                    new_objs, errors = view._import_records(headers, batch, request, start=start)
+
+                    # Without batching, commit the import only if all records are valid
+                    if errors and not batch_size:
+                        raise AbortTransaction()
+
+                    # Enforce object-level permissions
+                    if view.queryset.filter(pk__in=[obj.pk for obj in new_objs]).count() != len(new_objs):
+                        raise PermissionsViolation
+
+            except AbortTransaction:
+                new_objs = []
+                clear_webhooks.send(request)
+
+            except (AbortRequest, PermissionsViolation) as e:
+                logger.debug(e.message)
+                new_objs = []
+                reason = f"Not imported: {e.message}"
+                clear_webhooks.send(request)
+
+            except Exception as e:
+                stacktrace = traceback.format_exc()
+                logger.error(f"Exception raised during bulk import: {e}\n{stacktrace}")
+                new_objs = []
+                reason = f"Not imported: An exception occurred: {type(e).__name__}: {e}"
+                errored = True
+                clear_webhooks.send(request)
+
+        _add_errors(job_result, batch, start, errors, reason)
+        job_result.data['processed'] += len(batch)
+        job_result.data['succeeded'] += len(new_objs)
+
+        # Abandon any remaining records if an unexpected exception has occurred
+        if errored:
+            job_result.set_status(JobResultStatusChoices.STATUS_ERRORED)
+            job_result.save()
+            return
+
+        job_result.save()
+
+    if job_result.data['errors']:
+        job_result.set_status(JobResultStatusChoices.STATUS_FAILED)
+    else:
+        job_result.set_status(JobResultStatusChoices.STATUS_COMPLETED)
+    job_result.save()
+
+    logger.info(
+        f"Imported {job_result.data['succeeded']} of {len(records)} {model._meta.verbose_name_plural} in "
+        f"{job_result.duration}"
+    )
+
+
+def _run_for_objects(job_result, request, queryset, pk_list, func, return_url, logger):
+    """
+    Call func for each of the specified objects in turn. Each call is made within its own transaction, so that an
+    object which cannot be processed is skipped (and recorded on the JobResult) without affecting the others. Objects
+    are retrieved in batches, and progress is recorded on the JobResult after each batch.
+
+    :param job_result: The JobResult for the job
+    :param request: A copy of the request which initiated the job
+    :param queryset: The (restricted) queryset from which objects are retrieved
+    :param pk_list: The primary keys of the objects to process
+    :param func: A callable which accepts a single object
+    :param return_url: The URL to which the user is directed upon completion (optional)
+    :param logger: The job's logger
+    """
+    job_result.status = JobResultStatusChoices.STATUS_RUNNING
+    job_result.data = {
+        'total': len(pk_list),
+        'processed': 0,
+        'succeeded': 0,
+        'errors': [],
+        'return_url': return_url,
+    }
+    job_result.save()
+
+    for i in range(0, len(pk_list), BULK_JOB_BATCH_SIZE):
+        batch = pk_list[i:i + BULK_JOB_BATCH_SIZE]
+
+        for obj in queryset.filter(pk__in=batch):
+            error = None
+
+            # Enable change logging and webhooks for each object separately, so that the webhooks for any object
+            # which cannot be processed can be discarded.
+            with change_logging(request):
+                try:
+                    with transaction.atomic():
+                        func(obj)
+                except ValidationError as e:
+                    error = ", ".join(e.messages)
+                except ProtectedError as e:
+                    error = f"Unable to delete: {len(e.protected_objects)} dependent objects were found"
+                except (AbortRequest, PermissionsViolation) as e:
+                    error = e.message
+                except Exception as e:
+                    stacktrace = traceback.format_exc()
+                    logger.error(f"Exception raised while processing {obj}: {e}\n{stacktrace}")
+                    error = f"An exception occurred: {type(e).__name__}: {e}"
+                if error:
+                    clear_webhooks.send(request)
+
+            if error:
+                job_result.data['errors'].append({
+                    'object': str(obj),
+                    'errors': [error],
+                })
+            else:
+                job_result.data['succeeded'] += 1
+
+        job_result.data['processed'] += len(batch)
+        job_result.save()
+
+    if job_result.data['errors']:
+        job_result.set_status(JobResultStatusChoices.STATUS_FAILED)
+    else:
+        job_result.set_status(JobResultStatusChoices.STATUS_COMPLETED)
+    job_result.save()
+
+
+def run_bulk_edit(request, view_class, pk_list, initial_data=None, return_url=None, **kwargs):
+    """
+    Apply the changes submitted to a bulk edit form to the specified objects as a background job.
+
+    :param request: A copy of the request which submitted the bulk edit form
+    :param view_class: The BulkEditView subclass handling the edit
+    :param pk_list: The primary keys of the objects to edit
+    :param initial_data: Initial data for the bulk edit form (optional)
+    :param return_url: The URL to which the user is directed upon completion (optional)
+    """
+    job_result = kwargs.pop('job_result')
+    logger = logging.getLogger('netbox.jobs.run_bulk_edit')
+
+    view = view_class()
+    view.queryset = view.queryset.restrict(request.user, 'change')
+    model = view.queryset.model
+
+    # Rebuild the bulk edit form from the submitted data
+    form = view.form(request.POST, initial=initial_data)
+    restrict_form_fields(form, request.user)
+    if not form.is_valid():
+        logger.error(f"Bulk edit form validation failed: {form.errors.as_text()}")
+        job_result.data = {
+            'errors': [{'object': field, 'errors': list(errors)} for field, errors in form.errors.items()],
+            'return_url': return_url,
+        }
+        job_result.set_status(JobResultStatusChoices.STATUS_ERRORED)
+        job_result.save()
+        return
+
+    def update_object(obj):
+        view._update_objects(form, request, objects=[obj])
+
+        # Enforce object-level permissions
+        if not view.queryset.filter(pk=obj.pk).exists():
+            raise PermissionsViolation
+
+    logger.info(f"Editing {len(pk_list)} {model._meta.verbose_name_plural}")
+    _run_for_objects(job_result, request, view.queryset, pk_list, update_object, return_url, logger)
+    logger.info(
+        f"Updated {job_result.data['succeeded']} of {len(pk_list)} {model._meta.verbose_name_plural} in "
+        f"{job_result.duration}"
+    )
+
+
+def run_bulk_delete(request, view_class, pk_list, return_url=None, **kwargs):
+    """
+    Delete the specified objects as a background job.
+
+    :param request: A copy of the request which confirmed the deletion
+    :param view_class: The BulkDeleteView subclass handling the deletion
+    :param pk_list: The primary keys of the objects to delete
+    :param return_url: The URL to which the user is directed upon completion (optional)
+    """
+    job_result = kwargs.pop('job_result')
+    logger = logging.getLogger('netbox.jobs.run_bulk_delete')
+
+    view = view_class()
+    view.queryset = view.queryset.restrict(request.user, 'delete')
+    model = view.queryset.model
+
+    def delete_object(obj):
+        # Take a snapshot of change-logged models
+        if hasattr(obj, 'snapshot'):
+            obj.snapshot()
+        obj.delete()
+
+    logger.info(f"Deleting {len(pk_list)} {model._meta.verbose_name_plural}")
+    _run_for_objects(job_result, request, view.queryset, pk_list, delete_object, return_url, logger)
+    logger.info(
+        f"Deleted {job_result.data['succeeded']} of {len(pk_list)} {model._meta.verbose_name_plural} in "
+        f"{job_result.duration}"
+    )
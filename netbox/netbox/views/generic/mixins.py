@@ -1,9 +1,18 @@
 from collections import defaultdict
 
+from django.contrib import messages
+from django.contrib.contenttypes.models import ContentType
+from django.shortcuts import redirect
+from django_rq.queues import get_connection
+from rq import Worker
+
+from extras.models import JobResult
 from utilities.permissions import get_permission_for_model
+from utilities.utils import copy_safe_request
 
 __all__ = (
     'ActionsMixin',
+    'BackgroundJobMixin',
     'TableMixin',
 )
 
@@ -29,6 +38,40 @@ class ActionsMixin:
         ]
 
 
+class BackgroundJobMixin:
+    """
+    Enables a bulk operation view to perform its operation in a background job.
+    """
+    def _enqueue_job(self, request, func, name, include_data=True, **kwargs):
+        """
+        Enqueue a background job to perform the operation, and redirect the user to its result.
+
+        :param request: The current request
+        :param func: The job function, which is passed a copy of the request, the view class, and the return URL
+        :param name: The name of the JobResult
+        :param include_data: If False, the POST data and files submitted with the request are not passed to the job
+        :param kwargs: Additional keyword arguments to pass to the job function
+        """
+        # Allow execution only if RQ worker process is running
+        if not Worker.count(get_connection('default')):
+            messages.error(request, "Unable to start background job: RQ worker process not running.")
+            return redirect(request.get_full_path())
+
+        job_result = JobResult.enqueue_job(
+            func,
+            name,
+            ContentType.objects.get_for_model(self.queryset.model),
+            request.user,
+            request=copy_safe_request(request, include_data=include_data),
+            view_class=self.__class__,
+            return_url=self.get_return_url(request),
+            **kwargs
+        )
+        messages.info(request, f"{name} started in the background")
+
+        return redirect('extras:jobresult', job_result_pk=job_result.pk)
+
+
 class TableMixin:
 
     def get_table(self, data, request, bulk_actions=True):
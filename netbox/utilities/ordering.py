@@ -10,6 +10,10 @@ INTERFACE_NAME_REGEX = r'(^(?P<type>[^\d\.:]+)?)' \
                        r'(\.(?P<vc>\d+))?' \
                        r'(?P<remainder>.*)$'
 
+# Compiled patterns used by the naturalization functions
+INTEGER_PATTERN = re.compile(r'(\d+)')
+INTERFACE_NAME_PATTERN = re.compile(INTERFACE_NAME_REGEX)
+
 
 def naturalize(value, max_length, integer_places=8):
     """
@@ -33,7 +37,7 @@ def naturalize(value, max_length, integer_places=8):
     if not value:
         return value
     output = []
-    for segment in re.split(r'(\d+)', value):
+    for segment in INTEGER_PATTERN.split(value):
         if segment.isdigit():
             output.append(segment.rjust(integer_places, '0'))
         elif segment:
@@ -52,7 +56,7 @@ def naturalize_interface(value, max_length):
     :param max_length: The maximum length of the returned string. Characters beyond this length will be stripped.
     """
     output = ''
-    match = re.search(INTERFACE_NAME_REGEX, value)
+    match = INTERFACE_NAME_PATTERN.search(value)
     if match is None:
         return value
 
@@ -5,10 +5,12 @@ from decimal import Decimal
 from itertools import count, groupby
 
 import bleach
+from django.core.cache import cache
 from django.core.serializers import serialize
 from django.db.models import Count, OuterRef, Subquery
 from django.db.models.functions import Coalesce
 from django.http import QueryDict
+from django_redis import get_redis_connection
 from jinja2.sandbox import SandboxedEnvironment
 from mptt.models import MPTTModel
 
@@ -398,10 +400,13 @@ class NetBoxFakeRequest:
         self.__dict__ = _dict
 
 
-def copy_safe_request(request):
+def copy_safe_request(request, include_data=True):
     """
     Copy selected attributes from a request object into a new fake request object. This is needed in places where
     thread safe pickling of the useful request data is needed.
+
+    :param request: The request to copy
+    :param include_data: If False, the POST data and files submitted with the request are omitted
     """
     meta = {
         k: request.META[k]
@@ -410,9 +415,9 @@ def copy_safe_request(request):
     }
     return NetBoxFakeRequest({
         'META': meta,
-        'POST': request.POST,
+        'POST': request.POST if include_data else {},
         'GET': request.GET,
-        'FILES': request.FILES,
+        'FILES': request.FILES if include_data else {},
         'user': request.user,
         'path': request.path,
         'id': getattr(request, 'id', None),  # UUID assigned by middleware
@@ -447,3 +452,31 @@ def clean_html(html, schemes):
         attributes=ALLOWED_ATTRIBUTES,
         protocols=schemes
     )
+
+
+def add_to_cache_index(index_key, key, timeout):
+    """
+    Record a cache key in the set stored under index_key. The set is updated atomically in Redis, so concurrent
+    additions to the same index are never lost. The expiry of the index is extended to the given timeout.
+    """
+    index_key = cache.make_key(index_key)
+    with get_redis_connection().pipeline() as pipe:
+        pipe.sadd(index_key, key)
+        pipe.expire(index_key, timeout)
+        pipe.execute()
+
+
+def pop_cache_indexes(index_keys):
+    """
+    Atomically retrieve and delete the sets stored under the given index keys, returning all cache keys recorded
+    in them.
+    """
+    index_keys = [cache.make_key(index_key) for index_key in index_keys]
+    if not index_keys:
+        return set()
+    with get_redis_connection().pipeline() as pipe:
+        for index_key in index_keys:
+            pipe.smembers(index_key)
+        pipe.delete(*index_keys)
+        *indexes, _ = pipe.execute()
+    return {key.decode() for index in indexes for key in index}
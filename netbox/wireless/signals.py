@@ -4,6 +4,7 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from dcim.models import CablePath, Interface
+from dcim.svg import invalidate_cable_trace_svgs
 from dcim.utils import create_cablepath
 from .models import WirelessLink
 
@@ -54,3 +55,14 @@ def nullify_connected_interfaces(instance, **kwargs):
     # Delete and retrace any dependent cable paths
     for cablepath in CablePath.objects.filter(_nodes__contains=instance):
         cablepath.delete()
+
+
+@receiver(post_save, sender=WirelessLink)
+def invalidate_wirelesslink_svgs(instance, created, raw=False, **kwargs):
+    """
+    Discard any cached cable trace SVGs for CablePaths which traverse a modified WirelessLink.
+    """
+    if not created and not raw:
+        invalidate_cable_trace_svgs(
+            CablePath.objects.filter(_nodes__contains=instance).values_list('pk', flat=True)
+        )